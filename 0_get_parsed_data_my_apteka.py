@@ -1,8 +1,20 @@
-from parser import *
+import os
+from parser import get_parser_data
 
-my_apteka = input('Моя аптека: ')
-my_apteka_link = input('Ссылка:')
 
-save_directory = os.path.join(os.getcwd(), 'Datasets', 'our_pharmacies', my_apteka)
-os.makedirs(save_directory, exist_ok=True)
-get_parser_data(my_apteka_link,save_directory)
\ No newline at end of file
+# Папка снимков нашей аптеки
+our_pharmacies_folder = os.path.join('Datasets', 'our_pharmacies')
+
+
+def parse_my_pharmacy(my_apteka, my_apteka_link, output_dir=our_pharmacies_folder):
+    # Снимок нашей аптеки в <output_dir>/<аптека>
+    save_directory = os.path.join(os.path.abspath(output_dir), my_apteka)
+    os.makedirs(save_directory, exist_ok=True)
+    get_parser_data(my_apteka_link, save_directory)
+    return save_directory
+
+
+if __name__ == "__main__":
+    my_apteka = input('Моя аптека: ')
+    my_apteka_link = input('Ссылка:')
+    parse_my_pharmacy(my_apteka, my_apteka_link)
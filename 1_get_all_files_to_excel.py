@@ -1,7 +1,10 @@
 import os
 import pandas as pd
 import shutil
-from multiprocessing import Pool, cpu_count
+from snapshot_store import EXPORT_EXCEL, normalize_snapshot, parquet_num_rows, table_path, write_table
+from metrics import count_rows
+from crawl_checkpoint import CHECKPOINT_SUFFIX
+from worker_pool import worker_pool
 
 # Исходные папки
 competitor_folder = "Datasets/competitors/"
@@ -11,12 +14,9 @@ our_pharmacies_folder = "Datasets/our_pharmacies/"
 target_comp_folder = "Datasets/data/comp/"
 target_our_pharmacies_folder = "Datasets/data/our_pharmacies/"
 
-# Убедимся, что целевые папки существуют
-os.makedirs(target_comp_folder, exist_ok=True)
-os.makedirs(target_our_pharmacies_folder, exist_ok=True)
-
 
 def process_file(args):
+    # Возвращает число строк перенесенного снимка (для метрик)
     source_path, source_folder, target_folder = args
 
     # Определяем относительный путь для сохранения структуры
@@ -25,17 +25,36 @@ def process_file(args):
     os.makedirs(target_path_dir, exist_ok=True)
 
     file = os.path.basename(source_path)
+    stem, extension = os.path.splitext(file)
+    extension = extension.lower()
+
+    if extension in (".csv", ".parquet"):
+        # Снимок уже есть в хранилище и не старше исходного файла - пропускаем
+        target_path = table_path(os.path.join(target_path_dir, stem))
+        if os.path.exists(target_path) and os.path.getmtime(target_path) >= os.path.getmtime(source_path):
+            return 0
 
-    if file.lower().endswith(".csv"):
-        # Преобразуем .csv в .xlsx
+    if extension == ".csv":
+        # Преобразуем .csv в типизированную таблицу хранилища (parquet или Excel)
         try:
-            df = pd.read_csv(source_path)
-            new_file_name = os.path.splitext(file)[0] + ".xlsx"
-            target_path = os.path.join(target_path_dir, new_file_name)
-            df.to_excel(target_path, index=False)
-            print(f"CSV файл преобразован и сохранён как Excel: {target_path}")
+            df = normalize_snapshot(pd.read_csv(source_path))
+            target_path = write_table(df, os.path.join(target_path_dir, stem))
+            print(f"CSV файл преобразован и сохранён: {target_path}")
+            return len(df)
         except Exception as e:
             print(f"Ошибка при преобразовании файла {source_path}: {e}")
+    elif extension == ".parquet":
+        # Снимки parquet парсер пишет сразу в нужном виде - копируем как есть,
+        # исходник остается, чтобы нумерация снимков аптеки продолжалась
+        try:
+            target_path = os.path.join(target_path_dir, file)
+            shutil.copy2(source_path, target_path)
+            if EXPORT_EXCEL:
+                pd.read_parquet(target_path).to_excel(os.path.join(target_path_dir, stem + ".xlsx"), index=False)
+            print(f"Снимок скопирован: {target_path}")
+            return parquet_num_rows(target_path)
+        except Exception as e:
+            print(f"Ошибка при копировании файла {source_path}: {e}")
     else:
         # Перемещаем остальные файлы без изменений
         try:
@@ -44,29 +63,42 @@ def process_file(args):
             print(f"Файл перемещён: {target_path}")
         except Exception as e:
             print(f"Ошибка при перемещении файла {source_path}: {e}")
+    return 0
 
 
-def process_and_move_files(source_folder, target_folder):
+def process_and_move_files(source_folder, target_folder, pool=None):
 
     """
     Перемещает все файлы из source_folder в target_folder,
-    сохраняя структуру папок. Если файл имеет расширение .csv,
-    преобразует его в .xlsx при перемещении.
+    сохраняя структуру папок. Снимки .csv преобразуются в таблицы
+    хранилища (parquet, а без pyarrow - .xlsx), снимки .parquet копируются.
     """
 
+    # Убедимся, что целевая папка существует
+    os.makedirs(target_folder, exist_ok=True)
+
     file_paths = []
     for root, _, files in os.walk(source_folder):
         for file in files:
+            # Незавершенные снимки (*.part) и контрольные точки прерванных обходов нужны парсеру, их не трогаем
+            if file.endswith('.part') or file.endswith(CHECKPOINT_SUFFIX):
+                continue
             source_path = os.path.join(root, file)
             file_paths.append((source_path, source_folder, target_folder))
 
     # Используем пул процессов для параллельной обработки файлов
-    with Pool(cpu_count()) as pool:
-        pool.map(process_file, file_paths)
+    with worker_pool(pool) as workers:
+        count_rows(sum(workers.map(process_file, file_paths)))
+
+
+def move_all_files(pool=None, competitors_dir=competitor_folder, our_pharmacies_dir=our_pharmacies_folder,
+                   target_comp_dir=target_comp_folder, target_our_pharmacies_dir=target_our_pharmacies_folder):
+    # Обрабатываем папки
+    process_and_move_files(competitors_dir, target_comp_dir, pool)
+    process_and_move_files(our_pharmacies_dir, target_our_pharmacies_dir, pool)
 
+    print("Все файлы успешно обработаны и перенесены.")
 
-# Обрабатываем папки
-process_and_move_files(competitor_folder, target_comp_folder)
-process_and_move_files(our_pharmacies_folder, target_our_pharmacies_folder)
 
-print("Все файлы успешно обработаны и перенесены.")
\ No newline at end of file
+if __name__ == "__main__":
+    move_all_files()
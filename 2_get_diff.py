@@ -1,92 +1,159 @@
 import os
-import pandas as pd
-import multiprocessing
-
-def process_competitor(competitor, apteka_items, competitors_dir, output_dir, total_files, processed_count, lock):
-    competitor_path = os.path.join(competitors_dir, competitor)
-    if not os.path.isdir(competitor_path):
-        return
-
+import json
+import hashlib
+from functools import partial
+from snapshot_store import find_table, list_tables, read_table, write_table
+from worker_pool import chunk_size, worker_pool
+from metrics import count_rows
+
+# Файл в папке результатов со списком уже обработанных снимков
+MANIFEST_NAME = 'manifest.json'
+
+def file_signature(path):
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime': stat.st_mtime}
+
+def assortment_version(apteka_items):
+    # Версия ассортимента нашей аптеки - хэш отсортированного списка позиций
+    digest = hashlib.sha1()
+    for item in sorted(apteka_items):
+        digest.update(item.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+def load_manifest(output_dir, version):
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    manifest = {'assortment': version, 'files': {}}
+    if not os.path.exists(manifest_path):
+        return manifest
+    try:
+        with open(manifest_path, encoding='utf-8') as f:
+            saved = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Не удалось прочитать {manifest_path}, все файлы будут обработаны заново: {e}")
+        return manifest
+
+    if saved.get('assortment') == version:
+        return saved
+
+    # Ассортимент изменился: прежние разницы неверны, удаляем их
+    print("Ассортимент аптеки изменился, все файлы будут обработаны заново.")
+    for entry in saved.get('files', {}).values():
+        output_file = entry.get('output')
+        if output_file and os.path.exists(output_file):
+            os.remove(output_file)
+    return manifest
+
+def save_manifest(output_dir, manifest):
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    with open(manifest_path + '.part', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(manifest_path + '.part', manifest_path)
+
+def is_processed(manifest, relative_path, file_path):
+    entry = manifest['files'].get(relative_path)
+    if entry is None or entry.get('source') != file_signature(file_path):
+        return False
+    # Файл с разницей мог быть удален вручную
+    return entry.get('output') is None or os.path.exists(entry['output'])
+
+# Ассортимент нашей аптеки в процессе-обработчике; передается один раз через initializer пула
+_apteka_items = None
+
+def init_worker(apteka_items):
+    global _apteka_items
+    _apteka_items = apteka_items
+
+def process_file(task, apteka_items=None):
+    # Обрабатывает один снимок конкурента и возвращает (относительный путь, запись манифеста или None).
+    # apteka_items передается явно, когда пул общий и initializer недоступен
+    competitor, file, competitors_dir, output_dir = task
+    apteka_items = _apteka_items if apteka_items is None else apteka_items
+    file_path = os.path.join(competitors_dir, competitor, file)
     diff_folder = os.path.join(output_dir, f"diff_{competitor}")
-    os.makedirs(diff_folder, exist_ok=True)
-
-    supported_extensions = ('.xls', '.xlsx', '.xlsm')
-
-    # Сортируем файлы по индексу, извлечённому из названий
-    files = sorted(
-        [f for f in os.listdir(competitor_path) if f.endswith(supported_extensions)],
-        key=lambda x: int(x.split('_')[0]) if x.split('_')[0].isdigit() else 0
-    )
-
-    for file in files:
-        file_path = os.path.join(competitor_path, file)
-        try:
-            # Определяем движок для чтения Excel-файла
-            if file.endswith('.xls'):
-                engine = 'xlrd'
-            else:
-                engine = 'openpyxl'
-
-            df = pd.read_excel(file_path, dtype=str, engine=engine).dropna()
-            competitor_items = set(df.iloc[:, 0].tolist())
-
-            diff_items = competitor_items - apteka_items
-            if diff_items:
-                diff_df = df[df.iloc[:, 0].isin(diff_items)]
-                output_file_name = f"diff_{os.path.splitext(file)[0]}.xlsx"
-                output_file = os.path.join(diff_folder, output_file_name)
-                diff_df.to_excel(output_file, index=False)
-                print(f"Разница сохранена: {output_file}")
-        except Exception as e:
-            print(f"Ошибка обработки файла {file_path}: {e}")
-        finally:
-            # Обновляем счётчик с использованием блокировки
-            with lock:
-                processed_count.value += 1
-            print(f"Загружено {processed_count.value} из {total_files} файлов")
-
-def find_differences(apteka_file, competitors_dir, output_dir):
     try:
-        # Определяем движок для файла аптеки
-        if apteka_file.endswith('.xls'):
-            engine = 'xlrd'
+        df = read_table(file_path, dtype=str).dropna()
+        competitor_items = set(df.iloc[:, 0].tolist())
+
+        output_file_name = f"diff_{os.path.splitext(file)[0]}"
+        diff_items = competitor_items - apteka_items
+        output_file = None
+        if diff_items:
+            diff_df = df[df.iloc[:, 0].isin(diff_items)]
+            output_file = write_table(diff_df, os.path.join(diff_folder, output_file_name))
+            print(f"Разница сохранена: {output_file}")
         else:
-            engine = 'openpyxl'
+            # Разницы больше нет - убираем результат прошлой обработки
+            stale_file = find_table(diff_folder, output_file_name)
+            if stale_file:
+                os.remove(stale_file)
+        return os.path.join(competitor, file), {'source': file_signature(file_path), 'output': output_file,
+                                                'rows': len(df)}
+    except Exception as e:
+        print(f"Ошибка обработки файла {file_path}: {e}")
+        return os.path.join(competitor, file), None
 
-        apteka_df = pd.read_excel(apteka_file, usecols=[0], dtype=str, engine=engine).dropna()
+def find_differences(apteka_file, competitors_dir, output_dir, pool=None):
+    try:
+        apteka_df = read_table(apteka_file, usecols=[0], dtype=str).dropna()
         apteka_items = set(apteka_df.iloc[:, 0].tolist())
     except Exception as e:
         print(f"Ошибка при загрузке файла аптеки: {e}")
         return
 
     os.makedirs(output_dir, exist_ok=True)
+    manifest = load_manifest(output_dir, assortment_version(apteka_items))
     competitors = [
         comp for comp in os.listdir(competitors_dir)
         if os.path.isdir(os.path.join(competitors_dir, comp))
     ]
 
-    # Подсчитываем общее количество файлов для обработки
-    total_files = sum(
-        len([
-            f for f in os.listdir(os.path.join(competitors_dir, comp))
-            if f.endswith(('.xls', '.xlsx', '.xlsm'))
-        ]) for comp in competitors
-    )
-
-    with multiprocessing.Manager() as manager:
-        processed_count = manager.Value('i', 0)
-        lock = manager.Lock()  # Создаём блокировку
-
-        pool_args = [
-            (comp, apteka_items, competitors_dir, output_dir, total_files, processed_count, lock)
-            for comp in competitors
+    # Отбираем только снимки, которых еще нет в манифесте,
+    # и сортируем их по индексу, извлечённому из названий
+    pending = {}
+    for comp in competitors:
+        competitor_path = os.path.join(competitors_dir, comp)
+        files = [
+            f for f in list_tables(competitor_path)
+            if not is_processed(manifest, os.path.join(comp, f), os.path.join(competitor_path, f))
         ]
-        with multiprocessing.Pool(processes=multiprocessing.cpu_count()) as pool:
-            pool.starmap(process_competitor, pool_args)
+        if files:
+            pending[comp] = sorted(files, key=lambda x: int(x.split('_')[0]) if x.split('_')[0].isdigit() else 0)
+
+    # Подсчитываем общее количество файлов для обработки
+    total_files = sum(len(files) for files in pending.values())
+    if not total_files:
+        print("Новых снимков для обработки нет.")
+        save_manifest(output_dir, manifest)
+        return
+
+    # Задача пула - один файл, поэтому крупный конкурент не занимает одно ядро,
+    # пока остальные простаивают; прогресс считается по возвращенным результатам
+    tasks = []
+    for comp, files in pending.items():
+        os.makedirs(os.path.join(output_dir, f"diff_{comp}"), exist_ok=True)
+        tasks.extend((comp, f, competitors_dir, output_dir) for f in files)
+
+    if pool is None:
+        # Свой пул: ассортимент передается один раз через initializer
+        work, chunks = process_file, 1
+    else:
+        # Общий пул: ассортимент уходит вместе с порцией задач
+        work, chunks = partial(process_file, apteka_items=apteka_items), chunk_size(len(tasks), pool)
+    with worker_pool(pool, initializer=init_worker, initargs=(apteka_items,)) as workers:
+        for processed_count, (relative_path, entry) in enumerate(workers.imap_unordered(work, tasks, chunks), start=1):
+            if entry is not None:
+                manifest['files'][relative_path] = entry
+                count_rows(entry['rows'])
+            print(f"Загружено {processed_count} из {total_files} файлов")
+
+    save_manifest(output_dir, manifest)
 
 
-apteka_file_path = input('Путь к файлу аптеки:')
 competitors_directory = "Datasets/data/comp"
 output_directory = "Datasets/diff_comp"
 
-find_differences(apteka_file_path, competitors_directory, output_directory)
+if __name__ == "__main__":
+    apteka_file_path = input('Путь к файлу аптеки:')
+    find_differences(apteka_file_path, competitors_directory, output_directory)
+
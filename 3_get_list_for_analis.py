@@ -1,26 +1,37 @@
 import os
 import pandas as pd
+import numpy as np
 import logging
 import re
-import multiprocessing
+from functools import partial
+from snapshot_store import list_tables, read_table, write_table
+from product_index import get_product_index
+from worker_pool import worker_pool
+from metrics import count_rows
 
 # Путь к папке с конкурентами
 base_path = "Datasets/diff_comp"
 output_path = "Datasets/list_for_analis"
 
-# Проверяем, существует ли папка для сохранения результатов, если нет — создаем её
-if not os.path.exists(output_path):
-    os.makedirs(output_path)
+# Писать ли в лог каждую добавленную и пропущенную строку (только для отладки, лог растет очень быстро)
+TRACE_ROWS = False
 
-# Путь к файлу логов
-log_file_path = os.path.join(output_path, 'log.txt')
+# Лог шага; файл подключается при первом запуске, а не при импорте модуля
+logger = logging.getLogger('list_for_analis')
 
-# Настройка логирования
-logging.basicConfig(
-    filename=log_file_path,  # Путь к файлу логов
-    level=logging.INFO,      # Уровень логирования
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+
+def setup_logging(output_dir=output_path):
+    # Лог пишется в <output_dir>/log.txt; в каждом процессе обработчик добавляется один раз
+    os.makedirs(output_dir, exist_ok=True)
+    log_file_path = os.path.abspath(os.path.join(output_dir, 'log.txt'))
+    if any(getattr(handler, 'baseFilename', None) == log_file_path for handler in logger.handlers):
+        return
+    handler = logging.FileHandler(log_file_path, encoding='utf-8')
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.DEBUG if TRACE_ROWS else logging.INFO)
+    # Сообщения уже печатаются в консоль, в корневой логгер их не передаем
+    logger.propagate = False
 
 # Функция для получения индекса из имени файла
 def get_index_from_filename(file_name):
@@ -28,79 +39,110 @@ def get_index_from_filename(file_name):
     return int(match.group(1)) if match else None
 
 # Функция для обработки одного конкурента
-def process_competitor(competitor_name):
-    folder_path = os.path.join(base_path, competitor_name)
-    all_data = []
-    unique_records = set()  # Множество для проверки уникальности строк по первым 6 колонкам
+def process_competitor(competitor_name, input_dir=base_path, output_dir=output_path):
+    setup_logging(output_dir)
+    folder_path = os.path.join(input_dir, competitor_name)
+    frames = []  # Таблицы файлов в порядке индексов
+    frame_files = []
 
     # Получаем список файлов и сортируем по индексу
-    files = [f for f in os.listdir(folder_path) if f.endswith(('.xlsx', '.xls'))]
+    files = list_tables(folder_path)
     files_with_index = [f for f in files if get_index_from_filename(f) is not None]
     files_with_index.sort(key=lambda x: get_index_from_filename(x))
 
     if not files_with_index:
         no_files_message = f"Нет файлов для обработки в папке {folder_path} для конкурента '{competitor_name}'"
         print(no_files_message)
-        logging.warning(no_files_message)
-        return
+        logger.warning(no_files_message)
+        return competitor_name, None
+
+    required_columns = ["name", "item_type", "item_form", "prescription", "manufacturer", "country", "price"]
+    # Ключ уникальности — первые 6 колонок, закодированные номером товара product_id
+    output_columns = required_columns + ['product_id']
+    excluded_types = ["БАД", "Косметика", "Питание", "Прочее", "зубные пасты и проч.","Продукты питания"]
 
     # Проходимся по всем файлам в порядке индексов
     for file_name in files_with_index:
         file_path = os.path.join(folder_path, file_name)
         try:
-            # Читаем Excel файл
-            df = pd.read_excel(file_path, engine="openpyxl")
+            # Читаем таблицу (parquet или Excel)
+            df = read_table(file_path)
 
             # Проверяем, что в таблице есть нужные колонки
-            required_columns = ["name", "item_type", "item_form", "prescription", "manufacturer", "country", "price"]
             if all(column in df.columns for column in required_columns):
-                # Очищаем данные от лишних пробелов в строках
-                df[required_columns] = df[required_columns].apply(lambda x: x.str.strip() if x.dtype == 'object' else x)
+                # Очищаем данные от лишних пробелов в строках (строковые колонки бывают object и str)
+                df[required_columns] = df[required_columns].apply(
+                    lambda x: x.str.strip() if x.dtype == 'object' or isinstance(x.dtype, pd.StringDtype) else x)
+
+                # Ключ уникальности строится по очищенным колонкам, поэтому номер товара
+                # берется из словаря заново, а не из сохраненного в снимке product_id
+                df['product_id'] = get_product_index().ids_for(df)
 
                 # Фильтруем данные по item_type
-                excluded_types = ["БАД", "Косметика", "Питание", "Прочее", "зубные пасты и проч.","Продукты питания"]
                 df = df[~df['item_type'].isin(excluded_types)]
 
-                # Добавляем данные в общий список, проверяя на уникальность
-                for _, row in df[required_columns].iterrows():
-                    record_key = tuple(row[col] for col in required_columns[:6])  # Ключ — первые 6 колонок
-                    if record_key not in unique_records:
-                        unique_records.add(record_key)  # Добавляем ключ в множество
-                        all_data.append(row.to_dict())  # Добавляем запись в общий список
-                        log_message = f"Добавлена уникальная запись из файла {file_name}: {row.to_dict()}"
-                        logging.info(log_message)
-                    else:
-                        log_message = f"Пропущена дублирующая запись из файла {file_name}: {row.to_dict()}"
-                        logging.info(log_message)
+                frames.append(df[output_columns])
+                frame_files.append(file_name)
             else:
                 log_message = f"Отсутствуют необходимые колонки в файле {file_name}"
-                logging.warning(log_message)
+                logger.warning(log_message)
         except Exception as e:
             error_message = f"Ошибка при обработке файла {file_name}: {e}"
-            logging.error(error_message)
+            logger.error(error_message)
+
+    combined_df = None
+    if frames:
+        # Склеиваем файлы по порядку индексов и оставляем первое появление каждого ключа
+        combined = pd.concat(frames, ignore_index=True)
+        file_positions = np.repeat(np.arange(len(frames)), [len(frame) for frame in frames])
+        duplicated = combined['product_id'].duplicated(keep='first').to_numpy()
 
-    # Если данные найдены, объединяем их и сохраняем в Excel
-    if all_data:
-        combined_df = pd.DataFrame(all_data)
+        # В лог — только итоги по каждому файлу
+        rows_per_file = np.bincount(file_positions, minlength=len(frames))
+        added_per_file = np.bincount(file_positions[~duplicated], minlength=len(frames))
+        for file_name, total_rows, added_rows in zip(frame_files, rows_per_file, added_per_file):
+            logger.info(
+                f"Файл {file_name}: строк {total_rows}, добавлено уникальных {added_rows}, "
+                f"пропущено дублирующих {total_rows - added_rows}"
+            )
+
+        if TRACE_ROWS:
+            for position, row in enumerate(combined.to_dict('records')):
+                action = "Пропущена дублирующая" if duplicated[position] else "Добавлена уникальная"
+                logger.debug(f"{action} запись из файла {frame_files[file_positions[position]]}: {row}")
+
+        combined_df = combined[~duplicated].reset_index(drop=True)
+
+    # Если данные найдены, объединяем их и сохраняем
+    if combined_df is not None and not combined_df.empty:
         # Создаем папку для конкурента, если она еще не создана
-        competitor_output_path = os.path.join(output_path, competitor_name)
+        competitor_output_path = os.path.join(output_dir, competitor_name)
         if not os.path.exists(competitor_output_path):
             os.makedirs(competitor_output_path)
-        # Сохраняем результат в файл Excel
-        output_file = os.path.join(competitor_output_path, f"{competitor_name}_list_for_analis.xlsx")
-        combined_df.to_excel(output_file, index=False, engine="openpyxl")
+        # Сохраняем результат в таблицу хранилища
+        output_file = write_table(combined_df, os.path.join(competitor_output_path, f"{competitor_name}_list_for_analis"))
         success_message = f"Данные для конкурента '{competitor_name}' сохранены в {output_file}"
         print(success_message)
-        logging.info(success_message)
+        logger.info(success_message)
     else:
         no_data_message = f"Нет данных для конкурента '{competitor_name}'"
         print(no_data_message)
-        logging.warning(no_data_message)
+        logger.warning(no_data_message)
+    return competitor_name, combined_df
+
+# Основной цикл для обработки всех папок конкурентов с использованием multiprocessing.
+# Возвращает {конкурент: таблица}, чтобы следующий шаг мог не читать ее с диска
+def build_lists_for_analysis(pool=None, input_dir=base_path, output_dir=output_path):
+    setup_logging(output_dir)
+    # Получаем список конкурентов
+    competitors = [competitor for competitor in os.listdir(input_dir) if os.path.isdir(os.path.join(input_dir, competitor))]
+
+    # Запускаем процессы для каждого конкурента
+    with worker_pool(pool) as workers:
+        results = workers.map(partial(process_competitor, input_dir=input_dir, output_dir=output_dir), competitors)
+    count_rows(sum(len(df) for _, df in results if df is not None))
+    return {competitor: df for competitor, df in results if df is not None and not df.empty}
 
-# Основной цикл для обработки всех папок конкурентов с использованием multiprocessing
-# Получаем список конкурентов
-competitors = [competitor for competitor in os.listdir(base_path) if os.path.isdir(os.path.join(base_path, competitor))]
 
-# Запускаем процессы для каждого конкурента
-with multiprocessing.Pool(processes=multiprocessing.cpu_count()) as pool:
-    pool.map(process_competitor, competitors)
+if __name__ == "__main__":
+    build_lists_for_analysis()
@@ -1,39 +1,50 @@
 import os
 import pandas as pd
 import re
-import multiprocessing
-from collections import defaultdict
-import numpy as np
-from openpyxl.styles import PatternFill
-from openpyxl import Workbook
-
-def process_competitor(competitor, analysis_dir, diff_comp_dir, output_dir, enable_correction=True):
-    competitor_analysis_path = os.path.join(analysis_dir, competitor, f"{competitor}_list_for_analis.xlsx")
+from snapshot_store import find_table, list_tables, read_table, string_frame
+from corrections import correct_quantity_matrix
+from quantity_matrix import build_quantity_matrix, quantity_frame, to_wide_frame
+from price_stats import PriceStatistics
+from product_index import product_ids
+from excel_export import GREY_FILL, ExcelSheet, highlight_mask, write_excel
+from worker_pool import worker_pool
+from metrics import count_rows
+
+# Если задан путь, все конкуренты дополнительно выгружаются листами одной книги.
+# Листы готовятся параллельно в процессах пула, книга пишется одним потоком
+COMBINED_WORKBOOK = None
+
+def process_competitor(competitor, analysis_dir, diff_comp_dir, output_dir, enable_correction=True, product_df=None):
+    # product_df - список товаров из шага 3, если он уже есть в памяти.
+    # Возвращает (имя файла pre_ans, таблица, маска серых ячеек) или None
+    competitor_analysis_path = find_table(os.path.join(analysis_dir, competitor), f"{competitor}_list_for_analis")
     competitor_diff_path = os.path.join(diff_comp_dir, competitor)
 
-    if not os.path.exists(competitor_analysis_path) or not os.path.isdir(competitor_diff_path):
+    if (product_df is None and competitor_analysis_path is None) or not os.path.isdir(competitor_diff_path):
         print(f"Пропускаю {competitor}: отсутствуют необходимые файлы или папки.")
-        return
+        return None
 
     try:
-        product_df = pd.read_excel(competitor_analysis_path, dtype=str).fillna('')
+        if product_df is not None:
+            product_df = string_frame(product_df).fillna('')
+        else:
+            product_df = read_table(competitor_analysis_path, dtype=str).fillna('')
     except Exception as e:
         print(f"Ошибка при чтении файла {competitor_analysis_path}: {e}")
-        return
+        return None
 
     key_columns = ['name', 'item_type', 'item_form', 'prescription', 'manufacturer', 'country']
-    product_df['key'] = product_df[key_columns].agg('|'.join, axis=1)
+    # Ключ товара - целый номер из общего словаря вместо склейки шести строк
+    product_df['key'] = product_ids(product_df)
     pre_ans = product_df[['key'] + key_columns].copy()
     pre_ans['Цена min'] = 0.0
     pre_ans['Цена max'] = 0.0
     pre_ans['Медианная цена'] = 0.0
 
-    prices_dict = defaultdict(list)
+    price_stats = PriceStatistics()
 
     diff_files = []
-    for diff_file in os.listdir(competitor_diff_path):
-        if not diff_file.endswith(('.xls', '.xlsx')):
-            continue
+    for diff_file in list_tables(competitor_diff_path):
         match = re.search(r"diff_(\d+)_parsed_data_(\d{4}-\d{2}-\d{2}_\d{2}-\d{2})", diff_file)
         if match:
             index = int(match.group(1))
@@ -42,17 +53,22 @@ def process_competitor(competitor, analysis_dir, diff_comp_dir, output_dir, enab
 
     diff_files.sort(key=lambda x: x[0])
 
+    # История остатков копится в длинном виде (key, снимок, количество)
+    # и разворачивается в матрицу один раз после чтения всех снимков
+    quantity_columns = []
+    quantity_frames = []
+
     for index, date_time, diff_file in diff_files:
         diff_file_path = os.path.join(competitor_diff_path, diff_file)
 
         try:
-            df = pd.read_excel(diff_file_path, dtype=str).fillna('')
+            df = read_table(diff_file_path, dtype=str).fillna('')
         except Exception as e:
             print(f"Ошибка при чтении файла {diff_file_path}: {e}")
             continue
 
         if 'key' not in df.columns:
-            df['key'] = df.iloc[:, :6].agg('|'.join, axis=1)
+            df['key'] = product_ids(df)
 
         price_column_name = 'price'
         quantity_column_name = 'only_quantity'
@@ -61,120 +77,75 @@ def process_competitor(competitor, analysis_dir, diff_comp_dir, output_dir, enab
             print(f"В файле {diff_file} отсутствуют колонки '{price_column_name}' или '{quantity_column_name}'.")
             continue
 
-        quantity_info = df.set_index('key')[quantity_column_name].to_dict()
-
-        for idx, row in df.iterrows():
-            key = row['key']
-            price_str = str(row[price_column_name])
+        # Цены разбираются векторно для всего файла
+        price_stats.add(df['key'], df[price_column_name])
 
-            match_price = re.search(r"([\d\s]+[.,]?\d*)", price_str)
-            if match_price:
-                price_value = match_price.group(1)
-                price_value = price_value.replace(',', '.').replace(' ', '')
-                try:
-                    price = float(price_value)
-                    prices_dict[key].append(price)
-                except (ValueError, TypeError):
-                    continue
+        quantity_frames.append(quantity_frame(df['key'], df[quantity_column_name], len(quantity_columns)))
+        quantity_columns.append(f"Количество {index}_{date_time}")
 
-        # Преобразуем количества в float
-        quantity_info = {k: float(v) if v != '' else 0.0 for k, v in quantity_info.items()}
+    quantities = build_quantity_matrix(pre_ans['key'], quantity_frames, len(quantity_columns))
 
-        pre_ans[f"Количество {index}_{date_time}"] = pre_ans['key'].map(quantity_info).fillna(0.0)
-
-    if not prices_dict:
+    if price_stats.is_empty():
         print("Внимание: словарь цен пуст. Проверьте корректность обработки цен.")
 
-    def compute_price_statistics(prices):
-        if prices:
-            return min(prices), max(prices), np.median(prices)
-        return 0.0, 0.0, 0.0
-
-    stats = pre_ans['key'].apply(lambda k: compute_price_statistics(prices_dict.get(k, [])))
-    pre_ans['Цена min'] = stats.apply(lambda x: x[0])
-    pre_ans['Цена max'] = stats.apply(lambda x: x[1])
-    pre_ans['Медианная цена'] = stats.apply(lambda x: x[2])
+    # min/max/медиана по всем снимкам одной групповой агрегацией
+    stats = price_stats.result().reindex(pre_ans['key'])
+    pre_ans['Цена min'] = stats['min'].fillna(0.0).to_numpy()
+    pre_ans['Цена max'] = stats['max'].fillna(0.0).to_numpy()
+    pre_ans['Медианная цена'] = stats['median'].fillna(0.0).to_numpy()
 
-    corrected_cells = []  # Инициализируем список исправленных ячеек
+    pre_ans.drop(columns=['key'], inplace=True)
+    corrected_rows = corrected_columns = ()  # Позиции исправленных ячеек
 
     if enable_correction:
-        # Исправляем значения и получаем список исправленных ячеек
-        pre_ans, corrected_cells = check_and_correct_values(pre_ans)
-    else:
-        # Если исправление отключено, инициализируем пустой список исправленных ячеек
-        corrected_cells = []
+        # Исправляем значения и получаем маску исправленных ячеек
+        quantities, corrected_mask = correct_quantity_matrix(quantities)
+        # В выгрузке столбцы количества идут сразу после столбцов товара и цен
+        first_quantity_column = len(pre_ans.columns)
+        corrected_rows, column_offsets = corrected_mask.nonzero()
+        corrected_columns = first_quantity_column + column_offsets
 
-    pre_ans.drop(columns=['key'], inplace=True)
     output_file = os.path.join(output_dir, f"pre_ans_{competitor}.xlsx")
 
-    # Сохраняем DataFrame с выделением ячеек
-    with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
-        pre_ans.to_excel(writer, index=False)
-        workbook = writer.book
-        worksheet = writer.sheets['Sheet1']
+    # Широкая таблица (по столбцу на снимок) собирается только для выгрузки
+    pre_ans = pd.concat([pre_ans, to_wide_frame(quantities, quantity_columns, index=pre_ans.index)], axis=1)
 
-        # Применяем серый цвет к ячейкам, которые нужно выделить
-        gray_fill = PatternFill(start_color="C0C0C0", end_color="C0C0C0", fill_type="solid")
-
-        for cell_pos in corrected_cells:
-            row_idx, col_idx = cell_pos
-            cell = worksheet.cell(row=row_idx + 2, column=col_idx + 1)  # +2 из-за заголовка и 0-й индексации
-            cell.fill = gray_fill
+    # Серые ячейки задаются маской и раскрашиваются при потоковой записи
+    highlight = highlight_mask(pre_ans.shape, corrected_rows, corrected_columns)
+    write_excel(output_file, [ExcelSheet('Sheet1', pre_ans, highlight, fill_color=GREY_FILL)])
 
     print(f"\npre_ans сохранен: {output_file}")
+    return os.path.basename(output_file), pre_ans, highlight
 
-def check_and_correct_values(df):
-    quantity_columns = [col for col in df.columns if col.startswith('Количество')]
-    corrected_cells = []  # Список для хранения позиций исправленных ячеек
-
-    num_columns = len(quantity_columns)
-    for idx, row in df.iterrows():
-        for t in range(num_columns - 1):
-            current_col = quantity_columns[t]
-            current_value = float(row[current_col])
-
-            # Проверяем уменьшение количества по сравнению с предыдущим шагом
-            prev_value = current_value
-            if t > 0:
-                prev_col = quantity_columns[t - 1]
-                prev_value = float(row[prev_col])
-
-            if current_value < prev_value:
-                # Ищем возврат к предыдущему уровню в следующих 1–5 шагах
-                for next_step in range(1, 6):
-                    future_index = t + next_step
-                    if future_index >= num_columns:
-                        break
-
-                    future_col = quantity_columns[future_index]
-                    future_value = float(row[future_col])
-
-                    if future_value == prev_value:
-                        # Исправляем значения между текущим шагом и найденным будущим шагом
-                        for correction_index in range(t, future_index):
-                            correction_col = quantity_columns[correction_index]
-                            df.at[idx, correction_col] = prev_value
-                            # Записываем координаты исправленной ячейки
-                            col_idx = df.columns.get_loc(correction_col)
-                            corrected_cells.append((idx, col_idx))
-                        break  # Выходим из цикла, так как нашли возврат к предыдущему уровню
-                # Если возврата не найдено в течение 5 шагов, ничего не делаем
-
-    return df, corrected_cells
-
-def generate_pre_ans_table(analysis_dir, diff_comp_dir, output_dir, enable_correction=True):
-    if not os.path.exists(analysis_dir):
+def generate_pre_ans_table(analysis_dir, diff_comp_dir, output_dir, enable_correction=True, lists=None, pool=None):
+    # lists - {конкурент: список товаров} из шага 3, если он уже в памяти.
+    # Возвращает {имя файла pre_ans: таблица} для шага 5
+    lists = lists or {}
+    if not os.path.exists(analysis_dir) and not lists:
         print(f"Папка {analysis_dir} не существует.")
-        return
+        return {}
     if not os.path.exists(diff_comp_dir):
         print(f"Папка {diff_comp_dir} не существует.")
-        return
+        return {}
     os.makedirs(output_dir, exist_ok=True)
 
-    competitors = [comp for comp in os.listdir(analysis_dir) if os.path.isdir(os.path.join(analysis_dir, comp))]
+    competitors = set(lists)
+    if os.path.exists(analysis_dir):
+        competitors.update(comp for comp in os.listdir(analysis_dir) if os.path.isdir(os.path.join(analysis_dir, comp)))
+
+    tasks = [(comp, analysis_dir, diff_comp_dir, output_dir, enable_correction, lists.get(comp)) for comp in sorted(competitors)]
+    with worker_pool(pool) as workers:
+        results = workers.starmap(process_competitor, tasks)
 
-    with multiprocessing.Pool(processes=multiprocessing.cpu_count()) as pool:
-        pool.starmap(process_competitor, [(comp, analysis_dir, diff_comp_dir, output_dir, enable_correction) for comp in competitors])
+    results = [result for result in results if result is not None]
+    count_rows(sum(len(pre_ans) for _, pre_ans, _ in results))
+    if COMBINED_WORKBOOK and results:
+        # В общей книге лист называется по конкуренту
+        sheets = [ExcelSheet(file_name[len('pre_ans_'):-len('.xlsx')], pre_ans, highlight, fill_color=GREY_FILL)
+                  for file_name, pre_ans, highlight in sorted(results, key=lambda result: result[0])]
+        write_excel(COMBINED_WORKBOOK, sheets)
+        print(f"\nВсе конкуренты сохранены в одну книгу: {COMBINED_WORKBOOK}")
+    return {file_name: pre_ans for file_name, pre_ans, _ in results}
 
 
 analysis_directory = "Datasets/list_for_analis"
@@ -183,4 +154,5 @@ output_directory = "Datasets/pre_ans"
 
 enable_correction = True
 
-generate_pre_ans_table(analysis_directory, comparison_directory, output_directory, enable_correction=enable_correction)
\ No newline at end of file
+if __name__ == "__main__":
+    generate_pre_ans_table(analysis_directory, comparison_directory, output_directory, enable_correction=enable_correction)
\ No newline at end of file
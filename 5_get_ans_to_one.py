@@ -1,18 +1,28 @@
 import os
-import re
+import numpy as np
 import pandas as pd
-from concurrent.futures import ProcessPoolExecutor
-from functools import partial
-from openpyxl.styles import PatternFill
-from openpyxl import Workbook
-import plotly.graph_objects as go
+from sales_metrics import calculate_metrics
+from excel_export import YELLOW_FILL, ExcelSheet, highlight_mask, write_excel
+from worker_pool import worker_pool
+from metrics import count_rows
+import charts
+from charts import (chart_dates, chart_spec, dashboard_link, graph_link, has_dynamics,
+                    reduced_quantities, render_charts, server_link, write_dashboard_data, write_viewer)
 
 # Функция для обработки отдельного файла
-def process_file(file_name, input_folder, output_folder, graphs_dir, hide_quantity_columns=False):
+# (df - таблица pre_ans из шага 4, если она уже в памяти; иначе читается из файла)
+def process_file(file_name, input_folder, output_folder, graphs_dir, hide_quantity_columns=False,
+                 graph_output=None, df=None):
+    # Режим графиков берется из charts.GRAPH_OUTPUT при вызове, а не при импорте модуля
+    graph_output = graph_output or charts.GRAPH_OUTPUT
     file_path = os.path.join(input_folder, file_name)
     print(f"Обрабатывается файл: {file_path}")
     try:
-        df = pd.read_excel(file_path)
+        if df is not None:
+            # Пустые строки в Excel читаются как пропуски
+            df = df.replace('', np.nan)
+        else:
+            df = pd.read_excel(file_path)
     except Exception as e:
         print(f"Ошибка при загрузке файла {file_path}: {e}")
         return
@@ -37,48 +47,14 @@ def process_file(file_name, input_folder, output_folder, graphs_dir, hide_quanti
     df[price_column] = df[price_column].str.extract(r'(\d+\.?\d*)', expand=False)
     df[price_column] = pd.to_numeric(df[price_column], errors='coerce').fillna(0)
 
-    # Функция для расчёта метрик
-    def calculate_metrics(row):
-        sold = 0
-        segments = []
-        temp_segment = []
-        prev_val = None
-        segment_change_indices = []
-        negative_changes = 0
-
-        for idx, col in enumerate(quantity_columns):
-            curr_val = row[col]
-            if pd.isnull(curr_val):
-                curr_val = 0
-            if prev_val is not None:
-                change = curr_val - prev_val
-                if change < 0:
-                    sold += -change
-                    negative_changes += 1
-                if change > 0:
-                    if temp_segment:
-                        segments.append(temp_segment)
-                        segment_change_indices.append(idx)
-                    temp_segment = []
-            temp_segment.append(curr_val)
-            prev_val = curr_val
-
-        if temp_segment:
-            segments.append(temp_segment)
-
-        return pd.Series({
-            "Индекс изменений": sold,
-            "Сегменты": len(segments),
-            "Частота изменений в минус": negative_changes,
-            "Индексы смены сегментов": segment_change_indices
-        })
-
-    # Применение функции
-    metrics_results = df.apply(calculate_metrics, axis=1)
-    df["Индекс изменений"] = metrics_results["Индекс изменений"]
-    df["Сегменты"] = metrics_results["Сегменты"]
-    df["Частота изменений в минус"] = metrics_results["Частота изменений в минус"]
-    segment_change_indices_list = metrics_results["Индексы смены сегментов"]
+    # Метрики считаются сразу для всей матрицы остатков;
+    # индексы смены сегментов возвращаются в компактном виде (CSR)
+    metrics_results, segment_changes = calculate_metrics(df[quantity_columns].to_numpy())
+    df["Индекс изменений"] = metrics_results["Индекс изменений"].to_numpy()
+    df["Сегменты"] = metrics_results["Сегменты"].to_numpy()
+    df["Частота изменений в минус"] = metrics_results["Частота изменений в минус"].to_numpy()
+    # Номер строки df по ее метке индекса
+    row_positions = pd.Series(range(len(df)), index=df.index)
 
     # Расчёт заработка
     df["Заработали"] = df["Индекс изменений"] * df[price_column]
@@ -99,127 +75,97 @@ def process_file(file_name, input_folder, output_folder, graphs_dir, hide_quanti
     output_file_path = os.path.join(output_folder, f"sorted_{file_name}")
     df_filtered["Ссылка на график"] = ""
 
-    # Создаём заливку для нового сегмента
-    yellow_fill = PatternFill(start_color='FFFF00', end_color='FFFF00', fill_type='solid')
-
-    # Генерация графиков и подсветка сегментов
-    for index, row in df_filtered.iterrows():
-        quantity_values = row[quantity_columns].values
-        segment_change_indices = segment_change_indices_list.loc[row.name]
-
-        # Исключаем повышения количества для графика
-        reduced_quantity_values = []
-        prev_val = None
-
-        for curr_val in quantity_values:
-            if prev_val is not None:
-                if curr_val <= prev_val:
-                    reduced_quantity_values.append(curr_val)
-                else:
-                    reduced_quantity_values.append(prev_val)
-            else:
-                reduced_quantity_values.append(curr_val)
-            prev_val = curr_val
-
-        if len(set(reduced_quantity_values)) > 1:
-            formatted_dates = []
-            for col in quantity_columns:
-                match = re.search(r'Количество.*_(\d{4})-(\d{2})-(\d{2})_(\d{2})-(\d{2})(?:.*?)$', col)
-                if match:
-                    month = match.group(2)
-                    day = match.group(3)
-                    hour = match.group(4)
-                    minute = match.group(5)
-                    formatted_date = f"{month}-{day}_{hour}-{minute}"
-                    formatted_dates.append(formatted_date)
-                else:
-                    formatted_dates.append('')
-
-            plot_df = pd.DataFrame({
-                'Дата и время': formatted_dates,
-                'Количество': reduced_quantity_values
-            })
-            plot_df = plot_df[plot_df['Дата и время'] != '']
-            plot_df['Дата и время_DT'] = pd.to_datetime(plot_df['Дата и время'], format="%m-%d_%H-%M")
-            plot_df.sort_values('Дата и время_DT', inplace=True)
-
-            fig = go.Figure()
-            fig.add_trace(go.Scatter(
-                x=plot_df['Дата и время'],
-                y=plot_df['Количество'],
-                mode='lines+markers',
-                name='Количество',
-                line_shape='spline',
-                line=dict(smoothing=1.3),
-                marker=dict(size=6)
-            ))
-
-            # Добавляем маркеры для новых сегментов
-            for idx in segment_change_indices:
-                if idx < len(plot_df):
-                    fig.add_trace(go.Scatter(
-                        x=[plot_df['Дата и время'].iloc[idx]],
-                        y=[plot_df['Количество'].iloc[idx]],
-                        mode='markers',
-                        marker=dict(size=10, color='yellow'),
-                        name='Новый сегмент'
-                    ))
-
-            fig.update_layout(
-                title=f"Динамика количества - Строка {index}",
-                xaxis_title="Дата и время",
-                yaxis_title="Количество",
-                xaxis=dict(tickangle=45),
-                template='plotly_white',
-                width=800,
-                height=500
-            )
-
-            graph_file_name = f"{file_name.replace('.xlsx', '').replace('.xls', '')}_row_{index}_graph.html"
-            graph_file_path = os.path.join(graphs_dir, graph_file_name)
-            fig.write_html(graph_file_path)
-
-            relative_graph_path = os.path.join("graphs", graph_file_name)
-            link = '=HYPERLINK("{}", "{}")'.format(relative_graph_path, "Показать")
-            df_filtered.at[index, "Ссылка на график"] = link
-
-    # Сохраняем Excel-файл с подсветкой новых сегментов
-    with pd.ExcelWriter(output_file_path, engine='openpyxl') as writer:
-        df_filtered.to_excel(writer, index=False, sheet_name='Data')
-        workbook = writer.book
-        worksheet = writer.sheets['Data']
-
-        # Получаем индексы столбцов с количеством
-        quantity_col_indices = [df_filtered.columns.get_loc(col) + 1 for col in quantity_columns if col in df_filtered.columns]
-
-        for row_idx, row in enumerate(df_filtered.itertuples(), start=2):
-            segment_change_indices = segment_change_indices_list.loc[row.Index]
-            for idx in segment_change_indices:
-                if idx < len(quantity_col_indices):
-                    col_idx = quantity_col_indices[idx]
-                    cell = worksheet.cell(row=row_idx, column=col_idx)
-                    cell.fill = yellow_fill
-
-        # Если необходимо скрыть столбцы с количеством
-        if hide_quantity_columns:
-            for col_idx in quantity_col_indices:
-                col_letter = worksheet.cell(row=1, column=col_idx).column_letter
-                worksheet.column_dimensions[col_letter].hidden = True
+    # Генерация графиков: подписи дат разбираются один раз на файл,
+    # остатки без повышений считаются сразу для всех строк
+    table_name = file_name.replace('.xlsx', '').replace('.xls', '')
+    dates, date_order = chart_dates(quantity_columns)
+    reduced = reduced_quantities(df_filtered[quantity_columns].to_numpy(dtype=float))
+    chart_mask = has_dynamics(reduced)
+    dashboard_rows = []
+    chart_specs = {}
+    links = []
+
+    for index, position, quantities in zip(df_filtered.index[chart_mask], row_positions[df_filtered.index[chart_mask]],
+                                           reduced[chart_mask]):
+        segment_change_indices = segment_changes.row(position)
+        quantities = quantities[date_order]
+
+        if graph_output == 'html':
+            # Сами графики строит общий этап render_charts после обработки всех файлов
+            graph_file_name, spec = chart_spec(dates, quantities, segment_change_indices)
+            chart_specs[graph_file_name] = spec
+            links.append(graph_link(os.path.join("graphs", graph_file_name), "Показать"))
+        elif graph_output == 'server':
+            # График построит chart_server.py по исходной таблице pre_ans
+            links.append(server_link('pre_ans', table_name, index))
+        else:
+            dashboard_rows.append((index, quantities, segment_change_indices))
+            links.append(dashboard_link(table_name, index))
+
+    if dashboard_rows:
+        write_dashboard_data(graphs_dir, table_name, dates, dashboard_rows)
+    df_filtered.loc[df_filtered.index[chart_mask], "Ссылка на график"] = links
+
+    # Сохраняем Excel-файл с подсветкой новых сегментов: желтые ячейки задаются маской
+    quantity_col_positions = np.array([df_filtered.columns.get_loc(col) for col in quantity_columns if col in df_filtered.columns])
+    rows, change_indices = segment_changes.take(row_positions[df_filtered.index].to_numpy()).coo()
+    inside = change_indices < len(quantity_col_positions)
+    highlight = highlight_mask(df_filtered.shape, rows[inside], quantity_col_positions[change_indices[inside]])
+
+    # Если необходимо скрыть столбцы с количеством
+    hidden_columns = [col for col in quantity_columns if col in df_filtered.columns] if hide_quantity_columns else []
+    write_excel(output_file_path, [ExcelSheet('Data', df_filtered, highlight, fill_color=YELLOW_FILL,
+                                              hidden_columns=hidden_columns)])
 
     print(f"Результат сохранён: {output_file_path}")
+    return chart_specs, len(df)
+
+def _process_file_task(task):
+    # Ошибка в одном файле не должна останавливать обработку остальных
+    file_name, df, kwargs = task
+    try:
+        return file_name, process_file(file_name, df=df, **kwargs), None
+    except Exception as e:
+        return file_name, None, e
+
+
+def sort_and_plot(input_folder, output_folder, frames=None, hide_quantity_columns=True, pool=None):
+    # frames - {имя файла pre_ans: таблица} из шага 4, если они уже в памяти
+    frames = frames or {}
+    graphs_dir = os.path.join(output_folder, "graphs")
+    os.makedirs(output_folder, exist_ok=True)
+    os.makedirs(graphs_dir, exist_ok=True)
+    graph_output = charts.GRAPH_OUTPUT
+    if graph_output == 'dashboard':
+        write_viewer(graphs_dir)
+
+    file_list = set(frames)
+    if os.path.isdir(input_folder):
+        file_list.update(file_name for file_name in os.listdir(input_folder) if file_name.endswith((".xls", ".xlsx")))
+
+    kwargs = dict(input_folder=input_folder, output_folder=output_folder, graphs_dir=graphs_dir,
+                  hide_quantity_columns=hide_quantity_columns, graph_output=graph_output)
+    tasks = [(file_name, frames.get(file_name), kwargs) for file_name in sorted(file_list)]
+    chart_specs = {}
+    with worker_pool(pool) as workers:
+        for file_name, result, error in workers.imap_unordered(_process_file_task, tasks):
+            if error is not None:
+                print(f"Ошибка при обработке файла {file_name}: {error}")
+            if result is not None:
+                file_charts, rows = result
+                chart_specs.update(file_charts)
+                count_rows(rows)
+
+        if chart_specs:
+            rendered = render_charts(chart_specs, graphs_dir, pool=workers)
+            print(f"Графиков: {len(chart_specs)}, построено новых: {rendered}")
+
+    print(f"Все файлы обработаны. Результаты сохранены в папке: {output_folder}")
+
 
 # Основной скрипт
 input_folder = "Datasets/pre_ans"
 output_folder = "Datasets/pre_ans_sorted_graph"
-graphs_dir = os.path.join(output_folder, "graphs")
-os.makedirs(output_folder, exist_ok=True)
-os.makedirs(graphs_dir, exist_ok=True)
-
-file_list = [file_name for file_name in os.listdir(input_folder) if file_name.endswith((".xls", ".xlsx"))]
-
-with ProcessPoolExecutor() as executor:
-    func = partial(process_file, input_folder=input_folder, output_folder=output_folder,
-                   graphs_dir=graphs_dir, hide_quantity_columns=True)  # Устанавливаем флаг в True
-    executor.map(func, file_list)
 
-print(f"Все файлы обработаны. Результаты сохранены в папке: {output_folder}")
+if __name__ == "__main__":
+    sort_and_plot(input_folder, output_folder, hide_quantity_columns=True)  # Устанавливаем флаг в True
@@ -1,29 +1,18 @@
 import os
-import re
 import pandas as pd
-import plotly.graph_objects as go
-
-# Input directory containing the Excel files
-input_dir = "Datasets/pre_ans_sorted_new"
-
-# Output directory for updated Excel files
-output_dir = "Datasets/pre_ans_sorted_graph"
-os.makedirs(output_dir, exist_ok=True)
-
-# Directory for saving HTML graphs
-graphs_dir = os.path.join(output_dir, "graphs")
-os.makedirs(graphs_dir, exist_ok=True)
-
-# Get a list of all Excel files in the input directory
-excel_files = [file for file in os.listdir(input_dir) if file.endswith((".xlsx", ".xls"))]
-total_files = len(excel_files)
-
-print(f"Found {total_files} Excel files to process.")
-
-# Iterate through each Excel file
-for i, file_name in enumerate(excel_files, start=1):
+import charts
+from charts import (chart_dates, chart_spec, dashboard_link, graph_link, has_dynamics,
+                    render_charts, server_link, write_dashboard_data, write_viewer)
+from worker_pool import worker_pool
+from metrics import count_rows
+
+
+def process_file(file_name, input_dir, output_dir, graphs_dir, graph_output=None):
+    # Adds graph links to one file and returns the output path, the charts it needs
+    # ({file name: spec} for 'html' mode) and the number of rows.
+    # The graph mode is read from charts.GRAPH_OUTPUT at call time, not at import time
+    graph_output = graph_output or charts.GRAPH_OUTPUT
     file_path = os.path.join(input_dir, file_name)
-    print(f"Processing file {i}/{total_files}: {file_name}...")
 
     # Read the Excel file into a pandas DataFrame
     df = pd.read_excel(file_path)
@@ -34,78 +23,34 @@ for i, file_name in enumerate(excel_files, start=1):
     # Initialize the new column for graph links
     df["Ссылка на график"] = ""
 
-    # Iterate through each row to calculate dynamics and generate a graph if needed
-    for index, row in df.iterrows():
-        quantity_values = row[quantity_columns].values
-
-        # Check for meaningful dynamics (e.g., non-constant values)
-        if len(set(quantity_values)) > 1:
-            # Extract date and time from the column names and format as MM-DD_HH-MM
-            formatted_dates = []
-            for col in quantity_columns:
-                # Use regex to extract the date and time
-                match = re.search(r'Количество.*_(\d{4})-(\d{2})-(\d{2})_(\d{2})-(\d{2})(?:.*?)$', col)
-                if match:
-                    # Extract month, day, hour, minute
-                    month = match.group(2)
-                    day = match.group(3)
-                    hour = match.group(4)
-                    minute = match.group(5)
-                    formatted_date = f"{month}-{day}_{hour}-{minute}"
-                    formatted_dates.append(formatted_date)
-                else:
-                    # Handle cases where the pattern doesn't match
-                    formatted_dates.append('')
-
-            # Create a DataFrame for plotting
-            plot_df = pd.DataFrame({
-                'Дата и время': formatted_dates,
-                'Количество': quantity_values
-            })
-
-            # Exclude any rows with empty date strings
-            plot_df = plot_df[plot_df['Дата и время'] != '']
-
-            # Convert to datetime for sorting
-            plot_df['Дата и время_DT'] = pd.to_datetime(plot_df['Дата и время'], format="%m-%d_%H-%M")
-
-            # Sort the DataFrame by date
-            plot_df.sort_values('Дата и время_DT', inplace=True)
-
-            # Use smooth lines for the plot
-            fig = go.Figure()
-            fig.add_trace(go.Scatter(
-                x=plot_df['Дата и время'],
-                y=plot_df['Количество'],
-                mode='lines+markers',
-                name='Количество',
-                line_shape='spline',
-                line=dict(smoothing=1.3),
-                marker=dict(size=6)
-            ))
-
-            # Update layout for visual appeal
-            fig.update_layout(
-                title=f"Динамика количества - Строка {index}",
-                xaxis_title="Дата и время",
-                yaxis_title="Количество",
-                xaxis=dict(tickangle=45),
-                template='plotly_white',
-                width=800,
-                height=500
-            )
-
-            # Save the figure as an HTML file
-            graph_file_name = f"{file_name.replace('.xlsx', '').replace('.xls', '')}_row_{index}_graph.html"
-            graph_file_path = os.path.join(graphs_dir, graph_file_name)
-            fig.write_html(graph_file_path)
-
-            # Add the link to the graph in the DataFrame
-            # For LibreOffice, we can use relative paths
-            relative_graph_path = os.path.join("graphs", graph_file_name)
-            # Create a hyperlink formula (LibreOffice should recognize the HYPERLINK formula)
-            link = '=HYPERLINK("{}", "{}")'.format(relative_graph_path, "Открыть график")
-            df.at[index, "Ссылка на график"] = link
+    # Date labels are parsed once per file, not per row and column
+    table_name = file_name.replace('.xlsx', '').replace('.xls', '')
+    dates, date_order = chart_dates(quantity_columns)
+    # Empty cells count as 0, as in 5_get_ans_to_one.py
+    quantities = df[quantity_columns].apply(pd.to_numeric, errors='coerce').fillna(0).to_numpy(dtype=float)
+
+    # Check for meaningful dynamics (e.g., non-constant values) for all rows at once
+    chart_mask = has_dynamics(quantities)
+    values = quantities[chart_mask][:, date_order]
+
+    chart_specs = {}
+    dashboard_rows = []
+    links = []
+    for index, row_values in zip(df.index[chart_mask], values):
+        if graph_output == 'html':
+            graph_file_name, spec = chart_spec(dates, row_values)
+            chart_specs[graph_file_name] = spec
+            links.append(graph_link(os.path.join("graphs", graph_file_name), "Открыть график"))
+        elif graph_output == 'server':
+            # Only write a link; chart_server.py renders the chart on request
+            links.append(server_link('pre_ans_sorted_new', table_name, index, "Открыть график"))
+        else:
+            dashboard_rows.append((index, row_values, ()))
+            links.append(dashboard_link(table_name, index, "Открыть график"))
+
+    if dashboard_rows:
+        write_dashboard_data(graphs_dir, table_name, dates, dashboard_rows)
+    df.loc[df.index[chart_mask], "Ссылка на график"] = links
 
     # Save the updated DataFrame to the new output directory
     output_file_path = os.path.join(output_dir, f"updated_{file_name}")
@@ -118,8 +63,64 @@ for i, file_name in enumerate(excel_files, start=1):
         # Format the "Ссылка на график" column as hyperlinks
         link_format = workbook.add_format({'font_color': 'blue', 'underline': 1})
         for row_num, cell_value in enumerate(df['Ссылка на график'], start=1):  # start=1 to account for header row
-            worksheet.write_formula(row_num, df.columns.get_loc('Ссылка на график'), cell_value, link_format)
+            # Rows without dynamics have no link (an empty formula is rejected by xlsxwriter)
+            if cell_value:
+                worksheet.write_formula(row_num, df.columns.get_loc('Ссылка на график'), cell_value, link_format)
+
+    return output_file_path, chart_specs, len(df)
+
+
+def _process_file_task(task):
+    # An error in one file must not stop the others
+    file_name, kwargs = task
+    try:
+        return file_name, process_file(file_name, **kwargs), None
+    except Exception as e:
+        return file_name, None, e
+
+
+def add_graph_links(input_dir, output_dir, pool=None):
+    # Directory for saving HTML graphs (shared with 5_get_ans_to_one.py)
+    graphs_dir = os.path.join(output_dir, "graphs")
+    os.makedirs(output_dir, exist_ok=True)
+    os.makedirs(graphs_dir, exist_ok=True)
+    graph_output = charts.GRAPH_OUTPUT
+    if graph_output == 'dashboard':
+        write_viewer(graphs_dir)
+
+    # Get a list of all Excel files in the input directory
+    excel_files = [file for file in os.listdir(input_dir) if file.endswith((".xlsx", ".xls"))]
+    total_files = len(excel_files)
+
+    print(f"Found {total_files} Excel files to process.")
+
+    # Files are processed in parallel; charts are rendered afterwards by the shared stage,
+    # so a series already rendered by step 5 or by another file is not rendered again
+    kwargs = dict(input_dir=input_dir, output_dir=output_dir, graphs_dir=graphs_dir, graph_output=graph_output)
+    chart_specs = {}
+    with worker_pool(pool) as workers:
+        results = workers.imap_unordered(_process_file_task, [(file_name, kwargs) for file_name in excel_files])
+        for i, (file_name, result, error) in enumerate(results, start=1):
+            if error is not None:
+                print(f"Error while processing {file_name}: {error}")
+                continue
+            output_file_path, file_charts, rows = result
+            chart_specs.update(file_charts)
+            count_rows(rows)
+            print(f"File {i}/{total_files} processed and saved as: {output_file_path}")
+
+        if chart_specs:
+            rendered = render_charts(chart_specs, graphs_dir, pool=workers)
+            print(f"Graphs: {len(chart_specs)}, newly rendered: {rendered}")
+
+    print(f"All files have been processed and saved in: {output_dir}")
+
+
+# Input directory containing the Excel files
+input_dir = "Datasets/pre_ans_sorted_new"
 
-    print(f"File {i}/{total_files} processed and saved as: {output_file_path}")
+# Output directory for updated Excel files
+output_dir = "Datasets/pre_ans_sorted_graph"
 
-print(f"All files have been processed and saved in: {output_dir}")
+if __name__ == "__main__":
+    add_graph_links(input_dir, output_dir)
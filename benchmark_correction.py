@@ -0,0 +1,46 @@
+import argparse
+import time
+import pandas as pd
+from corrections import check_and_correct_values, check_and_correct_values_loop
+from synthetic_data import make_pre_ans
+
+
+def check_equivalence(num_rows, num_snapshots):
+    df = make_pre_ans(num_rows, num_snapshots)
+    expected, expected_cells = check_and_correct_values_loop(df.copy())
+    actual, actual_cells = check_and_correct_values(df.copy())
+    pd.testing.assert_frame_equal(expected, actual)
+    assert set(expected_cells) == set(actual_cells), "Маски исправленных ячеек не совпадают"
+    return len(set(actual_cells))
+
+
+def measure(function, df, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        data = df.copy()
+        start = time.perf_counter()
+        function(data)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Сравнение построчной и векторной версий check_and_correct_values")
+    arg_parser.add_argument('--rows', type=int, nargs='+', default=[500, 5000, 20000])
+    arg_parser.add_argument('--snapshots', type=int, default=270, help="9 снимков в день x 30 дней")
+    arg_parser.add_argument('--repeat', type=int, default=3)
+    arg_parser.add_argument('--loop-max-rows', type=int, default=5000,
+                            help="построчная версия запускается только до этого числа строк")
+    args = arg_parser.parse_args()
+
+    corrected = check_equivalence(300, 60)
+    print(f"Результаты совпадают (проверено на 300 x 60, исправлено ячеек: {corrected})")
+
+    for num_rows in args.rows:
+        df = make_pre_ans(num_rows, args.snapshots)
+        vectorised = measure(check_and_correct_values, df, args.repeat)
+        line = f"{num_rows:>7} x {args.snapshots}: векторно {vectorised:8.3f} с"
+        if num_rows <= args.loop_max_rows:
+            loop = measure(check_and_correct_values_loop, df, 1)
+            line += f", построчно {loop:8.3f} с, ускорение x{loop / vectorised:.0f}"
+        print(line)
@@ -0,0 +1,40 @@
+import argparse
+import time
+from synthetic_data import make_pre_ans
+from corrections import get_quantity_columns
+from sales_metrics import calculate_metrics, calculate_metrics_row
+
+# Совпадение с построчным расчетом проверяет tests/test_sales_metrics.py
+
+
+def measure(function, values, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(values)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def metrics_by_rows(values):
+    return [calculate_metrics_row(row) for row in values]
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Сравнение построчной и векторной версий calculate_metrics")
+    arg_parser.add_argument('--rows', type=int, nargs='+', default=[500, 5000, 20000])
+    arg_parser.add_argument('--snapshots', type=int, default=270, help="9 снимков в день x 30 дней")
+    arg_parser.add_argument('--repeat', type=int, default=3)
+    arg_parser.add_argument('--loop-max-rows', type=int, default=5000,
+                            help="построчная версия запускается только до этого числа строк")
+    args = arg_parser.parse_args()
+
+    for num_rows in args.rows:
+        df = make_pre_ans(num_rows, args.snapshots)
+        values = df[get_quantity_columns(df)].to_numpy()
+        vectorised = measure(calculate_metrics, values, args.repeat)
+        line = f"{num_rows:>7} x {args.snapshots}: векторно {vectorised:8.3f} с"
+        if num_rows <= args.loop_max_rows:
+            loop = measure(metrics_by_rows, values, 1)
+            line += f", построчно {loop:8.3f} с, ускорение x{loop / vectorised:.0f}"
+        print(line)
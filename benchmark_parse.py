@@ -0,0 +1,94 @@
+import argparse
+import json
+import os
+import time
+from parse_backends import BACKENDS, DEFAULT_BACKEND, extract_items
+
+# Папка со страницами в разметке tabletka.by (*.html).
+# Рядом со страницей лежит эталонный результат разбора <имя>.json
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tests', 'fixtures', 'html')
+
+
+def load_fixtures(fixtures_dir):
+    # Пустой список, если папки нет
+    fixtures = []
+    if not os.path.isdir(fixtures_dir):
+        return fixtures
+    for file_name in sorted(os.listdir(fixtures_dir)):
+        if not file_name.endswith('.html'):
+            continue
+        with open(os.path.join(fixtures_dir, file_name), encoding='utf-8') as f:
+            fixtures.append((file_name, f.read()))
+    return fixtures
+
+
+def golden_path(fixtures_dir, file_name):
+    return os.path.join(fixtures_dir, os.path.splitext(file_name)[0] + '.json')
+
+
+def update_golden(fixtures_dir, fixtures, reference='bs4'):
+    # Эталон строится движком BeautifulSoup, на котором написан исходный parse_table
+    for file_name, html_content in fixtures:
+        with open(golden_path(fixtures_dir, file_name), 'w', encoding='utf-8') as f:
+            json.dump(extract_items(html_content, BACKENDS[reference]), f, ensure_ascii=False, indent=1)
+        print(f"Эталон сохранен: {golden_path(fixtures_dir, file_name)}")
+
+
+def check_golden(fixtures_dir, fixtures):
+    # Возвращает список расхождений (движок, файл)
+    mismatches = []
+    for file_name, html_content in fixtures:
+        path = golden_path(fixtures_dir, file_name)
+        if not os.path.exists(path):
+            print(f"Нет эталона для {file_name}, пропускаю проверку.")
+            continue
+        with open(path, encoding='utf-8') as f:
+            expected = json.load(f)
+        for name, backend in BACKENDS.items():
+            if extract_items(html_content, backend) != expected:
+                mismatches.append((name, file_name))
+    return mismatches
+
+
+def benchmark(fixtures, repeat):
+    results = {}
+    for name, backend in BACKENDS.items():
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for _, html_content in fixtures:
+                extract_items(html_content, backend)
+        elapsed = time.perf_counter() - start
+        results[name] = elapsed / (repeat * len(fixtures))
+    return results
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Сравнение движков разбора parse_table")
+    arg_parser.add_argument('fixtures_dir', nargs='?', default=FIXTURES_DIR)
+    arg_parser.add_argument('--repeat', type=int, default=5)
+    arg_parser.add_argument('--update-golden', action='store_true',
+                            help="пересоздать эталонные .json по движку bs4")
+    args = arg_parser.parse_args()
+
+    fixtures = load_fixtures(args.fixtures_dir)
+    if not fixtures:
+        print(f"Нет сохраненных страниц .html: папка {args.fixtures_dir} отсутствует или пуста")
+        raise SystemExit(1)
+
+    if args.update_golden:
+        update_golden(args.fixtures_dir, fixtures)
+
+    # Ошибкой считается только расхождение движка по умолчанию: остальные включаются явно
+    mismatches = check_golden(args.fixtures_dir, fixtures)
+    default_mismatches = [m for m in mismatches if m[0] == DEFAULT_BACKEND]
+    for name, file_name in mismatches:
+        kind = "Ошибка" if name == DEFAULT_BACKEND else "Предупреждение"
+        print(f"{kind}: движок {name} дал результат, отличный от эталона, на {file_name}")
+
+    results = benchmark(fixtures, args.repeat)
+    baseline = results['bs4']
+    print(f"Страниц: {len(fixtures)}, повторов: {args.repeat}")
+    for name, seconds in sorted(results.items(), key=lambda x: x[1]):
+        print(f"{name:>8}: {seconds * 1000:8.2f} мс на страницу, ускорение x{baseline / seconds:.1f}")
+
+    raise SystemExit(1 if default_mismatches else 0)
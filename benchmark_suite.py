@@ -0,0 +1,248 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import pipeline
+from corrections import check_and_correct_values
+from excel_export import EXCEL_ENGINE, YELLOW_FILL, ExcelSheet, highlight_mask, write_excel, xlsxwriter
+from fake_site import FakeSite, start_fake_site
+from metrics import get_metrics, stage
+from parse_backends import BACKENDS
+from parser import HostLimiter, get_all_pages, parse_table
+from sales_metrics import calculate_metrics
+from synthetic_data import ITEMS_PER_PAGE, make_page_html, make_pre_ans, make_snapshot_history, page_count
+from worker_pool import worker_pool
+
+# Результаты пишутся в Datasets/benchmarks/bench_<время>.json
+BENCHMARK_DIR = os.path.join('Datasets', 'benchmarks')
+
+# Масштаб -> размеры данных:
+# pages - страниц для разбора, skus/snapshots/pharmacies - история снимков для шагов 2-5,
+# rows - строк pre_ans для исправления, метрик и Excel (снимков столько же, сколько в snapshots),
+# positions - позиций каталога для обхода локального сайта
+SCALES = {
+    'small': {'pages': 20, 'skus': 500, 'snapshots': 27, 'pharmacies': 2, 'rows': 2000, 'positions': 400},
+    'medium': {'pages': 100, 'skus': 2000, 'snapshots': 90, 'pharmacies': 4, 'rows': 10000, 'positions': 2000},
+    'large': {'pages': 300, 'skus': 5000, 'snapshots': 270, 'pharmacies': 8, 'rows': 50000, 'positions': 10000},
+}
+
+# Частота запросов при обходе локального сайта: ограничитель не должен быть узким местом
+CRAWL_RATE = 1000000.0
+
+
+def best_time(function, repeat):
+    # Лучшее время из repeat запусков и результат последнего
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def per_second(count, seconds):
+    return count / seconds if seconds > 0 else None
+
+
+def bench_parse(num_pages, repeat):
+    pages = [make_page_html(num_pages * ITEMS_PER_PAGE, page) for page in range(1, num_pages + 1)]
+    total_bytes = sum(len(html.encode('utf-8')) for html in pages)
+    results = {}
+    for name in BACKENDS:
+        seconds, rows = best_time(lambda: sum(len(parse_table(html, name)) for html in pages), repeat)
+        results[name] = {
+            'pages': num_pages,
+            'rows': rows,
+            'bytes_per_page': total_bytes / num_pages,
+            'seconds': seconds,
+            'seconds_per_page': seconds / num_pages,
+            'rows_per_second': per_second(rows, seconds),
+        }
+    return results
+
+
+def bench_frame_functions(num_rows, num_snapshots, repeat):
+    df = make_pre_ans(num_rows, num_snapshots)
+    quantity_columns = [column for column in df.columns if column.startswith('Количество')]
+    values = df[quantity_columns].to_numpy(dtype=float)
+
+    correction_seconds, (_, corrected_cells) = best_time(lambda: check_and_correct_values(df.copy()), repeat)
+    metrics_seconds, _ = best_time(lambda: calculate_metrics(values), repeat)
+    return {
+        'check_and_correct_values': {
+            'rows': num_rows, 'snapshots': num_snapshots, 'corrected_cells': len(set(corrected_cells)),
+            'seconds': correction_seconds, 'rows_per_second': per_second(num_rows, correction_seconds),
+        },
+        'calculate_metrics': {
+            'rows': num_rows, 'snapshots': num_snapshots,
+            'seconds': metrics_seconds, 'rows_per_second': per_second(num_rows, metrics_seconds),
+        },
+    }
+
+
+def bench_excel(num_rows, num_snapshots, workdir):
+    # Таблица, похожая на результат шага 5: текстовые столбцы, остатки и подсветка ~2% ячеек
+    df = make_pre_ans(num_rows, num_snapshots)
+    rng = np.random.default_rng(0)
+    rows, columns = np.nonzero(rng.random(df.shape) < 0.02)
+    highlight = highlight_mask(df.shape, rows, columns)
+    engines = ['xlsxwriter', 'openpyxl'] if xlsxwriter is not None else ['openpyxl']
+
+    results = {}
+    for engine in engines:
+        path = os.path.join(workdir, f"bench_{engine}.xlsx")
+        start = time.perf_counter()
+        write_excel(path, [ExcelSheet('Data', df, highlight, fill_color=YELLOW_FILL)], engine=engine)
+        seconds = time.perf_counter() - start
+        results[engine] = {
+            'rows': num_rows, 'columns': df.shape[1], 'default': engine == EXCEL_ENGINE,
+            'seconds': seconds, 'rows_per_second': per_second(num_rows, seconds),
+            'file_bytes': os.path.getsize(path),
+        }
+        os.remove(path)
+    return results
+
+
+def bench_steps(num_skus, num_snapshots, num_pharmacies, pool):
+    # Шаги 2-5 на синтетической истории в текущей папке (как run_pipeline, с общим пулом)
+    start = time.perf_counter()
+    our_file = make_snapshot_history('.', num_skus, num_snapshots, num_pharmacies)
+    results = {'history': {
+        'skus': num_skus, 'snapshots': num_snapshots, 'pharmacies': num_pharmacies,
+        'seconds': time.perf_counter() - start,
+    }}
+
+    steps = [
+        ('find_differences', lambda: pipeline.find_differences(our_file, pool=pool)),
+        ('build_lists_for_analysis', lambda: pipeline.build_lists_for_analysis(pool)),
+        ('generate_pre_ans_table', lambda: pipeline.generate_pre_ans_table(lists=lists, pool=pool)),
+        ('sort_and_plot', lambda: pipeline.sort_and_plot(frames=frames, pool=pool)),
+    ]
+    lists = frames = None
+    for name, run in steps:
+        with stage(name):
+            result = run()
+        if name == 'build_lists_for_analysis':
+            lists = result
+        elif name == 'generate_pre_ans_table':
+            frames = result
+        results[name] = get_metrics().stages[-1]
+    return results
+
+
+async def crawl_fake_site(num_positions, concurrency, latency, label):
+    # Два обхода локального сайта: холодный (все страницы скачиваются и разбираются)
+    # и повторный с кэшем страниц (сайт отвечает 304)
+    site = FakeSite(num_positions, latency)
+    runner, base_url = await start_fake_site(site)
+    limiter = HostLimiter(concurrency, CRAWL_RATE)
+    results = {}
+    try:
+        for run in ('cold', 'cached'):
+            pharmacy = f"{label}_{run}"
+            requests, bytes_sent = site.requests, site.bytes_sent
+            start = time.perf_counter()
+            await get_all_pages(f"{base_url}/pharmacy/{label}", f"crawl_{pharmacy}.csv", limiter=limiter,
+                                show_progress=False, pharmacy=pharmacy)
+            seconds = time.perf_counter() - start
+            pages = page_count(num_positions)
+            results[run] = {
+                'positions': num_positions, 'pages': pages, 'concurrency': concurrency, 'latency': latency,
+                'requests': site.requests - requests, 'bytes': site.bytes_sent - bytes_sent,
+                'seconds': seconds,
+                'pages_per_second': per_second(pages, seconds),
+                'rows_per_second': per_second(num_positions, seconds),
+                'fetch_seconds': get_metrics().histogram_summary('crawl_fetch_seconds', pharmacy=pharmacy),
+                'parse_seconds': get_metrics().histogram_summary('crawl_parse_seconds', pharmacy=pharmacy),
+            }
+    finally:
+        await runner.cleanup()
+    return results
+
+
+def clean_workdir():
+    # Между масштабами удаляются все данные, кроме словаря товаров: его номера кэшируются в процессе
+    if not os.path.isdir('Datasets'):
+        return
+    for entry in os.listdir('Datasets'):
+        path = os.path.join('Datasets', entry)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+
+
+def run_suite(scales, repeat=3, processes=None, concurrency=8, latency=0.0, workdir=None):
+    results = {
+        'started': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'scales': {},
+    }
+    cwd = os.getcwd()
+    workdir = workdir or tempfile.mkdtemp(prefix='medicines_bench_')
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+    try:
+        with worker_pool(processes=processes) as pool:
+            for scale in scales:
+                params = SCALES[scale]
+                clean_workdir()
+                print(f"[{scale}] {params}")
+                scale_results = {'params': params}
+
+                scale_results['parse_table'] = bench_parse(params['pages'], repeat)
+                scale_results.update(bench_frame_functions(params['rows'], params['snapshots'], repeat))
+                scale_results['excel'] = bench_excel(params['rows'], params['snapshots'], workdir)
+                scale_results['steps'] = bench_steps(params['skus'], params['snapshots'], params['pharmacies'], pool)
+                scale_results['crawl'] = asyncio.run(crawl_fake_site(params['positions'], concurrency, latency, scale))
+
+                results['scales'][scale] = scale_results
+                print_summary(scale, scale_results)
+    finally:
+        os.chdir(cwd)
+    results['finished'] = datetime.now().isoformat(timespec='seconds')
+    return results, workdir
+
+
+def print_summary(scale, results):
+    lines = [f"  parse_table[{name}]: {value['seconds_per_page'] * 1000:.2f} мс/стр."
+             for name, value in results['parse_table'].items()]
+    for name in ('check_and_correct_values', 'calculate_metrics'):
+        lines.append(f"  {name}: {results[name]['seconds']:.3f} с")
+    lines += [f"  excel[{engine}]: {value['seconds']:.2f} с" for engine, value in results['excel'].items()]
+    lines += [f"  {name}: {value['seconds']:.2f} с, строк {value.get('rows', '-')}"
+              for name, value in results['steps'].items()]
+    lines += [f"  crawl[{run}]: {value['pages_per_second']:.0f} стр./с" for run, value in results['crawl'].items()]
+    print(f"[{scale}]\n" + "\n".join(lines))
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Бенчмарки разбора, шагов 2-5, Excel и обхода на синтетических данных")
+    arg_parser.add_argument('--scales', nargs='+', choices=sorted(SCALES), default=['small', 'medium'])
+    arg_parser.add_argument('--repeat', type=int, default=3, help="повторов для быстрых замеров (берется лучший)")
+    arg_parser.add_argument('--processes', type=int, default=None, help="размер пула для шагов 2-5")
+    arg_parser.add_argument('--concurrency', type=int, default=8, help="одновременных запросов при обходе")
+    arg_parser.add_argument('--latency', type=float, default=0.0, help="задержка ответа локального сайта, секунд")
+    arg_parser.add_argument('--workdir', help="папка для синтетических данных (по умолчанию временная, удаляется)")
+    arg_parser.add_argument('--output', help="файл результатов (по умолчанию Datasets/benchmarks/bench_<время>.json)")
+    args = arg_parser.parse_args()
+
+    results, workdir = run_suite(args.scales, args.repeat, args.processes, args.concurrency, args.latency, args.workdir)
+    if not args.workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    output = args.output or os.path.join(BENCHMARK_DIR, f"bench_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=1)
+    print(f"Результаты: {output}")
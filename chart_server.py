@@ -0,0 +1,169 @@
+import argparse
+import asyncio
+import html
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from aiohttp import web
+from plotly.offline import get_plotlyjs
+from charts import (CHART_SERVER_HOST, CHART_SERVER_PORT, build_figure, chart_dates, chart_title,
+                    reduced_quantities)
+from sales_metrics import calculate_metrics
+from snapshot_store import find_table, list_tables, read_table
+
+# Откуда сервер берет истории остатков: имя источника в ссылке -> (папка, режим графика).
+# 'reduced' - как в шаге 5: без повышений и с маркерами новых сегментов; 'raw' - как в шаге 6
+CHART_SOURCES = {
+    'pre_ans': (os.path.join('Datasets', 'pre_ans'), 'reduced'),
+    'pre_ans_sorted_new': (os.path.join('Datasets', 'pre_ans_sorted_new'), 'raw'),
+}
+
+# Сколько готовых графиков и прочитанных таблиц держать в памяти
+CHART_CACHE_SIZE = 512
+TABLE_CACHE_SIZE = 16
+
+
+class LruCache:
+    # Графики строятся в потоках исполнителя, поэтому доступ под блокировкой
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            if key in self.items:
+                self.items.move_to_end(key)
+                self.hits += 1
+                return self.items[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self.lock:
+            self.items[key] = value
+            self.items.move_to_end(key)
+            while len(self.items) > self.max_size:
+                self.items.popitem(last=False)
+
+
+class QuantityHistory:
+    # Истории остатков одной таблицы: подписи дат, порядок столбцов и матрица значений
+    def __init__(self, path, mode):
+        df = read_table(path)
+        if mode == 'reduced':
+            quantity_columns = [col for col in df.columns if col.startswith("Количество")]
+        else:
+            quantity_columns = [col for col in df.columns if "Количество" in col]
+        values = df[quantity_columns].apply(pd.to_numeric, errors='coerce').fillna(0).to_numpy(dtype=float)
+
+        self.mode = mode
+        self.index = df.index
+        self.dates, self.date_order = chart_dates(quantity_columns)
+        self.segment_changes = None
+        if mode == 'reduced':
+            _, self.segment_changes = calculate_metrics(values)
+            values = reduced_quantities(values)
+        self.values = values
+
+    def figure(self, row):
+        position = self.index.get_loc(row)
+        quantities = self.values[position]
+        if len(np.unique(quantities)) < 2:
+            return None
+        marker_indices = self.segment_changes.row(position) if self.segment_changes is not None else ()
+        return build_figure(self.dates, quantities[self.date_order], chart_title(row), marker_indices)
+
+
+class ChartServer:
+    def __init__(self, sources=None, chart_cache_size=CHART_CACHE_SIZE, table_cache_size=TABLE_CACHE_SIZE):
+        self.sources = sources or CHART_SOURCES
+        self.charts = LruCache(chart_cache_size)
+        self.tables = LruCache(table_cache_size)
+        self.plotly_js = None
+
+    def table_path(self, source, table_name):
+        if source not in self.sources or os.sep in table_name or '/' in table_name:
+            return None
+        directory, _ = self.sources[source]
+        return find_table(directory, table_name)
+
+    def history(self, source, path):
+        # Таблица перечитывается, если файл изменился
+        key = (path, os.path.getmtime(path))
+        history = self.tables.get(key)
+        if history is None:
+            history = QuantityHistory(path, self.sources[source][1])
+            self.tables.put(key, history)
+        return history
+
+    def render(self, source, table_name, row):
+        # HTML графика или None, если строки нет или у нее нет динамики
+        path = self.table_path(source, table_name)
+        if path is None:
+            return None
+        key = (source, table_name, row, os.path.getmtime(path))
+        page = self.charts.get(key)
+        if page is None:
+            history = self.history(source, path)
+            if row not in history.index:
+                return None
+            fig = history.figure(row)
+            if fig is None:
+                return None
+            page = fig.to_html(include_plotlyjs='/plotly.min.js')
+            self.charts.put(key, page)
+        return page
+
+    async def handle_chart(self, request):
+        source = request.match_info['source']
+        table_name = request.match_info['table']
+        try:
+            row = int(request.match_info['row'])
+        except ValueError:
+            raise web.HTTPBadRequest(text="Номер строки должен быть целым числом")
+        loop = asyncio.get_running_loop()
+        # Чтение Excel и построение графика не должны останавливать цикл событий
+        page = await loop.run_in_executor(None, self.render, source, table_name, row)
+        if page is None:
+            raise web.HTTPNotFound(text=f"Нет графика: {source}/{table_name}/{row}")
+        return web.Response(text=page, content_type='text/html')
+
+    async def handle_plotly(self, request):
+        if self.plotly_js is None:
+            self.plotly_js = get_plotlyjs()
+        return web.Response(text=self.plotly_js, content_type='application/javascript',
+                            headers={'Cache-Control': 'max-age=86400'})
+
+    async def handle_index(self, request):
+        lines = ["<h1>Графики динамики остатков</h1>"]
+        for source, (directory, _) in self.sources.items():
+            tables = sorted(list_tables(directory)) if os.path.isdir(directory) else []
+            lines.append(f"<h2>{html.escape(source)}</h2><ul>")
+            lines.extend(f"<li>{html.escape(os.path.splitext(table)[0])}</li>" for table in tables)
+            lines.append("</ul>")
+        lines.append(f"<p>Графиков в кэше: {len(self.charts.items)}, "
+                     f"попаданий: {self.charts.hits}, промахов: {self.charts.misses}</p>")
+        return web.Response(text='\n'.join(lines), content_type='text/html')
+
+    def create_app(self):
+        app = web.Application()
+        app.router.add_get('/', self.handle_index)
+        app.router.add_get('/plotly.min.js', self.handle_plotly)
+        app.router.add_get('/chart/{source}/{table}/{row}', self.handle_chart)
+        return app
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Сервер графиков динамики остатков по запросу")
+    arg_parser.add_argument('--host', default=CHART_SERVER_HOST)
+    arg_parser.add_argument('--port', type=int, default=CHART_SERVER_PORT)
+    arg_parser.add_argument('--cache-size', type=int, default=CHART_CACHE_SIZE)
+    args = arg_parser.parse_args()
+
+    server = ChartServer(chart_cache_size=args.cache_size)
+    web.run_app(server.create_app(), host=args.host, port=args.port)
@@ -0,0 +1,309 @@
+import hashlib
+import json
+import os
+import re
+from urllib.parse import quote
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from plotly.offline import get_plotlyjs
+from worker_pool import chunk_size, worker_pool
+
+# Как выводить графики динамики остатков:
+# 'dashboard' - один файл данных на конкурента и общая страница viewer.html, которая рисует строку по запросу;
+# 'html'      - HTML-файл на каждый различный график; имя файла - хэш содержимого, поэтому
+#               одинаковые ряды (в том числе из шагов 5 и 6) строятся один раз;
+# 'server'    - только ссылки на chart_server.py, который строит график при открытии
+GRAPH_OUTPUT = 'dashboard'
+
+# Адрес сервера графиков для режима 'server'
+CHART_SERVER_HOST = '127.0.0.1'
+CHART_SERVER_PORT = 8050
+CHART_SERVER_URL = f'http://{CHART_SERVER_HOST}:{CHART_SERVER_PORT}'
+
+# Сколько процессов строят HTML-графики в режиме 'html'
+CHART_RENDER_WORKERS = os.cpu_count() or 1
+
+VIEWER_FILE_NAME = 'viewer.html'
+PLOTLY_FILE_NAME = 'plotly.min.js'
+DASHBOARD_DATA_DIR = 'data'
+
+DATE_PATTERN = r'Количество.*_(\d{4})-(\d{2})-(\d{2})_(\d{2})-(\d{2})(?:.*?)$'
+
+
+def chart_dates(quantity_columns):
+    # Подписи оси X (MM-DD_HH-MM) и порядок столбцов на графике; разбирается один раз на файл.
+    # Столбцы без даты в имени на график не попадают
+    formatted_dates = []
+    for col in quantity_columns:
+        match = re.search(DATE_PATTERN, col)
+        if match:
+            formatted_dates.append(f"{match.group(2)}-{match.group(3)}_{match.group(4)}-{match.group(5)}")
+        else:
+            formatted_dates.append('')
+
+    plot_df = pd.DataFrame({'Дата и время': formatted_dates})
+    plot_df = plot_df[plot_df['Дата и время'] != '']
+    plot_df['Дата и время_DT'] = pd.to_datetime(plot_df['Дата и время'], format="%m-%d_%H-%M")
+    plot_df.sort_values('Дата и время_DT', inplace=True)
+    return plot_df['Дата и время'].tolist(), plot_df.index.to_numpy()
+
+
+def reduced_quantities(values):
+    # Остатки без повышений: рост количества заменяется предыдущим значением
+    values = np.asarray(values, dtype=np.float64)
+    reduced = values.copy()
+    reduced[:, 1:] = np.minimum(values[:, 1:], values[:, :-1])
+    return reduced
+
+
+def has_dynamics(values):
+    # Строки, у которых на графике больше одного различного значения
+    values = np.asarray(values)
+    if values.shape[1] == 0:
+        return np.zeros(len(values), dtype=bool)
+    return values.max(axis=1) != values.min(axis=1)
+
+
+def chart_title(index=None):
+    # Без номера строки - для общих графиков, которые может использовать несколько строк
+    if index is None:
+        return "Динамика количества"
+    return f"Динамика количества - Строка {index}"
+
+
+def build_figure(dates, quantities, title, marker_indices=()):
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=dates,
+        y=quantities,
+        mode='lines+markers',
+        name='Количество',
+        line_shape='spline',
+        line=dict(smoothing=1.3),
+        marker=dict(size=6)
+    ))
+
+    # Добавляем маркеры для новых сегментов
+    for idx in marker_indices:
+        if idx < len(dates):
+            fig.add_trace(go.Scatter(
+                x=[dates[idx]],
+                y=[quantities[idx]],
+                mode='markers',
+                marker=dict(size=10, color='yellow'),
+                name='Новый сегмент'
+            ))
+
+    fig.update_layout(
+        title=title,
+        xaxis_title="Дата и время",
+        yaxis_title="Количество",
+        xaxis=dict(tickangle=45),
+        template='plotly_white',
+        width=800,
+        height=500
+    )
+    return fig
+
+
+def graph_link(relative_path, text):
+    return '=HYPERLINK("{}", "{}")'.format(relative_path, text)
+
+
+def dashboard_link(table_name, index, text="Показать"):
+    # Ссылка на строку в общей странице просмотра
+    return graph_link(f"graphs/{VIEWER_FILE_NAME}#file={table_name}&row={index}", text)
+
+
+def server_link(source, table_name, index, text="Показать"):
+    # Ссылка на график, который chart_server.py построит по запросу
+    return graph_link(f"{CHART_SERVER_URL}/chart/{quote(source)}/{quote(table_name)}/{index}", text)
+
+
+def _json_values(values):
+    # Целые остатки пишем без ".0", чтобы файл данных был компактнее
+    values = np.asarray(values, dtype=np.float64)
+    if np.isfinite(values).all() and (values == np.round(values)).all():
+        return values.astype(np.int64).tolist()
+    return values.tolist()
+
+
+def write_dashboard_data(graphs_dir, table_name, dates, rows):
+    # rows - список (метка строки, значения в порядке dates, индексы маркеров).
+    # Данные пишутся как JS-скрипт, чтобы страница открывалась и с диска (file://)
+    data_dir = os.path.join(graphs_dir, DASHBOARD_DATA_DIR)
+    os.makedirs(data_dir, exist_ok=True)
+    payload = {
+        'dates': dates,
+        'rows': {
+            str(index): [_json_values(quantities), [int(idx) for idx in marker_indices if idx < len(dates)]]
+            for index, quantities, marker_indices in rows
+        },
+    }
+    data_path = os.path.join(data_dir, f"{table_name}.js")
+    temp_path = data_path + '.part'
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        file.write(f"registerChartData({json.dumps(table_name, ensure_ascii=False)}, ")
+        json.dump(payload, file, ensure_ascii=False, separators=(',', ':'))
+        file.write(");\n")
+    os.replace(temp_path, data_path)
+    return data_path
+
+
+VIEWER_TEMPLATE = """<!DOCTYPE html>
+<html lang="ru">
+<head>
+<meta charset="utf-8">
+<title>Динамика количества</title>
+<script src="__PLOTLY__"></script>
+<style>
+body { font-family: sans-serif; margin: 16px; }
+#controls input { width: 320px; }
+#message { color: #a00; margin-top: 8px; }
+</style>
+</head>
+<body>
+<div id="controls">
+  Файл: <input id="file" list="files"> Строка: <input id="row" style="width: 80px">
+  <button onclick="showFromInputs()">Показать</button>
+</div>
+<div id="message"></div>
+<div id="chart"></div>
+<script>
+var chartData = {};
+
+function registerChartData(name, data) {
+  chartData[name] = data;
+}
+
+function params() {
+  var result = {};
+  location.hash.replace(/^#/, '').split('&').forEach(function (part) {
+    var pair = part.split('=');
+    if (pair[0]) result[decodeURIComponent(pair[0])] = decodeURIComponent(pair[1] || '');
+  });
+  return result;
+}
+
+function loadData(name, callback) {
+  if (chartData[name]) return callback();
+  var script = document.createElement('script');
+  script.src = '__DATA_DIR__/' + encodeURIComponent(name) + '.js';
+  script.onload = callback;
+  script.onerror = function () { showMessage('Нет данных для файла ' + name); };
+  document.head.appendChild(script);
+}
+
+function showMessage(text) {
+  document.getElementById('message').textContent = text;
+}
+
+function draw(name, row) {
+  var data = chartData[name];
+  var values = data && data.rows[row];
+  if (!values) {
+    Plotly.purge('chart');
+    return showMessage('Нет графика для строки ' + row);
+  }
+  showMessage('');
+  var quantities = values[0];
+  var traces = [{
+    x: data.dates, y: quantities, mode: 'lines+markers', name: 'Количество',
+    line: {shape: 'spline', smoothing: 1.3}, marker: {size: 6}
+  }];
+  values[1].forEach(function (idx) {
+    traces.push({
+      x: [data.dates[idx]], y: [quantities[idx]], mode: 'markers',
+      marker: {size: 10, color: 'yellow'}, name: 'Новый сегмент'
+    });
+  });
+  Plotly.react('chart', traces, {
+    title: {text: 'Динамика количества - Строка ' + row},
+    xaxis: {title: {text: 'Дата и время'}, tickangle: 45},
+    yaxis: {title: {text: 'Количество'}},
+    template: 'plotly_white', width: 800, height: 500
+  });
+}
+
+function showFromHash() {
+  var p = params();
+  if (!p.file) return;
+  document.getElementById('file').value = p.file;
+  document.getElementById('row').value = p.row || '';
+  loadData(p.file, function () { draw(p.file, p.row); });
+}
+
+function showFromInputs() {
+  location.hash = 'file=' + encodeURIComponent(document.getElementById('file').value) +
+    '&row=' + encodeURIComponent(document.getElementById('row').value);
+}
+
+window.addEventListener('hashchange', showFromHash);
+showFromHash();
+</script>
+</body>
+</html>
+"""
+
+
+def write_plotly_js(graphs_dir):
+    # plotly.js пишется один раз на папку графиков, страницы ссылаются на него
+    os.makedirs(graphs_dir, exist_ok=True)
+    plotly_path = os.path.join(graphs_dir, PLOTLY_FILE_NAME)
+    if not os.path.exists(plotly_path):
+        temp_path = plotly_path + f'.{os.getpid()}.part'
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            file.write(get_plotlyjs())
+        os.replace(temp_path, plotly_path)
+    return plotly_path
+
+
+def write_viewer(graphs_dir):
+    # Общая страница просмотра
+    write_plotly_js(graphs_dir)
+
+    viewer_path = os.path.join(graphs_dir, VIEWER_FILE_NAME)
+    viewer = VIEWER_TEMPLATE.replace('__PLOTLY__', PLOTLY_FILE_NAME).replace('__DATA_DIR__', DASHBOARD_DATA_DIR)
+    temp_path = viewer_path + f'.{os.getpid()}.part'
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        file.write(viewer)
+    os.replace(temp_path, viewer_path)
+    return viewer_path
+
+
+def chart_spec(dates, quantities, marker_indices=()):
+    # Описание графика и имя его файла по хэшу содержимого: (имя файла, (даты, значения, маркеры))
+    spec = (list(dates), _json_values(quantities), [int(idx) for idx in marker_indices if idx < len(dates)])
+    payload = json.dumps(spec, ensure_ascii=False, separators=(',', ':'))
+    return f"chart_{hashlib.sha1(payload.encode('utf-8')).hexdigest()[:20]}.html", spec
+
+
+def _render_chart(graphs_dir, file_name, spec):
+    dates, quantities, marker_indices = spec
+    fig = build_figure(dates, quantities, chart_title(), marker_indices)
+    path = os.path.join(graphs_dir, file_name)
+    temp_path = path + f'.{os.getpid()}.part'
+    fig.write_html(temp_path, include_plotlyjs=PLOTLY_FILE_NAME)
+    os.replace(temp_path, path)
+
+
+def render_charts(charts, graphs_dir, workers=CHART_RENDER_WORKERS, pool=None):
+    # Общий этап построения графиков для шагов 5 и 6. charts - словарь {имя файла: описание}
+    # из chart_spec. Уже существующие файлы не перестраиваются; возвращает число построенных.
+    # pool - уже запущенный пул процессов шага (multiprocessing.Pool), иначе создается свой
+    write_plotly_js(graphs_dir)
+    pending = [(name, spec) for name, spec in charts.items() if not os.path.exists(os.path.join(graphs_dir, name))]
+    if not pending:
+        return 0
+
+    tasks = [(graphs_dir, name, spec) for name, spec in pending]
+    if pool is not None:
+        pool.starmap(_render_chart, tasks, chunksize=chunk_size(len(tasks), pool))
+    elif workers <= 1 or len(pending) == 1:
+        for task in tasks:
+            _render_chart(*task)
+    else:
+        with worker_pool(processes=workers) as own_pool:
+            own_pool.starmap(_render_chart, tasks, chunksize=chunk_size(len(tasks), own_pool))
+    return len(pending)
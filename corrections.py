@@ -0,0 +1,100 @@
+import numpy as np
+
+# Сколько шагов вперед ищем возврат количества к прежнему уровню
+LOOKAHEAD_STEPS = 5
+
+
+def get_quantity_columns(df):
+    return [col for col in df.columns if col.startswith('Количество')]
+
+
+def correct_quantity_matrix(values, lookahead=LOOKAHEAD_STEPS):
+    # Векторная версия правила "временный провал, который возвращается в течение lookahead шагов".
+    # values - матрица (товары x снимки). Возвращает исправленную матрицу и маску исправленных ячеек.
+    original = np.asarray(values)
+    if original.dtype.kind != 'f':
+        original = original.astype(np.float64)
+    corrected = original.copy()
+    mask = np.zeros(original.shape, dtype=bool)
+    num_rows, num_columns = original.shape
+
+    # Как и в построчной версии, сравнения идут по исходным значениям,
+    # а более поздний шаг t перезаписывает исправления более ранних
+    for t in range(1, num_columns - 1):
+        prev_values = original[:, t - 1]
+        dropped = original[:, t] < prev_values
+        if not dropped.any():
+            continue
+
+        # Первый шаг 1..lookahead, на котором количество вернулось к прежнему уровню
+        first_return = np.zeros(num_rows, dtype=np.int64)
+        for next_step in range(lookahead, 0, -1):
+            future_index = t + next_step
+            if future_index >= num_columns:
+                continue
+            returned = dropped & (original[:, future_index] == prev_values)
+            first_return[returned] = next_step
+
+        for next_step in range(1, lookahead + 1):
+            rows = np.flatnonzero(first_return == next_step)
+            if rows.size:
+                corrected[rows, t:t + next_step] = prev_values[rows, None]
+                mask[rows, t:t + next_step] = True
+
+    return corrected, mask
+
+
+def check_and_correct_values(df):
+    # Исправляет столбцы "Количество ..." в df и возвращает (df, список (индекс строки, номер столбца))
+    quantity_columns = get_quantity_columns(df)
+    if len(quantity_columns) < 2:
+        return df, []
+
+    corrected, mask = correct_quantity_matrix(df[quantity_columns].to_numpy(dtype=np.float64))
+    df[quantity_columns] = corrected
+
+    column_positions = np.array([df.columns.get_loc(col) for col in quantity_columns])
+    row_positions, column_offsets = np.nonzero(mask)
+    corrected_cells = list(zip(df.index[row_positions].tolist(), column_positions[column_offsets].tolist()))
+    return df, corrected_cells
+
+
+def check_and_correct_values_loop(df):
+    # Исходная построчная реализация; оставлена как эталон для сверки с векторной версией
+    quantity_columns = get_quantity_columns(df)
+    corrected_cells = []  # Список для хранения позиций исправленных ячеек
+
+    num_columns = len(quantity_columns)
+    for idx, row in df.iterrows():
+        for t in range(num_columns - 1):
+            current_col = quantity_columns[t]
+            current_value = float(row[current_col])
+
+            # Проверяем уменьшение количества по сравнению с предыдущим шагом
+            prev_value = current_value
+            if t > 0:
+                prev_col = quantity_columns[t - 1]
+                prev_value = float(row[prev_col])
+
+            if current_value < prev_value:
+                # Ищем возврат к предыдущему уровню в следующих 1–5 шагах
+                for next_step in range(1, 6):
+                    future_index = t + next_step
+                    if future_index >= num_columns:
+                        break
+
+                    future_col = quantity_columns[future_index]
+                    future_value = float(row[future_col])
+
+                    if future_value == prev_value:
+                        # Исправляем значения между текущим шагом и найденным будущим шагом
+                        for correction_index in range(t, future_index):
+                            correction_col = quantity_columns[correction_index]
+                            df.at[idx, correction_col] = prev_value
+                            # Записываем координаты исправленной ячейки
+                            col_idx = df.columns.get_loc(correction_col)
+                            corrected_cells.append((idx, col_idx))
+                        break  # Выходим из цикла, так как нашли возврат к предыдущему уровню
+                # Если возврата не найдено в течение 5 шагов, ничего не делаем
+
+    return df, corrected_cells
@@ -0,0 +1,126 @@
+import json
+import os
+import time
+
+# Контрольная точка обхода лежит рядом с будущим снимком: <снимок>.checkpoint.jsonl.
+# Первая строка - заголовок (ссылка, число позиций, время начала), далее по строке на каждую
+# загруженную страницу с ее строками. Файл только дописывается, поэтому прерванный обход
+# теряет не больше одной недописанной строки
+CHECKPOINT_SUFFIX = '.checkpoint.jsonl'
+
+# Незавершенный обход старше этого (в секундах) не продолжается, а начинается заново:
+# все страницы снимка должны относиться примерно к одному времени
+CHECKPOINT_MAX_AGE = 6 * 3600
+
+
+def _encode(record):
+    return (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+
+
+def read_checkpoint_header(path):
+    try:
+        with open(path, 'rb') as f:
+            line = f.readline()
+        return json.loads(line) if line.endswith(b'\n') else None
+    except (OSError, ValueError):
+        return None
+
+
+class CrawlCheckpoint:
+    def __init__(self, file_name):
+        self.path = file_name + CHECKPOINT_SUFFIX
+        self.header = None
+        self.offsets = {}
+        self.valid_size = 0
+        self.writer = None
+        self.reader = None
+        if os.path.exists(self.path):
+            self._load()
+
+    def _load(self):
+        # Читаются только целые строки; хвост после последней целой строки отбрасывается при дописывании
+        offset = 0
+        with open(self.path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                if self.header is None:
+                    self.header = record
+                else:
+                    self.offsets[record['page']] = offset
+                offset += len(line)
+        self.valid_size = offset
+
+    def matches(self, url):
+        return self.header is not None and self.header.get('url') == url
+
+    @property
+    def total_positions(self):
+        return self.header['total_positions'] if self.header else None
+
+    def __contains__(self, page):
+        return page in self.offsets
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def start(self, url, total_positions):
+        # Новый обход: заголовок без страниц
+        self.close()
+        self.header = {'url': url, 'total_positions': total_positions, 'started': time.time()}
+        self.offsets = {}
+        header = _encode(self.header)
+        with open(self.path, 'wb') as f:
+            f.write(header)
+        self.valid_size = len(header)
+
+    def add(self, page, rows):
+        if self.writer is None:
+            os.truncate(self.path, self.valid_size)
+            self.writer = open(self.path, 'ab')
+        line = _encode({'page': page, 'rows': rows})
+        self.offsets[page] = self.writer.tell()
+        self.writer.write(line)
+        # Страница должна оказаться в файле до того, как обход пойдет дальше
+        self.writer.flush()
+
+    def rows(self, page):
+        if self.reader is None:
+            self.reader = open(self.path, 'rb')
+        self.reader.seek(self.offsets[page])
+        return json.loads(self.reader.readline())['rows']
+
+    def close(self):
+        for handle in (self.writer, self.reader):
+            if handle is not None:
+                handle.close()
+        self.writer = self.reader = None
+
+    def remove(self):
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def find_checkpoint(directory, url, max_age=CHECKPOINT_MAX_AGE):
+    # Имя снимка незавершенного обхода этой ссылки в папке или None.
+    # Устаревшие контрольные точки этой ссылки удаляются
+    if not os.path.isdir(directory):
+        return None
+    for file in sorted(os.listdir(directory)):
+        if not file.endswith(CHECKPOINT_SUFFIX):
+            continue
+        path = os.path.join(directory, file)
+        header = read_checkpoint_header(path)
+        if header is None or header.get('url') != url:
+            continue
+        if time.time() - header.get('started', 0) > max_age:
+            print(f"Незавершенный обход {file} устарел и будет начат заново")
+            os.remove(path)
+            continue
+        return path[:-len(CHECKPOINT_SUFFIX)]
+    return None
@@ -0,0 +1,107 @@
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime
+from parser import (
+    CONCURRENCY_PER_HOST, CRAWL_FAILED, PARSE_BACKEND, REQUESTS_PER_SECOND, HostLimiter,
+    create_parse_executor, create_session, get_all_pages, get_snapshot_file_name, report_crawl_status
+)
+from metrics import get_metrics, pool_cpu_seconds
+
+# Общее число одновременных соединений на все аптеки сразу
+GLOBAL_CONCURRENCY = 16
+
+# Число процессов для разбора страниц всех аптек
+CRAWLER_PARSE_WORKERS = os.cpu_count() or 1
+
+# Папка, в которую сохраняются снимки конкурентов
+COMPETITORS_DIR = os.path.join('Datasets', 'competitors')
+
+
+# Функция для чтения данных из файла.
+# parse_schedule - разбор расписания (schedule.parse_task_times): строки с неверным
+# расписанием пропускаются при чтении, а не роняют планировщик всех аптек при запуске
+def read_data(file_path, parse_schedule=None):
+    try:
+        with open(file_path, 'r') as file:
+            lines = file.readlines()
+    except FileNotFoundError:
+        print(f'Ошибка: файл {file_path} не найден.')
+        sys.exit(1)
+
+    entries = []
+    for line_number, line in enumerate(lines, 1):
+        entry = line.strip().split()
+        if not entry:
+            continue
+        # Строка: имя аптеки, ссылка и, необязательно, расписание вида 08:20,*/2:50
+        if len(entry) not in (2, 3):
+            print(f'Пропущена строка {line_number}: {entry} - неверный формат')
+            continue
+        name, url = entry[0], entry[1]
+        schedule_spec = entry[2] if len(entry) == 3 else None
+        if parse_schedule is not None and schedule_spec is not None:
+            try:
+                parse_schedule(schedule_spec)
+            except ValueError as e:
+                print(f'Пропущена строка {line_number}: {name} - неверное расписание {schedule_spec}: {e}')
+                continue
+        entries.append((name, url, schedule_spec))
+    return entries
+
+
+async def crawl_pharmacy(session, limiter, name, url, base_dir=COMPETITORS_DIR, executor=None,
+                         parse_backend=PARSE_BACKEND):
+    save_directory = os.path.join(os.getcwd(), base_dir, name)
+    os.makedirs(save_directory, exist_ok=True)
+    file_name = get_snapshot_file_name(save_directory, url=url)
+
+    print(f"Запуск парсера для {name} в {datetime.now().strftime('%H:%M:%S')}")
+    try:
+        status = await get_all_pages(url, file_name, session=session, limiter=limiter,
+                                     show_progress=False, executor=executor, pharmacy=name,
+                                     parse_backend=parse_backend)
+    except Exception as e:
+        print(f"Ошибка при обходе аптеки {name}: {e}")
+        return CRAWL_FAILED
+    finally:
+        # Файл метрик обновляется после каждого обхода, чтобы планировщик было видно между запусками
+        get_metrics().write_prometheus()
+    report_crawl_status(status, file_name, name)
+    return status
+
+
+async def crawl_all(entries, global_concurrency=GLOBAL_CONCURRENCY,
+                    concurrency=CONCURRENCY_PER_HOST, rate=REQUESTS_PER_SECOND, base_dir=COMPETITORS_DIR,
+                    parse_workers=CRAWLER_PARSE_WORKERS, parse_backend=PARSE_BACKEND):
+    # Одна сессия с общим пулом соединений, общие ограничения на хост
+    # и общий пул процессов для разбора страниц всех аптек
+    limiter = HostLimiter(concurrency, rate)
+    executor = create_parse_executor(parse_workers)
+    started = time.perf_counter()
+    try:
+        async with create_session(global_concurrency) as session:
+            await asyncio.gather(*(
+                crawl_pharmacy(session, limiter, name, url, base_dir, executor, parse_backend)
+                for name, url, *_ in entries
+            ))
+    finally:
+        if executor is not None:
+            # Процессы разбора создаются по мере надобности и до конца обхода не завершаются,
+            # поэтому их процессорное время целиком относится к этому обходу
+            busy = pool_cpu_seconds(executor)
+            capacity = (time.perf_counter() - started) * parse_workers
+            if busy is not None and capacity > 0:
+                get_metrics().set('crawl_parse_worker_utilisation', busy / capacity)
+            executor.shutdown()
+
+
+def run_crawl(entries, **kwargs):
+    asyncio.run(crawl_all(entries, **kwargs))
+    print(f"Отчет о запуске: {get_metrics().write_report()}")
+
+
+if __name__ == "__main__":
+    file_path = sys.argv[1] if len(sys.argv) > 1 else 'data.txt'
+    run_crawl(read_data(file_path))
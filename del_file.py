@@ -37,8 +37,9 @@ def delete_files_by_name(base_path, target_filename):
 # Базовая папка
 base_path = "Datasets/competitors"
 
-# Запрашиваем у пользователя название файла для удаления
-target_filename = input("Введите название файла, который нужно удалить: ")
+if __name__ == "__main__":
+    # Запрашиваем у пользователя название файла для удаления
+    target_filename = input("Введите название файла, который нужно удалить: ")
 
-# Вызываем функцию удаления
-delete_files_by_name(base_path, target_filename)
\ No newline at end of file
+    # Вызываем функцию удаления
+    delete_files_by_name(base_path, target_filename)
@@ -0,0 +1,151 @@
+import numpy as np
+
+try:
+    import xlsxwriter
+except ImportError:
+    xlsxwriter = None
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+from openpyxl.utils import get_column_letter
+
+# Движок выгрузки: xlsxwriter в режиме constant_memory, если установлен, иначе openpyxl в режиме write_only.
+# Оба пишут строки потоком и не держат всю книгу в памяти
+EXCEL_ENGINE = 'xlsxwriter' if xlsxwriter is not None else 'openpyxl'
+
+# Сколько строк таблицы переводится в значения для записи за один раз
+ROWS_PER_CHUNK = 5000
+
+GREY_FILL = 'C0C0C0'
+YELLOW_FILL = 'FFFF00'
+
+# Максимальная длина имени листа в Excel
+SHEET_NAME_LIMIT = 31
+
+
+class ExcelSheet:
+    # Лист для выгрузки: таблица и маска подсвечиваемых ячеек (строки x столбцы df).
+    # Маска считается заранее, поэтому раскраска не требует обхода ячеек готового листа
+    def __init__(self, name, df, highlight=None, fill_color=GREY_FILL, hidden_columns=(), link_column=None):
+        self.name = name[:SHEET_NAME_LIMIT]
+        self.df = df
+        self.highlight = highlight
+        self.fill_color = fill_color
+        self.hidden_columns = list(hidden_columns)
+        self.link_column = link_column
+
+
+def highlight_mask(shape, rows, columns):
+    # Маска из позиций (строка, столбец); позиции за пределами таблицы пропускаются
+    mask = np.zeros(shape, dtype=bool)
+    rows = np.asarray(rows, dtype=np.int64)
+    columns = np.asarray(columns, dtype=np.int64)
+    inside = (rows >= 0) & (rows < shape[0]) & (columns >= 0) & (columns < shape[1])
+    mask[rows[inside], columns[inside]] = True
+    return mask
+
+
+def _row_chunks(df):
+    # Значения строк как списки Python-объектов; пропуски - None (пустая ячейка, как у to_excel)
+    for start in range(0, len(df), ROWS_PER_CHUNK):
+        chunk = df.iloc[start:start + ROWS_PER_CHUNK].astype(object)
+        yield start, chunk.where(chunk.notna(), None).to_numpy().tolist()
+
+
+def _write_sheet_xlsxwriter(workbook, sheet, formats):
+    worksheet = workbook.add_worksheet(sheet.name)
+    df = sheet.df
+    columns = list(df.columns)
+    # Скрытие столбцов задается до записи строк (требование constant_memory)
+    for column in sheet.hidden_columns:
+        position = columns.index(column)
+        worksheet.set_column(position, position, None, None, {'hidden': True})
+    worksheet.write_row(0, 0, [str(column) for column in columns], formats['header'])
+
+    if sheet.fill_color not in formats:
+        formats[sheet.fill_color] = workbook.add_format({'bg_color': '#' + sheet.fill_color, 'pattern': 1})
+    fill_format = formats[sheet.fill_color]
+    link_position = columns.index(sheet.link_column) if sheet.link_column in columns else None
+
+    highlighted_rows = sheet.highlight.any(axis=1) if sheet.highlight is not None else None
+    for start, rows in _row_chunks(df):
+        for offset, values in enumerate(rows):
+            position = start + offset
+            excel_row = position + 1
+            worksheet.write_row(excel_row, 0, values)
+            # В текущей строке ячейки можно перезаписать с форматом, пока не начата следующая
+            if highlighted_rows is not None and highlighted_rows[position]:
+                for column in np.flatnonzero(sheet.highlight[position]).tolist():
+                    worksheet.write(excel_row, column, values[column], fill_format)
+            if link_position is not None and values[link_position]:
+                worksheet.write(excel_row, link_position, values[link_position], formats['link'])
+
+
+def _write_sheet_openpyxl(workbook, sheet, styles):
+    worksheet = workbook.create_sheet(sheet.name)
+    df = sheet.df
+    columns = list(df.columns)
+    # Скрытие столбцов задается до первой строки листа
+    for column in sheet.hidden_columns:
+        worksheet.column_dimensions[get_column_letter(columns.index(column) + 1)].hidden = True
+
+    header = []
+    for column in columns:
+        cell = WriteOnlyCell(worksheet, value=str(column))
+        cell.font, cell.border, cell.alignment = styles['header']
+        header.append(cell)
+    worksheet.append(header)
+
+    if sheet.fill_color not in styles:
+        styles[sheet.fill_color] = PatternFill(start_color=sheet.fill_color, end_color=sheet.fill_color, fill_type='solid')
+    fill = styles[sheet.fill_color]
+    link_position = columns.index(sheet.link_column) if sheet.link_column in columns else None
+
+    for start, rows in _row_chunks(df):
+        for offset, values in enumerate(rows):
+            position = start + offset
+            styled = []
+            if sheet.highlight is not None:
+                styled = np.flatnonzero(sheet.highlight[position]).tolist()
+            if link_position is not None and values[link_position]:
+                styled.append(link_position)
+            if styled:
+                values = list(values)
+                for column in styled:
+                    cell = WriteOnlyCell(worksheet, value=values[column])
+                    if column == link_position:
+                        cell.font = styles['link']
+                    else:
+                        cell.fill = fill
+                    values[column] = cell
+            worksheet.append(values)
+
+
+def write_excel(path, sheets, engine=None):
+    # Пишет один или несколько листов в одну книгу потоково
+    engine = engine or EXCEL_ENGINE
+    if engine == 'xlsxwriter':
+        workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+        formats = {
+            'header': workbook.add_format({'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'}),
+            'link': workbook.add_format({'font_color': 'blue', 'underline': 1}),
+        }
+        try:
+            for sheet in sheets:
+                _write_sheet_xlsxwriter(workbook, sheet, formats)
+        finally:
+            workbook.close()
+        return path
+
+    workbook = Workbook(write_only=True)
+    thin = Side(style='thin')
+    styles = {
+        'header': (Font(bold=True), Border(left=thin, right=thin, top=thin, bottom=thin),
+                   Alignment(horizontal='center', vertical='top')),
+        'link': Font(color='0000FF', underline='single'),
+    }
+    for sheet in sheets:
+        _write_sheet_openpyxl(workbook, sheet, styles)
+    workbook.save(path)
+    return path
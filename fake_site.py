@@ -0,0 +1,86 @@
+import argparse
+import asyncio
+import hashlib
+import random
+from aiohttp import web
+from synthetic_data import make_page_html, page_count
+
+# Локальная замена сайта для обхода без сети: страницы каталога из synthetic_data,
+# ETag по содержимому (ответ 304 на If-None-Match), необязательная задержка ответа
+# и доля ответов 503 (проверка повторов и продолжения прерванных обходов)
+FAKE_SITE_HOST = '127.0.0.1'
+FAKE_SITE_PORT = 8060
+
+
+class FakeSite:
+    def __init__(self, total_positions=2000, latency=0.0, version=0, seed=0, error_rate=0.0):
+        self.total_positions = total_positions
+        self.latency = latency
+        self.version = version
+        self.seed = seed
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.pages = {}
+        self.requests = 0
+        self.errors = 0
+        self.not_modified = 0
+        self.bytes_sent = 0
+
+    def page(self, number):
+        # Страницы строятся один раз: замеряется обход, а не генератор
+        key = (number, self.version)
+        if key not in self.pages:
+            body = make_page_html(self.total_positions, number, self.seed, self.version).encode('utf-8')
+            self.pages[key] = (body, '"' + hashlib.sha1(body).hexdigest()[:20] + '"')
+        return self.pages[key]
+
+    async def handle_page(self, request):
+        try:
+            number = int(request.query.get('page', 1))
+        except ValueError:
+            raise web.HTTPBadRequest(text="page должен быть числом")
+        if not 1 <= number <= max(1, page_count(self.total_positions)):
+            raise web.HTTPNotFound()
+
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.error_rate and self.random.random() < self.error_rate:
+            self.errors += 1
+            raise web.HTTPServiceUnavailable()
+        body, etag = self.page(number)
+        if request.headers.get('If-None-Match') == etag:
+            self.not_modified += 1
+            return web.Response(status=304, headers={'ETag': etag})
+        self.bytes_sent += len(body)
+        return web.Response(body=body, content_type='text/html', charset='utf-8', headers={'ETag': etag})
+
+    def create_app(self):
+        app = web.Application()
+        # Любая ссылка отдает тот же каталог: у каждой аптеки в data.txt свой путь
+        app.router.add_get('/{tail:.*}', self.handle_page)
+        return app
+
+
+async def start_fake_site(site, host=FAKE_SITE_HOST, port=0):
+    # Запускает сайт в текущем цикле событий; port=0 - любой свободный порт.
+    # Возвращает (runner, базовая ссылка); остановка - await runner.cleanup()
+    runner = web.AppRunner(site.create_app())
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    host, port = runner.addresses[0][:2]
+    return runner, f"http://{host}:{port}"
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Локальный сайт с синтетическим каталогом аптеки")
+    arg_parser.add_argument('--host', default=FAKE_SITE_HOST)
+    arg_parser.add_argument('--port', type=int, default=FAKE_SITE_PORT)
+    arg_parser.add_argument('--positions', type=int, default=2000, help="позиций в каталоге (по 20 на страницу)")
+    arg_parser.add_argument('--latency', type=float, default=0.0, help="задержка ответа, секунд")
+    arg_parser.add_argument('--version', type=int, default=0, help="номер снимка: меняет остатки на страницах")
+    arg_parser.add_argument('--error-rate', type=float, default=0.0, help="доля запросов с ответом 503")
+    args = arg_parser.parse_args()
+
+    site = FakeSite(args.positions, args.latency, args.version, error_rate=args.error_rate)
+    web.run_app(site.create_app(), host=args.host, port=args.port)
@@ -0,0 +1,385 @@
+import cProfile
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    from pyinstrument import Profiler
+except ImportError:
+    Profiler = None
+
+# Куда пишутся отчеты о запусках (run_*.json) и файл для textfile-коллектора Prometheus
+METRICS_DIR = os.path.join('Datasets', 'metrics')
+PROMETHEUS_FILE_NAME = 'metrics.prom'
+
+# Порт HTTP-эндпоинта /metrics для долгоживущих процессов (планировщик); None - не поднимать
+METRICS_HOST = '127.0.0.1'
+METRICS_PORT = None
+
+# Профилирование этапов: None, 'cprofile' (файлы .prof) или 'pyinstrument' (файлы .html)
+PROFILE_STAGES = None
+PROFILE_MODES = ('cprofile', 'pyinstrument')
+PROFILE_DIR = os.path.join(METRICS_DIR, 'profiles')
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+PARSE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+BYTES_BUCKETS = (4096, 16384, 65536, 131072, 262144, 524288, 1048576, 4194304)
+
+# Имя метрики -> (тип, описание, границы корзин для гистограмм)
+METRIC_DEFINITIONS = {
+    'crawl_fetch_seconds': ('histogram', "Время загрузки страницы аптеки (без ожидания ограничителя)", LATENCY_BUCKETS),
+    'crawl_page_bytes': ('histogram', "Размер загруженной страницы в байтах", BYTES_BUCKETS),
+    'crawl_parse_seconds': ('histogram', "Время разбора страницы", PARSE_BUCKETS),
+    'crawl_pages_total': ('counter', "Записано страниц", None),
+    'crawl_rows_total': ('counter', "Записано строк", None),
+    'crawl_fetch_errors_total': ('counter', "Неудачных попыток загрузки страницы", None),
+    'crawl_retries_total': ('counter', "Повторных попыток загрузки страницы", None),
+    'crawl_not_modified_total': ('counter', "Страниц, не изменившихся с прошлого обхода (304)", None),
+    'crawl_seconds': ('gauge', "Длительность последнего обхода аптеки", None),
+    'crawl_rows_per_second': ('gauge', "Строк в секунду в последнем обходе аптеки", None),
+    'crawl_parse_worker_utilisation': ('gauge', "Загрузка процессов разбора страниц за обход", None),
+    'stage_seconds': ('gauge', "Длительность последнего выполнения этапа", None),
+    'stage_cpu_seconds': ('gauge', "Процессорное время основного процесса за этап", None),
+    'stage_rows': ('gauge', "Строк обработано за этап", None),
+    'stage_rows_per_second': ('gauge', "Строк в секунду за этап", None),
+    'stage_worker_utilisation': ('gauge', "Загрузка процессов пула за этап (0-1)", None),
+}
+
+
+class Histogram:
+    # Гистограмма с фиксированными корзинами, как в Prometheus: корзина i - значения <= buckets[i]
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = None
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = value if self.max is None else max(self.max, value)
+
+    def quantile(self, q):
+        # Верхняя граница корзины, в которую попадает квантиль (для последней - максимум)
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'mean': self.sum / self.count if self.count else None,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'max': self.max,
+            'buckets': dict(zip([str(bound) for bound in self.buckets] + ['+Inf'], self.counts)),
+        }
+
+
+class StageStats:
+    # Счетчики выполняемого этапа; строки и загрузку пула добавляют сами шаги
+    def __init__(self, name):
+        self.name = name
+        self.rows = 0
+        self.seconds = None
+        self.worker_busy = 0.0
+        self.worker_capacity = 0.0
+
+
+_current_stage = ContextVar('current_stage', default=None)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = datetime.now()
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+        self.stages = []
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram(METRIC_DEFINITIONS[name][2])
+            self.histograms[key].observe(value)
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.gauges[key] = value
+
+    def histogram_summary(self, name, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            return histogram.summary() if histogram is not None else None
+
+    def finish_stage(self, stats, seconds, cpu_seconds):
+        record = {
+            'stage': stats.name,
+            'seconds': round(seconds, 6),
+            'cpu_seconds': round(cpu_seconds, 6),
+            'rows': stats.rows,
+            'rows_per_second': stats.rows / seconds if seconds > 0 else None,
+            'worker_utilisation': stats.worker_busy / stats.worker_capacity if stats.worker_capacity else None,
+        }
+        for field in ('seconds', 'cpu_seconds', 'rows', 'rows_per_second', 'worker_utilisation'):
+            if record[field] is not None:
+                self.set(f'stage_{field}', record[field], stage=stats.name)
+        with self.lock:
+            self.stages.append(record)
+        return record
+
+    def prometheus_text(self):
+        # Текстовый формат Prometheus 0.0.4
+        with self.lock:
+            series = {}
+            for (name, labels), value in list(self.counters.items()) + list(self.gauges.items()):
+                series.setdefault(name, []).append((labels, value))
+            for (name, labels), histogram in self.histograms.items():
+                series.setdefault(name, []).append((labels, histogram))
+
+            lines = []
+            for name in sorted(series):
+                kind, help_text, _ = METRIC_DEFINITIONS[name]
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in sorted(series[name], key=lambda item: item[0]):
+                    if kind != 'histogram':
+                        lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                        continue
+                    cumulative = 0
+                    bounds = [_format_value(bound) for bound in value.buckets] + ['+Inf']
+                    for bound, count in zip(bounds, value.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(labels + (('le', bound),))} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(value.sum)}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {value.count}")
+        return "\n".join(lines) + "\n"
+
+    def report(self):
+        with self.lock:
+            return {
+                'started': self.started.isoformat(timespec='seconds'),
+                'finished': datetime.now().isoformat(timespec='seconds'),
+                'stages': list(self.stages),
+                'counters': [{'name': name, 'labels': dict(labels), 'value': value}
+                             for (name, labels), value in sorted(self.counters.items())],
+                'gauges': [{'name': name, 'labels': dict(labels), 'value': value}
+                           for (name, labels), value in sorted(self.gauges.items())],
+                'histograms': [{'name': name, 'labels': dict(labels), **histogram.summary()}
+                               for (name, labels), histogram in sorted(self.histograms.items())],
+            }
+
+    def write_report(self, path=None):
+        # JSON-отчет о запуске; по умолчанию Datasets/metrics/run_<время>_<pid>.json
+        if path is None:
+            path = os.path.join(METRICS_DIR, f"run_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}_{os.getpid()}.json")
+        _write_atomic(path, json.dumps(self.report(), ensure_ascii=False, indent=1))
+        return path
+
+    def write_prometheus(self, path=None):
+        # Файл для node_exporter --collector.textfile.directory
+        path = path or os.path.join(METRICS_DIR, PROMETHEUS_FILE_NAME)
+        _write_atomic(path, self.prometheus_text())
+        return path
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _write_atomic(path, text):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path + '.part', 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(path + '.part', path)
+
+
+_registry = None
+
+
+def get_metrics():
+    # Один реестр на процесс
+    global _registry
+    if _registry is None:
+        _registry = MetricsRegistry()
+    return _registry
+
+
+def count_rows(rows):
+    # Добавляет строки к выполняемому этапу (вне этапа ничего не делает)
+    stats = _current_stage.get()
+    if stats is not None:
+        stats.rows += int(rows)
+
+
+def _start_profiler(mode):
+    if mode == 'pyinstrument' and Profiler is None:
+        print("pyinstrument не установлен, используется cProfile")
+        mode = 'cprofile'
+    if mode == 'pyinstrument':
+        profiler = Profiler()
+        profiler.start()
+    elif mode == 'cprofile':
+        profiler = cProfile.Profile()
+        profiler.enable()
+    else:
+        return None
+    return mode, profiler
+
+
+def _stop_profiler(started, name):
+    if started is None:
+        return
+    mode, profiler = started
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    file_name = f"{name}_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}"
+    if mode == 'pyinstrument':
+        profiler.stop()
+        path = os.path.join(PROFILE_DIR, file_name + '.html')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(profiler.output_html())
+    else:
+        profiler.disable()
+        path = os.path.join(PROFILE_DIR, file_name + '.prof')
+        profiler.dump_stats(path)
+    print(f"Профиль этапа {name}: {path}")
+
+
+@contextmanager
+def stage(name, profile=None, registry=None):
+    # Замеряет этап: время, процессорное время, строки (count_rows) и загрузку пула (track_pool).
+    # profile - 'cprofile' или 'pyinstrument', по умолчанию PROFILE_STAGES
+    registry = registry or get_metrics()
+    stats = StageStats(name)
+    token = _current_stage.set(stats)
+    profiler = _start_profiler(profile or PROFILE_STAGES)
+    started = time.perf_counter()
+    cpu_started = time.process_time()
+    try:
+        yield stats
+    finally:
+        stats.seconds = time.perf_counter() - started
+        cpu_seconds = time.process_time() - cpu_started
+        _stop_profiler(profiler, name)
+        _current_stage.reset(token)
+        registry.finish_stage(stats, stats.seconds, cpu_seconds)
+
+
+def process_cpu_seconds(pid):
+    # Процессорное время процесса: через psutil, если установлен, иначе из /proc (Linux)
+    if psutil is not None:
+        try:
+            times = psutil.Process(pid).cpu_times()
+            return times.user + times.system
+        except psutil.Error:
+            return None
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def pool_processes(pool):
+    # Рабочие процессы multiprocessing.Pool или ProcessPoolExecutor
+    if hasattr(pool, '_pool'):
+        return list(pool._pool)
+    return list((getattr(pool, '_processes', None) or {}).values())
+
+
+def pool_cpu_seconds(pool):
+    total = 0.0
+    for process in pool_processes(pool):
+        seconds = process_cpu_seconds(process.pid)
+        if seconds is None:
+            return None
+        total += seconds
+    return total
+
+
+@contextmanager
+def track_pool(pool):
+    # Загрузка процессов пула за время блока: их процессорное время / (время блока x число процессов).
+    # Результат добавляется к выполняемому этапу
+    stats = _current_stage.get()
+    if stats is None:
+        yield
+        return
+    cpu_started = pool_cpu_seconds(pool)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        cpu_finished = pool_cpu_seconds(pool)
+        if cpu_started is not None and cpu_finished is not None:
+            stats.worker_busy += max(0.0, cpu_finished - cpu_started)
+            stats.worker_capacity += (time.perf_counter() - started) * len(pool_processes(pool))
+
+
+def start_metrics_server(port=METRICS_PORT, host=METRICS_HOST, registry=None):
+    # Эндпоинт /metrics в фоновом потоке; без порта ничего не запускается
+    if not port:
+        return None
+    registry = registry or get_metrics()
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = registry.prometheus_text().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Метрики доступны на http://{host}:{port}/metrics")
+    return server
+
+
+def add_profile_argument(arg_parser):
+    arg_parser.add_argument('--profile', choices=PROFILE_MODES, default=None,
+                            help="профилировать каждый этап (файлы в Datasets/metrics/profiles)")
@@ -0,0 +1,95 @@
+import hashlib
+import json
+import os
+
+# Папка с состоянием страниц между обходами (по одному файлу на ссылку аптеки)
+PAGE_CACHE_DIR = os.path.join('Datasets', 'page_cache')
+
+
+def table_hash(html_content):
+    # Хэш части страницы от таблицы table-border до последнего </table>,
+    # чтобы меняющиеся шапка и подвал сайта не сбрасывали кэш
+    start = html_content.find('table-border')
+    end = html_content.rfind('</table>')
+    if start == -1 or end < start:
+        fragment = html_content
+    else:
+        fragment = html_content[start:end]
+    return hashlib.sha1(fragment.encode('utf-8')).hexdigest()
+
+
+class PageCache:
+    # Состояние страниц одной ссылки: ETag/Last-Modified, хэш таблицы и результат разбора
+    def __init__(self, url, cache_dir=PAGE_CACHE_DIR):
+        self.url = url
+        self.path = os.path.join(cache_dir, hashlib.sha1(url.encode('utf-8')).hexdigest() + '.json')
+        self.pages = {}
+        self.new_pages = {}
+        self.not_modified = 0
+        self.same_hash = 0
+        self.parsed = 0
+        self.bytes_downloaded = 0
+
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, encoding='utf-8') as f:
+                    self.pages = json.load(f).get('pages', {})
+            except (OSError, ValueError) as e:
+                print(f"Не удалось прочитать кэш страниц {self.path}: {e}")
+
+    def conditional_headers(self, page):
+        entry = self.pages.get(str(page))
+        headers = {}
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def reuse(self, page):
+        # Страница не изменилась (ответ 304): берем прошлый результат разбора
+        entry = self.pages.get(str(page))
+        if entry is None:
+            return None
+        self.not_modified += 1
+        self.new_pages[str(page)] = entry
+        return entry['rows']
+
+    def lookup(self, page, content_hash):
+        entry = self.pages.get(str(page))
+        if entry is not None and entry.get('hash') == content_hash:
+            self.same_hash += 1
+            return entry['rows']
+        return None
+
+    def put(self, page, etag, last_modified, content_hash, rows):
+        self.new_pages[str(page)] = {
+            'etag': etag,
+            'last_modified': last_modified,
+            'hash': content_hash,
+            'rows': rows,
+        }
+
+    def discard(self, page):
+        # Прошлое состояние страницы больше не годится: следующий запрос будет без условных заголовков
+        self.pages.pop(str(page), None)
+        self.new_pages.pop(str(page), None)
+
+    def keep(self, page):
+        # Страница не загружалась в этом обходе (взята из контрольной точки) - ее запись кэша остается прежней
+        entry = self.pages.get(str(page))
+        if entry is not None:
+            self.new_pages.setdefault(str(page), entry)
+
+    def save(self):
+        # Сохраняем только страницы текущего обхода; запись через временный файл
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = self.path + '.part'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'url': self.url, 'pages': self.new_pages}, f, ensure_ascii=False)
+        os.replace(temp_path, self.path)
+
+    def summary(self):
+        return (f"без изменений (304): {self.not_modified}, тот же хэш таблицы: {self.same_hash}, "
+                f"разобрано заново: {self.parsed}, загружено байт: {self.bytes_downloaded}")
@@ -0,0 +1,272 @@
+import re
+from html.parser import HTMLParser
+from bs4 import BeautifulSoup
+
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
+# Каждый движок разбора умеет три вещи: построить корень документа,
+# найти потомков по тегу и классу и вернуть текст узла.
+# Сама логика извлечения позиций общая для всех движков (extract_items).
+
+
+class Bs4Backend:
+    name = 'bs4'
+
+    def root(self, html_content):
+        return BeautifulSoup(html_content, 'html.parser')
+
+    # В BeautifulSoup class_=None означает "без атрибута class", поэтому без класса фильтр не передается
+    def find(self, node, tag=None, cls=None):
+        return node.find(tag, class_=cls) if cls is not None else node.find(tag)
+
+    def find_all(self, node, tag=None, cls=None):
+        return node.find_all(tag, class_=cls) if cls is not None else node.find_all(tag)
+
+    def text(self, node):
+        return node.text
+
+
+class LxmlBackend:
+    name = 'lxml'
+
+    def root(self, html_content):
+        return lxml.html.document_fromstring(html_content)
+
+    def _matches(self, element, cls):
+        # Комментарии и инструкции в lxml имеют нестроковый tag
+        if not isinstance(element.tag, str):
+            return False
+        return cls is None or cls in (element.get('class') or '').split()
+
+    def find(self, node, tag=None, cls=None):
+        for element in node.iterdescendants(tag):
+            if self._matches(element, cls):
+                return element
+        return None
+
+    def find_all(self, node, tag=None, cls=None):
+        return [element for element in node.iterdescendants(tag) if self._matches(element, cls)]
+
+    def text(self, node):
+        return node.text_content()
+
+
+# Пробельные символы, из которых BeautifulSoup сворачивает строки (неразрывный пробел сюда не входит)
+ASCII_SPACES = ' \n\t\x0c\r'
+
+
+class _Node:
+    __slots__ = ('tag', 'classes', 'children')
+
+    def __init__(self, tag, classes=()):
+        self.tag = tag
+        self.classes = classes
+        self.children = []
+
+    def descendants(self):
+        for child in self.children:
+            if isinstance(child, _Node):
+                yield child
+                yield from child.descendants()
+
+    def strings(self):
+        for child in self.children:
+            if isinstance(child, _Node):
+                yield from child.strings()
+            else:
+                yield child
+
+
+class _TableTokenizer(HTMLParser):
+    # Теги без закрывающей пары
+    VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+                 'link', 'meta', 'param', 'source', 'track', 'wbr'}
+
+    def __init__(self, table_class):
+        super().__init__(convert_charrefs=True)
+        self.table_class = table_class
+        self.root = _Node('[document]')
+        self.stack = []  # Открытые узлы внутри нужной таблицы
+        self.done = False
+        self.skip_text = 0  # Глубина внутри script/style
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        if not self.stack:
+            # До начала нужной таблицы остальные теги не интересны
+            if tag != 'table':
+                return
+            classes = dict(attrs).get('class') or ''
+            if self.table_class not in classes.split():
+                return
+            node = _Node(tag, tuple(classes.split()))
+            self.root.children.append(node)
+            self.stack.append(node)
+            return
+
+        classes = dict(attrs).get('class') or ''
+        node = _Node(tag, tuple(classes.split()) if classes else ())
+        self.stack[-1].children.append(node)
+        if tag in ('script', 'style'):
+            self.skip_text += 1
+        if tag not in self.VOID_TAGS:
+            self.stack.append(node)
+
+    def handle_startendtag(self, tag, attrs):
+        if self.stack:
+            self.stack[-1].children.append(_Node(tag))
+
+    def handle_endtag(self, tag):
+        if not self.stack:
+            return
+        # Закрываем все узлы до парного тега, как это делает html.parser в BeautifulSoup
+        for position in range(len(self.stack) - 1, -1, -1):
+            if self.stack[position].tag == tag:
+                for node in self.stack[position:]:
+                    if node.tag in ('script', 'style'):
+                        self.skip_text -= 1
+                del self.stack[position:]
+                break
+        if not self.stack:
+            self.done = True
+
+    def handle_data(self, data):
+        if self.stack and not self.skip_text:
+            children = self.stack[-1].children
+            if children and isinstance(children[-1], str):
+                # Соседние куски текста - одна строка, как в BeautifulSoup
+                data = children.pop() + data
+            children.append(data)
+
+    def close(self):
+        super().close()
+        _collapse_whitespace(self.root)
+
+
+def _collapse_whitespace(node):
+    # Как BeautifulSoup: строка только из пробелов становится '\n' (если в ней есть перевод строки) или ' '
+    for position, child in enumerate(node.children):
+        if isinstance(child, _Node):
+            _collapse_whitespace(child)
+        elif not child.strip(ASCII_SPACES):
+            node.children[position] = '\n' if '\n' in child else ' '
+
+
+class StreamBackend:
+    # Потоковый разбор стандартным HTMLParser: дерево строится только
+    # для таблицы table-border, всё остальное на странице пропускается
+    name = 'stream'
+
+    def root(self, html_content):
+        tokenizer = _TableTokenizer('table-border')
+        tokenizer.feed(html_content)
+        tokenizer.close()
+        return tokenizer.root
+
+    def find(self, node, tag=None, cls=None):
+        for element in node.descendants():
+            if (tag is None or element.tag == tag) and (cls is None or cls in element.classes):
+                return element
+        return None
+
+    def find_all(self, node, tag=None, cls=None):
+        return [
+            element for element in node.descendants()
+            if (tag is None or element.tag == tag) and (cls is None or cls in element.classes)
+        ]
+
+    def text(self, node):
+        return ''.join(node.strings())
+
+
+BACKENDS = {'bs4': Bs4Backend(), 'stream': StreamBackend()}
+if lxml is not None:
+    BACKENDS['lxml'] = LxmlBackend()
+
+# Движок по умолчанию - stream: на всех страницах tests/fixtures/html он дает тот же результат,
+# что исходный parse_table на BeautifulSoup, и в несколько раз быстрее. lxml по-своему закрывает
+# незакрытые <td>, поэтому включается только явно
+DEFAULT_BACKEND = 'stream'
+
+
+def get_backend(name=None):
+    name = name or DEFAULT_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Неизвестный движок разбора: {name}. Доступны: {', '.join(BACKENDS)}")
+    return BACKENDS[name]
+
+
+def extract_items(html_content, backend):
+    root = backend.root(html_content)
+    table = backend.find(root, 'table', 'table-border')
+    if table is None:
+        print("Таблица не найдена на странице.")
+        return []
+
+    data = []
+    for row in backend.find_all(table, 'tr')[1:]:
+        cols = backend.find_all(row, 'td')
+        if len(cols) < 5:
+            continue
+
+        # Извлекаем данные из колонок
+        name_div = backend.find(cols[0], 'a')
+        type_span = backend.find(cols[0], 'span', 'capture')
+        price_div = backend.find(cols[4], cls='price-value')
+        quantity_div = backend.find(cols[4], cls='capture')
+        quantity_text = backend.text(quantity_div).strip() if quantity_div is not None else ''
+
+        # Инициализируем переменные
+        total_quantity = ''
+        only_quantity = ''
+
+        if 'от' in quantity_text.lower():
+            # Обрабатываем случай с "от" и парсим tooltip
+            tooltip_body = backend.find(cols[4], 'div', 'tooltip-info-body')
+            if tooltip_body is not None:
+                total_quantity_value = 0.0
+                # Находим все строки с информацией о количестве
+                quantities = backend.find_all(tooltip_body, 'div', 'tooltip-info-table-tr')
+                for q in quantities:
+                    tds = backend.find_all(q, 'div', 'tooltip-info-table-td')
+                    if len(tds) >= 2:
+                        quantity_str = backend.text(tds[1]).strip()
+                        # Извлекаем число с учетом дробных значений
+                        match = re.search(r'([\d\.,]+)', quantity_str)
+                        if match:
+                            num_str = match.group(1).replace(',', '.')
+                            try:
+                                quantity = float(num_str)
+                                total_quantity_value += quantity
+                            except ValueError:
+                                continue  # Пропускаем, если не число
+                total_quantity = f"{total_quantity_value} упаковок"
+                only_quantity = str(total_quantity_value)
+            else:
+                total_quantity = 'Не удалось получить количество'
+                only_quantity = ''
+        else:
+            # Извлекаем количество как обычно
+            total_quantity = quantity_text
+            quantity_match = re.search(r'([\d\.,]+)', total_quantity)
+            if quantity_match:
+                num_str = quantity_match.group(1).replace(',', '.')
+                only_quantity = num_str
+            else:
+                only_quantity = ''
+
+        item = {
+            'name': backend.text(name_div).strip() if name_div is not None else '',
+            'item_type': backend.text(type_span).strip() if type_span is not None else '',
+            'form': backend.text(cols[1]).strip(),
+            'producer': backend.text(cols[2]).strip(),
+            'price': backend.text(price_div).strip() if price_div is not None else '',
+            'quantity': total_quantity,
+            'only_quantity': only_quantity
+        }
+        data.append(item)
+    return data
@@ -1,12 +1,90 @@
 import asyncio
 import aiohttp
-import random
 import csv
 import re
 import os
+import random
 from bs4 import BeautifulSoup
+from parse_backends import DEFAULT_BACKEND, extract_items, get_backend
+from page_cache import PageCache, table_hash
+from snapshot_store import TABLE_FORMAT, ParquetSnapshotWriter
+from metrics import get_metrics
+from crawl_checkpoint import CrawlCheckpoint, find_checkpoint
 from datetime import datetime
 import ssl
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlparse
+
+# Ограничения на один хост: сколько запросов одновременно и сколько в секунду
+CONCURRENCY_PER_HOST = 4
+REQUESTS_PER_SECOND = 3.0
+
+# Сколько страниц одного обхода может быть загружено, но еще не записано в файл
+MAX_PENDING_PAGES = 32
+
+# Повторы загрузки страницы после ошибки: первая пауза RETRY_BASE_DELAY секунд, дальше вдвое больше
+PAGE_RETRIES = 3
+RETRY_BASE_DELAY = 1.0
+
+# Итог обхода (результат crawl_pages): снимок сохранен; загружены не все страницы
+# (снимок не сохранен, контрольная точка оставлена); обход не состоялся или данных нет
+CRAWL_SAVED = 'saved'
+CRAWL_INCOMPLETE = 'incomplete'
+CRAWL_FAILED = 'failed'
+
+# Число процессов для разбора HTML (0 - разбирать прямо в цикле событий)
+PARSE_WORKERS = 0
+
+# Движок разбора страниц: 'stream', 'bs4' или 'lxml' (см. parse_backends.BACKENDS)
+PARSE_BACKEND = DEFAULT_BACKEND
+
+# Сколько строк копить в памяти перед записью на диск
+CSV_FLUSH_ROWS = 500
+
+# Хранить ли между обходами ETag/хэши страниц и результаты их разбора
+USE_PAGE_CACHE = True
+
+# Формат снимков: типизированный parquet (если установлен pyarrow) или csv
+SNAPSHOT_FORMAT = 'parquet' if TABLE_FORMAT == 'parquet' else 'csv'
+
+CSV_FIELDNAMES = ['name', 'item_type', 'item_form', 'prescription', 'manufacturer', 'country', 'price', 'quantity', 'only_quantity']
+
+
+class TokenBucket:
+    # Ограничитель частоты: rate токенов в секунду, не более capacity подряд
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class HostLimiter:
+    # Семафор и TokenBucket для каждого хоста, общие для всех запросов к нему
+    def __init__(self, concurrency=CONCURRENCY_PER_HOST, rate=REQUESTS_PER_SECOND):
+        self.concurrency = concurrency
+        self.rate = rate
+        self.hosts = {}
+
+    def for_url(self, url):
+        host = urlparse(url).netloc
+        if host not in self.hosts:
+            self.hosts[host] = (asyncio.Semaphore(self.concurrency), TokenBucket(self.rate))
+        return self.hosts[host]
+
 
 async def fetch_page(session, url, page):
     try:
@@ -21,76 +99,27 @@ async def fetch_page(session, url, page):
         print(f"Исключение при загрузке страницы {page}: {e}")
         return None
 
-def parse_table(html_content):
-    soup = BeautifulSoup(html_content, 'html.parser')
-    table = soup.find('table', {'class': 'table-border'})
-    if not table:
-        print("Таблица не найдена на странице.")
-        return []
-
-    data = []
-    for row in table.find_all('tr')[1:]:
-        cols = row.find_all('td')
-        if len(cols) < 5:
-            continue
-
-        # Извлекаем данные из колонок
-        name_div = cols[0].find('a')
-        type_span = cols[0].find('span', class_='capture')
-        price_div = cols[4].find(class_='price-value')
-        quantity_div = cols[4].find(class_='capture')
-        quantity_text = quantity_div.text.strip() if quantity_div else ''
-
-        # Инициализируем переменные
-        total_quantity = ''
-        only_quantity = ''
-
-        if 'от' in quantity_text.lower():
-            # Обрабатываем случай с "от" и парсим tooltip
-            tooltip_body = cols[4].find('div', class_='tooltip-info-body')
-            if tooltip_body:
-                total_quantity_value = 0.0
-                # Находим все строки с информацией о количестве
-                quantities = tooltip_body.find_all('div', class_='tooltip-info-table-tr')
-                for q in quantities:
-                    tds = q.find_all('div', class_='tooltip-info-table-td')
-                    if len(tds) >= 2:
-                        quantity_str = tds[1].text.strip()
-                        # Извлекаем число с учетом дробных значений
-                        match = re.search(r'([\d\.,]+)', quantity_str)
-                        if match:
-                            num_str = match.group(1).replace(',', '.')
-                            try:
-                                quantity = float(num_str)
-                                total_quantity_value += quantity
-                            except ValueError:
-                                continue  # Пропускаем, если не число
-                total_quantity = f"{total_quantity_value} упаковок"
-                only_quantity = str(total_quantity_value)
-            else:
-                total_quantity = 'Не удалось получить количество'
-                only_quantity = ''
-        else:
-            # Извлекаем количество как обычно
-            total_quantity = quantity_text
-            quantity_match = re.search(r'([\d\.,]+)', total_quantity)
-            if quantity_match:
-                num_str = quantity_match.group(1).replace(',', '.')
-                only_quantity = num_str
-            else:
-                only_quantity = ''
-
-        item = {
-            'name': name_div.text.strip() if name_div else '',
-            'item_type': type_span.text.strip() if type_span else '',
-            'form': cols[1].text.strip(),
-            'producer': cols[2].text.strip(),
-            'price': price_div.text.strip() if price_div else '',
-            'quantity': total_quantity,
-            'only_quantity': only_quantity
-        }
-        data.append(item)
-    return data
+async def fetch_page_conditional(session, url, page, headers):
+    # Возвращает (статус, html, etag, last_modified, размер ответа) или None при ошибке
+    try:
+        params = {'page': page}
+        async with session.get(url, params=params, headers=headers) as response:
+            if response.status == 304:
+                return 304, None, None, None, 0
+            if response.status != 200:
+                print(f"Ошибка при загрузке страницы {page}: {response.status}")
+                return None
+            body = await response.read()
+            html_content = body.decode(response.get_encoding())
+            return (200, html_content, response.headers.get('ETag'),
+                    response.headers.get('Last-Modified'), len(body))
+    except Exception as e:
+        print(f"Исключение при загрузке страницы {page}: {e}")
+        return None
+
+def parse_table(html_content, backend=None):
+    # backend - имя движка разбора из parse_backends.BACKENDS ('lxml', 'stream', 'bs4')
+    return extract_items(html_content, get_backend(backend))
 
 def clean_single_item(item):
     # Очищаем и структурируем данные
@@ -110,12 +139,15 @@ def clean_single_item(item):
     }
     return cleaned_item
 
+def parse_page(html_content, backend=None):
+    # Разбор и очистка одной страницы; функция верхнего уровня, чтобы ее можно было отдать в пул процессов
+    return [clean_single_item(item) for item in parse_table(html_content, backend)]
+
 def save_to_csv(cleaned_data, file_name):
     file_exists = os.path.isfile(file_name)
 
     with open(file_name, 'a', newline='', encoding='utf-8') as csvfile:
-        fieldnames = ['name', 'item_type', 'item_form', 'prescription', 'manufacturer', 'country', 'price', 'quantity', 'only_quantity']
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+        writer = csv.DictWriter(csvfile, fieldnames=CSV_FIELDNAMES)
 
         if not file_exists:
             writer.writeheader()
@@ -123,6 +155,50 @@ def save_to_csv(cleaned_data, file_name):
         for item in cleaned_data:
             writer.writerow(item)
 
+class CsvSnapshotWriter:
+    # Файл снимка открыт на весь обход, строки пишутся пачками во временный файл *.part,
+    # который переименовывается в итоговый только после успешного завершения обхода
+    def __init__(self, file_name, flush_rows=CSV_FLUSH_ROWS):
+        self.file_name = file_name
+        self.temp_name = file_name + '.part'
+        self.flush_rows = flush_rows
+        self.buffer = []
+        self.rows_written = 0
+        self.csvfile = open(self.temp_name, 'w', newline='', encoding='utf-8')
+        self.writer = csv.DictWriter(self.csvfile, fieldnames=CSV_FIELDNAMES)
+        self.writer.writeheader()
+
+    def write(self, cleaned_data):
+        self.buffer.extend(cleaned_data)
+        if len(self.buffer) >= self.flush_rows:
+            self.flush()
+
+    def flush(self):
+        self.writer.writerows(self.buffer)
+        self.rows_written += len(self.buffer)
+        self.buffer.clear()
+        self.csvfile.flush()
+
+    def commit(self):
+        self.flush()
+        self.csvfile.close()
+        if not self.rows_written:
+            # Пустой снимок не сохраняем
+            os.remove(self.temp_name)
+            return False
+        os.replace(self.temp_name, self.file_name)
+        return True
+
+    def abort(self):
+        self.csvfile.close()
+        if os.path.exists(self.temp_name):
+            os.remove(self.temp_name)
+
+def create_snapshot_writer(file_name, flush_rows=CSV_FLUSH_ROWS):
+    if file_name.endswith('.parquet'):
+        return ParquetSnapshotWriter(file_name, flush_rows)
+    return CsvSnapshotWriter(file_name, flush_rows)
+
 async def get_total_positions(session, url):
     try:
         async with session.get(url) as response:
@@ -146,52 +222,244 @@ async def get_total_positions(session, url):
         print(f"Исключение при получении общего количества позиций: {e}")
         return None
 
-async def get_all_pages(url, file_name):
+def create_session(limit=100):
     # Создаем SSL-контекст
     ssl_context = ssl.create_default_context()
     ssl_context.check_hostname = False
     ssl_context.verify_mode = ssl.CERT_NONE
 
-    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(ssl=ssl_context)) as session:
-        total_positions = await get_total_positions(session, url)
+    # limit - общее число одновременных соединений на весь пул сессии
+    return aiohttp.ClientSession(connector=aiohttp.TCPConnector(ssl=ssl_context, limit=limit))
+
+async def parse_in_executor(html_content, executor=None, backend=PARSE_BACKEND):
+    if executor is None:
+        return parse_page(html_content, backend)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, parse_page, html_content, backend)
+
+async def parse_timed(html_content, executor, pharmacy, backend=PARSE_BACKEND):
+    # Время разбора с учетом ожидания свободного процесса, если разбор идет в пуле
+    started = time.perf_counter()
+    cleaned_data = await parse_in_executor(html_content, executor, backend)
+    get_metrics().observe('crawl_parse_seconds', time.perf_counter() - started, pharmacy=pharmacy)
+    return cleaned_data
+
+async def limited(limiter, url, request):
+    # Запрос через ограничитель хоста: не больше concurrency одновременно и не чаще rate в секунду
+    semaphore, bucket = limiter.for_url(url)
+    async with semaphore:
+        await bucket.acquire()
+        return await request()
+
+async def with_retries(request, pharmacy=None, retries=PAGE_RETRIES):
+    # request - функция без аргументов, возвращающая корутину попытки; None - неудачная попытка.
+    # Между попытками пауза растет вдвое
+    metrics = get_metrics()
+    for attempt in range(retries + 1):
+        if attempt:
+            # Разброс паузы, чтобы повторы разных страниц не уходили на сайт одной пачкой
+            await asyncio.sleep(RETRY_BASE_DELAY * 2 ** (attempt - 1) * random.uniform(0.8, 1.2))
+            metrics.inc('crawl_retries_total', pharmacy=pharmacy)
+        result = await request()
+        if result is not None:
+            return result
+        metrics.inc('crawl_fetch_errors_total', pharmacy=pharmacy)
+    return None
+
+async def process_page(session, url, page, limiter, window, executor=None, cache=None, pharmacy=None,
+                       parse_backend=PARSE_BACKEND):
+    # window ограничивает число страниц в памяти: слот освобождается после записи страницы в контрольную точку
+    await window.acquire()
+    metrics = get_metrics()
+    pharmacy = pharmacy or url
+
+    async def fetch():
+        # Задержка считается после ограничителя: это время ответа сайта, а не ожидание своей очереди
+        started = time.perf_counter()
+        headers = cache.conditional_headers(page) if cache is not None else None
+        result = await fetch_page_conditional(session, url, page, headers)
+        metrics.observe('crawl_fetch_seconds', time.perf_counter() - started, pharmacy=pharmacy)
+        return result
+
+    async def load():
+        # Строки страницы или None, если попытка не удалась
+        result = await limited(limiter, url, fetch)
+        if result is None:
+            return None
+        cleaned_data = await rows_from_response(result, page, cache, executor, pharmacy, parse_backend)
+        if not cleaned_data:
+            # Число страниц известно из get_total_positions, поэтому пустая страница до последней -
+            # сбой сайта, а не конец данных: попытка повторяется без условных заголовков
+            print(f"Нет данных на странице {page}.")
+            if cache is not None:
+                cache.discard(page)
+            return None
+        return cleaned_data
+
+    return page, await with_retries(load, pharmacy)
+
+async def rows_from_response(result, page, cache, executor, pharmacy, parse_backend=PARSE_BACKEND):
+    metrics = get_metrics()
+    status, html_content, etag, last_modified, size = result
+    if status == 304:
+        metrics.inc('crawl_not_modified_total', pharmacy=pharmacy)
+        return cache.reuse(page)
+    metrics.observe('crawl_page_bytes', size, pharmacy=pharmacy)
+    if cache is None:
+        return await parse_timed(html_content, executor, pharmacy, parse_backend)
+    cache.bytes_downloaded += size
+
+    # Таблица не изменилась с прошлого обхода - разбор не нужен
+    content_hash = table_hash(html_content)
+    cleaned_data = cache.lookup(page, content_hash)
+    if cleaned_data is None:
+        cleaned_data = await parse_timed(html_content, executor, pharmacy, parse_backend)
+        cache.parsed += 1
+    if cleaned_data:
+        cache.put(page, etag, last_modified, content_hash, cleaned_data)
+    return cleaned_data
+
+async def crawl_pages(session, url, file_name, limiter, show_progress=True, executor=None,
+                      use_cache=USE_PAGE_CACHE, pharmacy=None, parse_backend=PARSE_BACKEND):
+    # pharmacy - подпись аптеки в метриках (по умолчанию ссылка).
+    # Возвращает CRAWL_SAVED, CRAWL_INCOMPLETE или CRAWL_FAILED
+    pharmacy = pharmacy or url
+    started = time.perf_counter()
+
+    # Если для этого снимка есть контрольная точка прерванного обхода, загружаются только недостающие страницы
+    checkpoint = CrawlCheckpoint(file_name)
+    if checkpoint.matches(url):
+        total_positions = checkpoint.total_positions
+        print(f"Продолжение обхода {url}: уже загружено страниц {len(checkpoint)}")
+    else:
+        total_positions = await with_retries(
+            lambda: limited(limiter, url, lambda: get_total_positions(session, url)), pharmacy)
         if not total_positions:
             print("Не удалось получить общее количество позиций.")
-            return
+            return CRAWL_FAILED
+        checkpoint.start(url, total_positions)
+
+    items_per_page = 20  # Укажите фактическое количество позиций на странице
+    total_pages = total_positions // items_per_page + (1 if total_positions % items_per_page else 0)
 
-        items_per_page = 20  # Укажите фактическое количество позиций на странице
-        total_pages = total_positions // items_per_page + (1 if total_positions % items_per_page else 0)
-        page = 1
-        while page <= total_pages:
-            html_content = await fetch_page(session, url, page)
-            if not html_content:
-                break
+    # Страницы загружаются и разбираются параллельно (не больше concurrency запросов на хост),
+    # а в снимок пишутся строго по порядку номеров
+    cache = PageCache(url) if use_cache else None
+    sink = create_snapshot_writer(file_name)
+    window = asyncio.Semaphore(MAX_PENDING_PAGES)
+    resumed_pages = [page for page in range(1, total_pages + 1) if page in checkpoint]
+    tasks = [
+        asyncio.create_task(process_page(session, url, page, limiter, window, executor, cache, pharmacy,
+                                         parse_backend))
+        for page in range(1, total_pages + 1) if page not in checkpoint
+    ]
+    try:
+        rows, complete = await write_pages_in_order(tasks, window, sink, checkpoint, total_pages,
+                                                    show_progress, pharmacy)
+    except BaseException:
+        # Обход прерван: недописанный снимок не должен попасть в дальнейшую обработку,
+        # а загруженные страницы остаются в контрольной точке
+        sink.abort()
+        checkpoint.close()
+        raise
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    if not complete:
+        # Снимок считается готовым, только когда загружены все страницы
+        sink.abort()
+        checkpoint.close()
+        print(f"Обход {url} не завершен: не загружено страниц {total_pages - len(checkpoint)}. "
+              f"При следующем запуске будут загружены только они.")
+        return CRAWL_INCOMPLETE
+    # Запись parquet-снимка обращается к словарю товаров (SQLite), поэтому выполняется вне цикла событий
+    committed = await asyncio.get_running_loop().run_in_executor(None, sink.commit)
+    checkpoint.remove()
+    if not committed:
+        return CRAWL_FAILED
+    seconds = time.perf_counter() - started
+    metrics = get_metrics()
+    metrics.set('crawl_seconds', seconds, pharmacy=pharmacy)
+    metrics.set('crawl_rows_per_second', rows / seconds if seconds > 0 else 0.0, pharmacy=pharmacy)
+    if cache is not None:
+        for page in resumed_pages:
+            cache.keep(page)
+        cache.save()
+        print(f"Страницы {url}: {cache.summary()}")
+    return CRAWL_SAVED
 
-            page_data = parse_table(html_content)
-            if not page_data:
-                print(f"Нет данных на странице {page}.")
-                break
+def write_ready_pages(sink, checkpoint, page, total_pages, fresh=None):
+    # Пишет в снимок подряд идущие страницы из контрольной точки, начиная с page.
+    # fresh - (номер, строки) только что загруженной страницы, чтобы не читать ее обратно с диска.
+    # Возвращает (следующая страница, записано строк)
+    written = 0
+    while page <= total_pages and page in checkpoint:
+        cleaned_data = fresh[1] if fresh is not None and fresh[0] == page else checkpoint.rows(page)
+        sink.write(cleaned_data)
+        written += len(cleaned_data)
+        page += 1
+    return page, written
+
+async def write_pages_in_order(tasks, window, sink, checkpoint, total_pages, show_progress=True, pharmacy=None):
+    # Каждая загруженная страница сразу дописывается в контрольную точку, а в снимок страницы
+    # попадают по порядку номеров. Возвращает (число строк в снимке, все ли страницы загружены)
+    metrics = get_metrics()
+    page, rows = write_ready_pages(sink, checkpoint, 1, total_pages)
+    try:
+        for next_result in asyncio.as_completed(tasks):
+            fetched_page, cleaned_data = await next_result
+            window.release()
+            if cleaned_data is None:
+                continue
 
-            cleaned_data = [clean_single_item(item) for item in page_data]
-            save_to_csv(cleaned_data, file_name)
+            checkpoint.add(fetched_page, cleaned_data)
+            metrics.inc('crawl_pages_total', pharmacy=pharmacy)
+            metrics.inc('crawl_rows_total', len(cleaned_data), pharmacy=pharmacy)
+            page, written = write_ready_pages(sink, checkpoint, page, total_pages, (fetched_page, cleaned_data))
+            rows += written
 
-            # Выводим прогресс
-            os.system('cls' if os.name == 'nt' else 'clear')
-            print(f"Страница {page}/{total_pages} обработана и данные сохранены.")
+            # Выводим прогресс в одной строке (без запуска clear на каждую страницу)
+            if show_progress:
+                print(f"\rСтраница {len(checkpoint)}/{total_pages} обработана и данные сохранены.", end='', flush=True)
+        return rows, page > total_pages
+    finally:
+        if show_progress and tasks:
+            print()
 
-            page += 1
-            await asyncio.sleep(random.uniform(0.5, 1.5))  # Небольшая пауза между запросами
+async def get_all_pages(url, file_name, concurrency=CONCURRENCY_PER_HOST, rate=REQUESTS_PER_SECOND,
+                        session=None, limiter=None, show_progress=True, executor=None,
+                        use_cache=USE_PAGE_CACHE, pharmacy=None, parse_backend=PARSE_BACKEND):
+    # Если сессия и ограничитель не переданы, создаем собственные на один обход.
+    # Возвращает итог обхода (CRAWL_SAVED, CRAWL_INCOMPLETE или CRAWL_FAILED)
+    if limiter is None:
+        limiter = HostLimiter(concurrency, rate)
+    if session is not None:
+        return await crawl_pages(session, url, file_name, limiter, show_progress, executor, use_cache, pharmacy,
+                                       parse_backend)
+
+    async with create_session() as session:
+        return await crawl_pages(session, url, file_name, limiter, show_progress, executor, use_cache, pharmacy,
+                                       parse_backend)
 
 def get_next_file_index(path_to_save, base_filename):
     existing_files = os.listdir(path_to_save)
     indices = []
-    pattern = re.compile(r'^(\d+)_{}.*\.csv$'.format(re.escape(base_filename)))
+    pattern = re.compile(r'^(\d+)_{}.*\.(csv|parquet|xlsx)$'.format(re.escape(base_filename)))
     for filename in existing_files:
         match = pattern.match(filename)
         if match:
             indices.append(int(match.group(1)))
     return max(indices) + 1 if indices else 0
 
-def get_parser_data(url, path_to_save):
+def get_snapshot_file_name(path_to_save, snapshot_format=SNAPSHOT_FORMAT, url=None):
+    # Незавершенный обход этой ссылки продолжается в тот же снимок
+    if url is not None:
+        file_name = find_checkpoint(path_to_save, url)
+        if file_name is not None:
+            return file_name
+
     # Определяем базовое имя файла без индекса
     base_filename = 'parsed_data'
 
@@ -202,9 +470,37 @@ def get_parser_data(url, path_to_save):
     current_time = datetime.now().strftime('%Y-%m-%d_%H-%M')
 
     # Формируем полное имя файла с индексом и временем
-    file_name = os.path.join(path_to_save, f'{index}_{base_filename}_{current_time}.csv')
+    return os.path.join(path_to_save, f'{index}_{base_filename}_{current_time}.{snapshot_format}')
+
+def create_parse_executor(parse_workers=PARSE_WORKERS):
+    # Пул процессов для разбора страниц или None, если разбирать в цикле событий
+    if not parse_workers:
+        return None
+    return ProcessPoolExecutor(max_workers=parse_workers)
 
-    # Запускаем асинхронный парсер
-    asyncio.run(get_all_pages(url, file_name))
+def report_crawl_status(status, file_name, name=None):
+    prefix = f"{name}: " if name else ''
+    if status == CRAWL_SAVED:
+        print(f'{prefix}Данные успешно сохранены в файле: {file_name}')
+    elif status == CRAWL_INCOMPLETE:
+        print(f'{prefix}Снимок {file_name} не сохранен: загружены не все страницы, обход будет продолжен')
+    else:
+        print(f'{prefix}Снимок {file_name} не сохранен')
+
+def get_parser_data(url, path_to_save, concurrency=CONCURRENCY_PER_HOST, rate=REQUESTS_PER_SECOND,
+                    parse_workers=PARSE_WORKERS, parse_backend=PARSE_BACKEND):
+    file_name = get_snapshot_file_name(path_to_save, url=url)
+
+    # Запускаем асинхронный парсер; в метриках аптека подписывается именем своей папки
+    pharmacy = os.path.basename(os.path.normpath(path_to_save))
+    executor = create_parse_executor(parse_workers)
+    try:
+        status = asyncio.run(get_all_pages(url, file_name, concurrency, rate, executor=executor, pharmacy=pharmacy,
+                                           parse_backend=parse_backend))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        get_metrics().write_prometheus()
 
-    print(f'Данные успешно сохранены в файле: {file_name}')
\ No newline at end of file
+    report_crawl_status(status, file_name)
+    return status
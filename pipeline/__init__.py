@@ -0,0 +1,5 @@
+# Шаги конвейера как обычные функции: импорт пакета ничего не запускает, не спрашивает
+# через input() и не создает папок, поэтому его можно держать загруженным в долгоживущем процессе
+from pipeline.steps import (STEP_MODULES, add_graph_links, build_lists_for_analysis, delete_files_by_name,
+                            find_differences, generate_pre_ans_table, load_step, move_all_files,
+                            parse_my_pharmacy, sort_and_plot)
@@ -0,0 +1,90 @@
+import argparse
+import pipeline
+from metrics import add_profile_argument, get_metrics, stage
+from run_pipeline import add_run_arguments, run_from_args
+
+
+def build_parser():
+    arg_parser = argparse.ArgumentParser(prog='python -m pipeline', description="Шаги конвейера по отдельности или целиком")
+    commands = arg_parser.add_subparsers(dest='command', required=True)
+
+    command = commands.add_parser('parse-my', help="шаг 0: парсинг нашей аптеки")
+    add_profile_argument(command)
+    command.add_argument('my_apteka', help="название нашей аптеки")
+    command.add_argument('link', help="ссылка на нашу аптеку")
+    command.add_argument('--output-dir')
+
+    command = commands.add_parser('move', help="шаг 1: перенос снимков в хранилище")
+    add_profile_argument(command)
+    command.add_argument('--competitors-dir')
+    command.add_argument('--our-pharmacies-dir')
+
+    command = commands.add_parser('diff', help="шаг 2: разница с ассортиментом нашей аптеки")
+    add_profile_argument(command)
+    command.add_argument('apteka_file', help="снимок нашей аптеки")
+    command.add_argument('--competitors-dir')
+    command.add_argument('--output-dir')
+
+    command = commands.add_parser('lists', help="шаг 3: списки товаров для анализа")
+    add_profile_argument(command)
+    command.add_argument('--input-dir')
+    command.add_argument('--output-dir')
+
+    command = commands.add_parser('pre-ans', help="шаг 4: таблицы pre_ans")
+    add_profile_argument(command)
+    command.add_argument('--analysis-dir')
+    command.add_argument('--diff-dir')
+    command.add_argument('--output-dir')
+    command.add_argument('--no-correction', action='store_true', help="не исправлять ошибочные значения")
+
+    command = commands.add_parser('sort', help="шаг 5: сортировка по продажам и графики")
+    add_profile_argument(command)
+    command.add_argument('--input-dir')
+    command.add_argument('--output-dir')
+    command.add_argument('--show-quantity', action='store_true', help="не скрывать столбцы количества")
+
+    command = commands.add_parser('links', help="шаг 6: ссылки на графики для pre_ans_sorted_new")
+    add_profile_argument(command)
+    command.add_argument('--input-dir')
+    command.add_argument('--output-dir')
+
+    command = commands.add_parser('delete-file', help="удалить файл из папок всех конкурентов")
+    command.add_argument('file_name')
+    command.add_argument('--base-path')
+
+    add_run_arguments(commands.add_parser('run', help="шаги 0-6 в одном процессе с общим пулом"))
+    return arg_parser
+
+
+def main(argv=None):
+    arg_parser = build_parser()
+    args = arg_parser.parse_args(argv)
+
+    if args.command == 'run':
+        run_from_args(arg_parser, args)
+        return
+    if args.command == 'delete-file':
+        pipeline.delete_files_by_name(args.file_name, args.base_path)
+        return
+
+    # Отдельный шаг замеряется как один этап; отчет пишется так же, как после run
+    with stage(args.command.replace('-', '_'), args.profile) as stats:
+        if args.command == 'parse-my':
+            pipeline.parse_my_pharmacy(args.my_apteka, args.link, args.output_dir)
+        elif args.command == 'move':
+            pipeline.move_all_files(competitors_dir=args.competitors_dir, our_pharmacies_dir=args.our_pharmacies_dir)
+        elif args.command == 'diff':
+            pipeline.find_differences(args.apteka_file, args.competitors_dir, args.output_dir)
+        elif args.command == 'lists':
+            pipeline.build_lists_for_analysis(input_dir=args.input_dir, output_dir=args.output_dir)
+        elif args.command == 'pre-ans':
+            pipeline.generate_pre_ans_table(args.analysis_dir, args.diff_dir, args.output_dir,
+                                            enable_correction=False if args.no_correction else None)
+        elif args.command == 'sort':
+            pipeline.sort_and_plot(args.input_dir, args.output_dir, hide_quantity_columns=not args.show_quantity)
+        elif args.command == 'links':
+            pipeline.add_graph_links(args.input_dir, args.output_dir)
+    print(f"{args.command}: {stats.seconds:.1f} с, строк {stats.rows}")
+    metrics = get_metrics()
+    metrics.write_prometheus()
+    print(f"Отчет о запуске: {metrics.write_report()}")
@@ -0,0 +1,78 @@
+import importlib
+
+# Модули шагов названы с цифры, поэтому загружаются по имени. Загрузка ленивая:
+# импорт пакета не тянет aiohttp, plotly и т.п., пока соответствующий шаг не вызван
+STEP_MODULES = {
+    0: '0_get_parsed_data_my_apteka',
+    1: '1_get_all_files_to_excel',
+    2: '2_get_diff',
+    3: '3_get_list_for_analis',
+    4: '4_get_pre_ans_table',
+    5: '5_get_ans_to_one',
+    6: '6_get_ans_of_all',
+}
+
+
+def load_step(step):
+    return importlib.import_module(STEP_MODULES[step])
+
+
+def parse_my_pharmacy(my_apteka, my_apteka_link, output_dir=None):
+    # Шаг 0: снимок нашей аптеки
+    module = load_step(0)
+    return module.parse_my_pharmacy(my_apteka, my_apteka_link, output_dir or module.our_pharmacies_folder)
+
+
+def move_all_files(pool=None, competitors_dir=None, our_pharmacies_dir=None,
+                   target_comp_dir=None, target_our_pharmacies_dir=None):
+    # Шаг 1: перенос снимков в хранилище
+    module = load_step(1)
+    module.move_all_files(pool,
+                          competitors_dir or module.competitor_folder,
+                          our_pharmacies_dir or module.our_pharmacies_folder,
+                          target_comp_dir or module.target_comp_folder,
+                          target_our_pharmacies_dir or module.target_our_pharmacies_folder)
+
+
+def find_differences(apteka_file, competitors_dir=None, output_dir=None, pool=None):
+    # Шаг 2: товары конкурентов, которых нет в нашей аптеке
+    module = load_step(2)
+    module.find_differences(apteka_file, competitors_dir or module.competitors_directory,
+                            output_dir or module.output_directory, pool)
+
+
+def build_lists_for_analysis(pool=None, input_dir=None, output_dir=None):
+    # Шаг 3: {конкурент: список товаров для анализа}
+    module = load_step(3)
+    return module.build_lists_for_analysis(pool, input_dir or module.base_path, output_dir or module.output_path)
+
+
+def generate_pre_ans_table(analysis_dir=None, diff_comp_dir=None, output_dir=None, enable_correction=None,
+                           lists=None, pool=None):
+    # Шаг 4: {файл: таблица pre_ans}
+    module = load_step(4)
+    if enable_correction is None:
+        enable_correction = module.enable_correction
+    return module.generate_pre_ans_table(analysis_dir or module.analysis_directory,
+                                         diff_comp_dir or module.comparison_directory,
+                                         output_dir or module.output_directory,
+                                         enable_correction, lists=lists, pool=pool)
+
+
+def sort_and_plot(input_dir=None, output_dir=None, frames=None, hide_quantity_columns=True, pool=None):
+    # Шаг 5: сортировка по продажам и графики
+    module = load_step(5)
+    module.sort_and_plot(input_dir or module.input_folder, output_dir or module.output_folder,
+                         frames=frames, hide_quantity_columns=hide_quantity_columns, pool=pool)
+
+
+def add_graph_links(input_dir=None, output_dir=None, pool=None):
+    # Шаг 6: ссылки на графики для pre_ans_sorted_new
+    module = load_step(6)
+    module.add_graph_links(input_dir or module.input_dir, output_dir or module.output_dir, pool)
+
+
+def delete_files_by_name(target_filename, base_path=None):
+    # Удаление файла с заданным именем из папок всех конкурентов
+    module = importlib.import_module('del_file')
+    module.delete_files_by_name(base_path or module.base_path, target_filename)
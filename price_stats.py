@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+
+# Режим подсчета статистики цен:
+# 'exact'     - все цены держатся в памяти, одна групповая агрегация в конце;
+# 'streaming' - копятся только счетчики (товар, цена), медиана считается по весам
+PRICE_STATS_MODE = 'exact'
+
+# Для 'streaming': до скольких знаков округлять цену перед подсчетом (None - без округления).
+# Округление делает медиану приближенной, но ограничивает число различных цен на товар
+STREAMING_PRICE_DECIMALS = None
+
+PRICE_PATTERN = r"([\d\s]+[.,]?\d*)"
+
+
+def extract_prices(price_strings):
+    # Векторный аналог re.search(PRICE_PATTERN) + float(...): нераспознанные цены - NaN
+    price_values = price_strings.astype(str).str.extract(PRICE_PATTERN, expand=False)
+    price_values = price_values.str.replace(',', '.', regex=False).str.replace(' ', '', regex=False)
+    # float() допускает пробельные символы по краям, но не внутри числа
+    price_values = price_values.str.strip()
+    price_values = price_values.where(~price_values.str.contains(r'\s', na=False))
+    return pd.to_numeric(price_values, errors='coerce')
+
+
+def weighted_median(counts):
+    # counts - Series с индексом (key, price) и числом повторов; медиана как у np.median
+    frame = counts.rename('count').reset_index().sort_values(['key', 'price'], kind='stable')
+    cumulative = frame.groupby('key', sort=False)['count'].cumsum()
+    total = frame.groupby('key', sort=False)['count'].transform('sum')
+    lower = frame[cumulative > (total - 1) // 2].groupby('key', sort=False)['price'].first()
+    upper = frame[cumulative > total // 2].groupby('key', sort=False)['price'].first()
+    return (lower + upper.reindex(lower.index)) / 2
+
+
+class PriceStatistics:
+    def __init__(self, mode=PRICE_STATS_MODE, decimals=STREAMING_PRICE_DECIMALS):
+        if mode not in ('exact', 'streaming'):
+            raise ValueError(f"Неизвестный режим статистики цен: {mode}")
+        self.mode = mode
+        self.decimals = decimals
+        self.frames = []
+        self.counts = None
+
+    def add(self, keys, price_strings):
+        prices = extract_prices(price_strings)
+        valid = prices.notna().to_numpy()
+        frame = pd.DataFrame({'key': np.asarray(keys)[valid], 'price': prices.to_numpy()[valid]})
+        if frame.empty:
+            return
+        if self.mode == 'exact':
+            self.frames.append(frame)
+            return
+
+        if self.decimals is not None:
+            frame['price'] = frame['price'].round(self.decimals)
+        counts = frame.groupby(['key', 'price']).size()
+        self.counts = counts if self.counts is None else self.counts.add(counts, fill_value=0)
+
+    def is_empty(self):
+        return not self.frames and self.counts is None
+
+    def result(self):
+        # DataFrame с индексом key и колонками min, max, median
+        if self.is_empty():
+            return pd.DataFrame(columns=['min', 'max', 'median'], dtype=float)
+        if self.mode == 'exact':
+            prices = pd.concat(self.frames, ignore_index=True)
+            return prices.groupby('key')['price'].agg(['min', 'max', 'median'])
+
+        counts = self.counts.astype(np.int64)
+        prices = counts.index.to_frame(index=False)
+        stats = prices.groupby('key')['price'].agg(['min', 'max'])
+        stats['median'] = weighted_median(counts)
+        return stats
@@ -0,0 +1,74 @@
+import os
+import sqlite3
+import numpy as np
+import pandas as pd
+
+# Общий для всех шагов словарь товаров: шесть ключевых колонок -> постоянный целый номер
+PRODUCT_INDEX_PATH = os.path.join('Datasets', 'product_index.sqlite')
+
+KEY_COLUMNS = ['name', 'item_type', 'item_form', 'prescription', 'manufacturer', 'country']
+
+
+def product_keys(df):
+    # Строковый ключ товара, как в шаге 4: шесть колонок через '|', пропуски - пустые строки
+    columns = [df[column].fillna('').astype(str) for column in KEY_COLUMNS]
+    return columns[0].str.cat(columns[1:], sep='|')
+
+
+class ProductIndex:
+    # Номера выдаются один раз и больше не меняются; SQLite позволяет
+    # пополнять словарь из нескольких процессов одновременно
+    def __init__(self, path=PRODUCT_INDEX_PATH):
+        self.path = path
+        self.ids = {}
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._execute(lambda connection: connection.execute(
+            'CREATE TABLE IF NOT EXISTS products (id INTEGER PRIMARY KEY, key TEXT UNIQUE NOT NULL)'))
+
+    def _execute(self, action):
+        # Одна транзакция на вызов; соединение закрывается сразу, чтобы не держать блокировку
+        connection = sqlite3.connect(self.path, timeout=60)
+        try:
+            with connection:
+                return action(connection)
+        finally:
+            connection.close()
+
+    def _insert_and_fetch(self, connection, missing):
+        connection.executemany('INSERT OR IGNORE INTO products (key) VALUES (?)', ((key,) for key in missing))
+        # Номера могли быть выданы другим процессом, поэтому читаем их из базы
+        for start in range(0, len(missing), 500):
+            chunk = missing[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            for product_id, key in connection.execute(
+                    f'SELECT id, key FROM products WHERE key IN ({placeholders})', chunk):
+                self.ids[key] = product_id
+
+    def ids_for_keys(self, keys):
+        keys = pd.Series(keys, dtype=object)
+        unique_keys = pd.unique(keys)
+        missing = [key for key in unique_keys if key not in self.ids]
+        if missing:
+            self._execute(lambda connection: self._insert_and_fetch(connection, missing))
+        return keys.map(self.ids).to_numpy(dtype=np.int64)
+
+    def ids_for(self, df):
+        return self.ids_for_keys(product_keys(df))
+
+
+_default_index = None
+
+
+def get_product_index():
+    # Один словарь на процесс
+    global _default_index
+    if _default_index is None:
+        _default_index = ProductIndex()
+    return _default_index
+
+
+def product_ids(df):
+    # Номера товаров из колонки product_id, а для старых снимков без нее - из словаря
+    if 'product_id' in df.columns:
+        return pd.to_numeric(df['product_id']).to_numpy(dtype=np.int64)
+    return get_product_index().ids_for(df)
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+# Тип значений матрицы остатков (товары x снимки)
+QUANTITY_DTYPE = np.float32
+
+
+def quantity_frame(keys, quantity_strings, snapshot):
+    # Длинная таблица одного снимка: key, snapshot, quantity.
+    # Повторы ключа в снимке - берется последнее значение, пустое количество - 0
+    frame = pd.DataFrame({'key': np.asarray(keys), 'quantity': np.asarray(quantity_strings)})
+    frame = frame.drop_duplicates('key', keep='last')
+    quantities = pd.to_numeric(frame['quantity'].replace('', np.nan), errors='coerce').fillna(0.0)
+    return pd.DataFrame({
+        'key': frame['key'].to_numpy(),
+        'snapshot': np.full(len(frame), snapshot, dtype=np.int32),
+        'quantity': quantities.to_numpy(dtype=QUANTITY_DTYPE),
+    })
+
+
+def build_quantity_matrix(keys, frames, num_snapshots, dtype=QUANTITY_DTYPE):
+    # Один разворот длинной таблицы в непрерывную матрицу (строки - keys, столбцы - снимки).
+    # Товары, которых нет в снимке, получают 0
+    keys = pd.Series(keys)
+    unique_keys = pd.Index(keys.unique())
+    matrix = np.zeros((len(unique_keys), num_snapshots), dtype=dtype)
+
+    if frames:
+        long_table = pd.concat(frames, ignore_index=True)
+        rows = unique_keys.get_indexer(long_table['key'])
+        known = rows >= 0
+        matrix[rows[known], long_table['snapshot'].to_numpy()[known]] = long_table['quantity'].to_numpy()[known]
+
+    # Повторяющиеся ключи получают одну и ту же строку, как при map по словарю
+    return matrix[unique_keys.get_indexer(keys)]
+
+
+def export_values(matrix):
+    # float32 -> float64 через кратчайшую десятичную запись, чтобы в Excel было 0.1, а не 0.100000001
+    if matrix.dtype == np.float32:
+        return matrix.astype(str).astype(np.float64)
+    return matrix
+
+
+def to_wide_frame(matrix, columns, index=None):
+    return pd.DataFrame(export_values(matrix), columns=columns, index=index)
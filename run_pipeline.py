@@ -0,0 +1,200 @@
+import argparse
+import hashlib
+import json
+import os
+import multiprocessing
+from snapshot_store import is_table
+from metrics import add_profile_argument, get_metrics, stage
+import pipeline
+from pipeline.steps import STEP_MODULES, load_step
+
+# Шаги 3 и 4 читают файлы разницы шага 2 с диска, а не получают их в памяти: шаг 2 обрабатывает
+# только новые снимки (см. manifest.json в diff_comp), а шагам 3 и 4 нужна вся история разниц.
+# Передача в памяти сэкономила бы чтение только что записанных файлов, но не остальных
+
+# Состояние конвейера: отпечатки входов каждого шага на момент его последнего успешного запуска
+STATE_PATH = os.path.join('Datasets', 'pipeline_state.json')
+
+FIRST_STEP = 0
+LAST_STEP = 6
+
+# Шаг -> (модуль, описание, входные папки, выходная папка)
+STEPS = {
+    0: (STEP_MODULES[0], "Парсинг нашей аптеки", [], os.path.join('Datasets', 'our_pharmacies')),
+    1: (STEP_MODULES[1], "Перенос снимков в хранилище",
+        [os.path.join('Datasets', 'competitors'), os.path.join('Datasets', 'our_pharmacies')], os.path.join('Datasets', 'data')),
+    2: (STEP_MODULES[2], "Разница с ассортиментом нашей аптеки",
+        [os.path.join('Datasets', 'data', 'comp')], os.path.join('Datasets', 'diff_comp')),
+    3: (STEP_MODULES[3], "Списки товаров для анализа",
+        [os.path.join('Datasets', 'diff_comp')], os.path.join('Datasets', 'list_for_analis')),
+    4: (STEP_MODULES[4], "Таблицы pre_ans",
+        [os.path.join('Datasets', 'list_for_analis'), os.path.join('Datasets', 'diff_comp')], os.path.join('Datasets', 'pre_ans')),
+    5: (STEP_MODULES[5], "Сортировка по продажам и графики",
+        [os.path.join('Datasets', 'pre_ans')], os.path.join('Datasets', 'pre_ans_sorted_graph')),
+    6: (STEP_MODULES[6], "Ссылки на графики для pre_ans_sorted_new",
+        [os.path.join('Datasets', 'pre_ans_sorted_new')], os.path.join('Datasets', 'pre_ans_sorted_graph')),
+}
+
+
+def inputs_fingerprint(paths, extra=None):
+    # Хэш списка файлов входных папок (путь, размер, время изменения) и параметров шага
+    digest = hashlib.sha1()
+    for path in paths:
+        if os.path.isfile(path):
+            files = [path]
+        else:
+            files = sorted(os.path.join(root, file) for root, _, names in os.walk(path) for file in names
+                           if not file.endswith('.part'))
+        for file_path in files:
+            stat = os.stat(file_path)
+            digest.update(f"{file_path}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode('utf-8'))
+    digest.update(json.dumps(extra, sort_keys=True, ensure_ascii=False).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def load_state(path=STATE_PATH):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Не удалось прочитать {path}, все шаги будут выполнены заново: {e}")
+        return {}
+
+
+def save_state(state, path=STATE_PATH):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path + '.part', 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=1)
+    os.replace(path + '.part', path)
+
+
+def latest_our_table(directory=os.path.join('Datasets', 'data', 'our_pharmacies')):
+    # Самый свежий снимок нашей аптеки, если файл для шага 2 не указан явно
+    tables = [os.path.join(root, file) for root, _, files in os.walk(directory) for file in files if is_table(file)]
+    return max(tables, key=os.path.getmtime) if tables else None
+
+
+class PipelineRunner:
+    # Выполняет шаги с first по last в одном процессе: таблицы шагов 3 и 4 передаются следующему шагу
+    # в памяти, на диск пишутся только результаты шагов (они же контрольные точки), пул процессов общий.
+    # Разницы шага 2 шаги 3 и 4 читают с диска (см. комментарий в начале модуля)
+    def __init__(self, first=FIRST_STEP, last=LAST_STEP, force=False, apteka_file=None,
+                 my_apteka=None, my_apteka_link=None, processes=None, state_path=STATE_PATH, profile=None):
+        self.first = first
+        self.last = last
+        self.force = force
+        self.apteka_file = apteka_file
+        self.my_apteka = my_apteka
+        self.my_apteka_link = my_apteka_link
+        self.processes = processes or multiprocessing.cpu_count()
+        self.state_path = state_path
+        self.profile = profile
+        self.state = load_state(state_path)
+        self.lists = None
+        self.pre_ans = None
+
+    def step_params(self, step):
+        if step == 2:
+            return {'apteka_file': self.apteka_file}
+        if step == 4:
+            return {'enable_correction': load_step(4).enable_correction}
+        return None
+
+    def step_inputs(self, step):
+        inputs = list(STEPS[step][2])
+        if step == 2 and self.apteka_file:
+            inputs.append(self.apteka_file)
+        return inputs
+
+    def is_up_to_date(self, step, fingerprint):
+        output_dir = STEPS[step][3]
+        return not self.force and self.state.get(str(step)) == fingerprint and os.path.exists(output_dir)
+
+    def run_step(self, step, pool):
+        if step == 0:
+            pipeline.parse_my_pharmacy(self.my_apteka, self.my_apteka_link)
+        elif step == 1:
+            pipeline.move_all_files(pool)
+        elif step == 2:
+            pipeline.find_differences(self.apteka_file, pool=pool)
+        elif step == 3:
+            self.lists = pipeline.build_lists_for_analysis(pool)
+        elif step == 4:
+            self.pre_ans = pipeline.generate_pre_ans_table(lists=self.lists, pool=pool)
+        elif step == 5:
+            pipeline.sort_and_plot(frames=self.pre_ans, pool=pool)
+        elif step == 6:
+            pipeline.add_graph_links(pool=pool)
+
+    def skip_reason(self, step):
+        if step == 0 and not (self.my_apteka and self.my_apteka_link):
+            return "не заданы --my-apteka и --link"
+        if step == 2 and not self.apteka_file:
+            # Снимок ищется только сейчас: шаг 1 мог только что перенести его в хранилище
+            self.apteka_file = latest_our_table()
+            if not self.apteka_file:
+                return "не найден снимок нашей аптеки (--apteka-file)"
+            print(f"Снимок нашей аптеки: {self.apteka_file}")
+        missing = [path for path in STEPS[step][2] if not os.path.exists(path)]
+        if step > 1 and missing:
+            return f"нет входных данных: {', '.join(missing)}"
+        return None
+
+    def run(self):
+        with multiprocessing.Pool(processes=self.processes) as pool:
+            for step in range(self.first, self.last + 1):
+                description = STEPS[step][1]
+                reason = self.skip_reason(step)
+                if reason:
+                    print(f"[{step}] {description}: пропущен, {reason}")
+                    continue
+
+                # Отпечаток входов считается перед запуском, после того как предыдущие шаги их обновили
+                fingerprint = None
+                if step != 0:
+                    fingerprint = inputs_fingerprint(self.step_inputs(step), self.step_params(step))
+                    if self.is_up_to_date(step, fingerprint):
+                        print(f"[{step}] {description}: входные данные не изменились, пропущен")
+                        continue
+
+                print(f"[{step}] {description}")
+                with stage(f"step_{step}", self.profile) as stats:
+                    self.run_step(step, pool)
+                print(f"[{step}] {description}: {stats.seconds:.1f} с, строк {stats.rows}")
+                if fingerprint is not None:
+                    # Шаг 1 перемещает часть файлов из своих входных папок, поэтому отпечаток снимается заново
+                    self.state[str(step)] = inputs_fingerprint(self.step_inputs(step), self.step_params(step))
+                    save_state(self.state, self.state_path)
+
+        metrics = get_metrics()
+        metrics.write_prometheus()
+        print(f"Отчет о запуске: {metrics.write_report()}")
+
+
+def add_run_arguments(arg_parser):
+    arg_parser.add_argument('--from', dest='first', type=int, default=1, choices=sorted(STEPS),
+                            help="первый шаг (по умолчанию 1: новые снимки обхода из Datasets/competitors "
+                                 "переносятся в хранилище при каждом запуске; шаги, входы которых не изменились, "
+                                 "пропускаются; шаг 0 - парсинг нашей аптеки)")
+    arg_parser.add_argument('--to', dest='last', type=int, default=LAST_STEP, choices=sorted(STEPS))
+    arg_parser.add_argument('--force', action='store_true', help="выполнить шаги, даже если входы не изменились")
+    arg_parser.add_argument('--apteka-file', help="снимок нашей аптеки для шага 2 (по умолчанию самый свежий)")
+    arg_parser.add_argument('--my-apteka', help="название нашей аптеки для шага 0")
+    arg_parser.add_argument('--link', help="ссылка на нашу аптеку для шага 0")
+    arg_parser.add_argument('--processes', type=int, default=None, help="размер общего пула процессов")
+    add_profile_argument(arg_parser)
+
+
+def run_from_args(arg_parser, args):
+    if args.first > args.last:
+        arg_parser.error("--from должен быть не больше --to")
+    PipelineRunner(args.first, args.last, args.force, args.apteka_file, args.my_apteka, args.link,
+                   args.processes, profile=args.profile).run()
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Запуск шагов конвейера 0-6 в одном процессе")
+    add_run_arguments(arg_parser)
+    run_from_args(arg_parser, arg_parser.parse_args())
@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+
+METRIC_COLUMNS = ["Индекс изменений", "Сегменты", "Частота изменений в минус"]
+
+
+class SegmentChanges:
+    # Индексы смены сегментов всех строк в формате CSR:
+    # индексы строки i лежат в indices[indptr[i]:indptr[i + 1]]
+    def __init__(self, indptr, indices):
+        self.indptr = indptr
+        self.indices = indices
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    def row(self, position):
+        return self.indices[self.indptr[position]:self.indptr[position + 1]]
+
+    def counts(self):
+        return np.diff(self.indptr)
+
+    def take(self, positions):
+        # Индексы только для выбранных строк, в их порядке
+        positions = np.asarray(positions, dtype=np.int64)
+        counts = self.counts()[positions]
+        indptr = np.zeros(len(positions) + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+        offsets = np.arange(indptr[-1]) - np.repeat(indptr[:-1], counts)
+        indices = self.indices[np.repeat(self.indptr[positions], counts) + offsets]
+        return SegmentChanges(indptr, indices)
+
+    def coo(self):
+        # Пары (номер строки, индекс) для всех смен сегментов
+        return np.repeat(np.arange(len(self)), self.counts()), self.indices
+
+
+def calculate_metrics(values):
+    # values - матрица остатков (товары x снимки), пропуски считаются нулями.
+    # Возвращает DataFrame с METRIC_COLUMNS и SegmentChanges с индексами смены сегментов
+    values = np.nan_to_num(np.asarray(values, dtype=np.float64), nan=0.0)
+    num_rows, num_columns = values.shape
+    changes = np.diff(values, axis=1)
+
+    decreases = changes < 0
+    sold = np.where(decreases, -changes, 0.0).sum(axis=1)
+    negative_changes = decreases.sum(axis=1)
+
+    # Новый сегмент начинается на каждом росте количества; индекс - номер столбца после роста
+    increase_rows, increase_columns = np.nonzero(changes > 0)
+    indptr = np.zeros(num_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(increase_rows, minlength=num_rows), out=indptr[1:])
+    segment_changes = SegmentChanges(indptr, (increase_columns + 1).astype(np.int64))
+
+    segments = segment_changes.counts() + (1 if num_columns else 0)
+    metrics = pd.DataFrame({
+        "Индекс изменений": sold,
+        "Сегменты": segments,
+        "Частота изменений в минус": negative_changes,
+    })
+    return metrics, segment_changes
+
+
+def calculate_metrics_row(quantity_values):
+    # Исходный построчный расчет; оставлен как эталон для сверки с calculate_metrics
+    sold = 0
+    segments = []
+    temp_segment = []
+    prev_val = None
+    segment_change_indices = []
+    negative_changes = 0
+
+    for idx, curr_val in enumerate(quantity_values):
+        if pd.isnull(curr_val):
+            curr_val = 0
+        if prev_val is not None:
+            change = curr_val - prev_val
+            if change < 0:
+                sold += -change
+                negative_changes += 1
+            if change > 0:
+                if temp_segment:
+                    segments.append(temp_segment)
+                    segment_change_indices.append(idx)
+                temp_segment = []
+        temp_segment.append(curr_val)
+        prev_val = curr_val
+
+    if temp_segment:
+        segments.append(temp_segment)
+
+    return pd.Series({
+        "Индекс изменений": sold,
+        "Сегменты": len(segments),
+        "Частота изменений в минус": negative_changes,
+        "Индексы смены сегментов": segment_change_indices
+    })
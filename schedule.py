@@ -1,11 +1,28 @@
+import asyncio
 import os
-import time
+import random
+import threading
 from datetime import datetime, timedelta
 from utils import *  # Убедитесь, что эта библиотека реализована
 from parser import *  # Убедитесь, что эта библиотека реализована
+from crawler import crawl_pharmacy, COMPETITORS_DIR, CRAWLER_PARSE_WORKERS, GLOBAL_CONCURRENCY
+from metrics import start_metrics_server
 
-# Флаг для остановки планировщика
-stop_scheduler = False
+# Времена выполнения задач по умолчанию
+DEFAULT_TASK_TIMES = ["08:20", "10:20", "12:20", "14:20", "16:20", "18:20", "20:20", "22:20", "23:30"]
+
+# Случайная задержка запуска (в секундах), чтобы аптеки не стартовали одновременно
+JITTER_SECONDS = 60
+
+# Что делать, если время запуска наступило, а предыдущий обход еще идет:
+# 'skip'  - пропустить этот запуск,
+# 'queue' - выполнить один запуск сразу после окончания текущего
+OVERLAP_POLICY = 'skip'
+
+# Событие для остановки планировщика
+stop_event = threading.Event()
+_async_stop = None
+_async_loop = None
 
 # Функция для выполнения задачи
 def job(cur_apteka, cur_apteka_link):
@@ -17,9 +34,44 @@ def job(cur_apteka, cur_apteka_link):
         os.makedirs(save_directory, exist_ok=True)
         get_parser_data(cur_apteka_link, save_directory)
 
+# Функция для разбора расписания в стиле cron: "08:20,*/2:50,*:05"
+# Часы и минуты задаются числом, "*" (каждый) или "*/N" (каждый N-й).
+# Неверное расписание - ValueError с описанием ошибки
+def parse_task_times(spec):
+    if not spec:
+        return list(DEFAULT_TASK_TIMES)
+
+    def expand(field, limit):
+        if field == '*':
+            return range(limit)
+        if field.startswith('*/'):
+            step = field[2:]
+            if not step.isdigit() or int(step) == 0:
+                raise ValueError(f"Неверный шаг '{field}': после */ нужно целое число больше 0")
+            return range(0, limit, int(step))
+        if not field.isdigit():
+            raise ValueError(f"Неверное значение '{field}': нужно число, '*' или '*/N'")
+        value = int(field)
+        if not 0 <= value < limit:
+            raise ValueError(f"Значение {value} вне диапазона 0-{limit - 1}")
+        return [value]
+
+    task_times = set()
+    for part in spec.split(','):
+        if part.count(':') != 1:
+            raise ValueError(f"Неверное время '{part}': нужен формат часы:минуты")
+        hours, minutes = part.strip().split(':')
+        for hour in expand(hours, 24):
+            for minute in expand(minutes, 60):
+                task_times.add(f"{hour:02d}:{minute:02d}")
+    return sorted(task_times)
+
 # Функция для вычисления времени до следующего запуска
 def time_until_next_run(current_time, task_times):
-    now = datetime.strptime(current_time, '%H:%M')
+    if isinstance(current_time, datetime):
+        now = datetime.strptime(current_time.strftime('%H:%M:%S'), '%H:%M:%S')
+    else:
+        now = datetime.strptime(current_time, '%H:%M')
     for task_time in task_times:
         task_datetime = datetime.strptime(task_time, '%H:%M')
         if task_datetime > now:
@@ -29,53 +81,136 @@ def time_until_next_run(current_time, task_times):
     next_day_task_time = first_task_time + timedelta(days=1)
     return next_day_task_time - now
 
-# Планировщик
-def run_schedule(cur_apteka, cur_apteka_link):
-    global stop_scheduler
-    # Времена выполнения задач
-    task_times = ["08:20", "10:20", "12:20", "14:20", "16:20", "18:20", "20:20", "22:20", "23:30"]
-
-    # Словарь для хранения времени последнего выполнения
-    last_run_time = None
-
-    while not stop_scheduler:
-        current_time = datetime.now().strftime('%H:%M')
-
-        # Проверяем, совпадает ли текущее время с любым из запланированных
-        if current_time in task_times and current_time != last_run_time:
-            print(f"Время совпало: {current_time}, запускаем задачу!")
-            job(cur_apteka, cur_apteka_link)
-            last_run_time = current_time  # Обновляем время последнего выполнения
-            # Ждем одну минуту, чтобы избежать повторного запуска в ту же минуту
-            time.sleep(60)
+# Функция для вычисления момента следующего запуска (без учета случайной задержки)
+def next_run_time(current_time, task_times):
+    return (current_time + time_until_next_run(current_time, task_times)).replace(microsecond=0)
+
+# Планировщик для одной аптеки: спит до следующего запуска, экран не перерисовывает
+def run_schedule(cur_apteka, cur_apteka_link, task=None, task_times=None,
+                 jitter=JITTER_SECONDS, overlap_policy=OVERLAP_POLICY):
+    # По умолчанию обходим одну аптеку
+    if task is None:
+        task = lambda: job(cur_apteka, cur_apteka_link)
+    if task_times is None:
+        task_times = DEFAULT_TASK_TIMES
+
+    slot = datetime.now()
+    while not stop_event.is_set():
+        slot = next_run_time(max(datetime.now(), slot), task_times)
+        start_at = slot + timedelta(seconds=random.uniform(0, jitter))
+        print(f"{cur_apteka}: следующий запуск в {start_at.strftime('%Y-%m-%d %H:%M:%S')}")
+
+        # Ждем до наступления срока или до остановки планировщика
+        if stop_event.wait(max(0.0, (start_at - datetime.now()).total_seconds())):
+            break
+
+        task()
+
+        # Запуски, время которых пришло, пока шел обход
+        missed = next_run_time(slot, task_times) <= datetime.now()
+        while missed and not stop_event.is_set():
+            if overlap_policy != 'queue':
+                print(f"{cur_apteka}: обход занял больше интервала, пропущенные запуски не выполняются.")
+                break
+            print(f"{cur_apteka}: обход занял больше интервала, выполняем отложенный запуск.")
+            slot = datetime.now()
+            task()
+            missed = next_run_time(slot, task_times) <= datetime.now()
+
+# Асинхронный планировщик одной аптеки внутри общего процесса
+async def run_pharmacy_schedule(session, limiter, executor, name, url, task_times, jitter, overlap_policy):
+    running = None
+    queued = False
+    slot = datetime.now()
+
+    async def run_after(previous):
+        nonlocal queued
+        await asyncio.gather(previous, return_exceptions=True)
+        queued = False
+        await crawl_pharmacy(session, limiter, name, url, COMPETITORS_DIR, executor)
+
+    while not _async_stop.is_set():
+        slot = next_run_time(max(datetime.now(), slot), task_times)
+        start_at = slot + timedelta(seconds=random.uniform(0, jitter))
+        print(f"{name}: следующий запуск в {start_at.strftime('%Y-%m-%d %H:%M:%S')}")
+
+        try:
+            delay = max(0.0, (start_at - datetime.now()).total_seconds())
+            await asyncio.wait_for(_async_stop.wait(), timeout=delay)
+            break
+        except asyncio.TimeoutError:
+            pass
+
+        if running is None or running.done():
+            running = asyncio.create_task(crawl_pharmacy(session, limiter, name, url, COMPETITORS_DIR, executor))
+        elif overlap_policy == 'queue' and not queued:
+            print(f"{name}: предыдущий обход еще идет, запуск поставлен в очередь.")
+            queued = True
+            running = asyncio.create_task(run_after(running))
         else:
-            os.system('cls' if os.name == 'nt' else 'clear')  # Очистка экрана
-            print(f"=== Планировщик задач ===")
-            print(f"Текущая аптека: {cur_apteka}")
-            print(f"Ссылка: {cur_apteka_link}")
-            print(f"Текущее время: {current_time}")
+            print(f"{name}: предыдущий обход еще идет, запуск пропущен.")
+
+    if running is not None:
+        running.cancel()
+        await asyncio.gather(running, return_exceptions=True)
 
-            # Вычисляем время до следующего запуска
-            time_left = time_until_next_run(current_time, task_times)
-            print(f"До следующего запуска осталось: {time_left}")
+# Планировщик для всех аптек: у каждой свое расписание, сессия и ограничения общие
+async def run_schedule_all(entries, jitter=JITTER_SECONDS, overlap_policy=OVERLAP_POLICY,
+                           global_concurrency=GLOBAL_CONCURRENCY, parse_workers=CRAWLER_PARSE_WORKERS):
+    global _async_stop, _async_loop
+    _async_stop = asyncio.Event()
+    _async_loop = asyncio.get_running_loop()
 
-            time.sleep(4)
+    # Расписания разбираются до запуска: ошибка в одном не должна останавливать остальные аптеки
+    schedules = []
+    for name, url, spec in entries:
+        try:
+            schedules.append((name, url, parse_task_times(spec)))
+        except ValueError as e:
+            print(f"{name}: неверное расписание {spec}, аптека не будет обходиться: {e}")
 
-        # Проверяем, если уже следующий день, сбрасываем last_run_time
-        if current_time == "00:00":
-            last_run_time = None
+    limiter = HostLimiter()
+    executor = create_parse_executor(parse_workers)
+    try:
+        async with create_session(global_concurrency) as session:
+            await asyncio.gather(*(
+                run_pharmacy_schedule(session, limiter, executor, name, url, task_times, jitter, overlap_policy)
+                for name, url, task_times in schedules
+            ))
+    finally:
+        if executor is not None:
+            executor.shutdown()
 
 # Функция для запуска процесса планирования
 def start_schedule(cur_apteka, cur_apteka_link):
-    global stop_scheduler
     print("Запуск планировщика...")
+    stop_event.clear()
+    # Эндпоинт /metrics поднимается, только если задан metrics.METRICS_PORT
+    metrics_server = start_metrics_server()
     try:
         run_schedule(cur_apteka, cur_apteka_link)
     except KeyboardInterrupt:
         print("Планировщик остановлен.")
+    finally:
+        if metrics_server is not None:
+            metrics_server.shutdown()
+
+# Функция для запуска планировщика сразу для всех аптек
+def start_schedule_all(entries):
+    print("Запуск планировщика...")
+    stop_event.clear()
+    metrics_server = start_metrics_server()
+    try:
+        asyncio.run(run_schedule_all(entries))
+    except KeyboardInterrupt:
+        print("Планировщик остановлен.")
+    finally:
+        if metrics_server is not None:
+            metrics_server.shutdown()
 
 # Функция для остановки планировщика
 def stop_schedule():
-    global stop_scheduler
-    stop_scheduler = True
-    print("Планировщик завершен.")
\ No newline at end of file
+    stop_event.set()
+    if _async_loop is not None and not _async_loop.is_closed():
+        _async_loop.call_soon_threadsafe(_async_stop.set)
+    print("Планировщик завершен.")
@@ -1,44 +1,21 @@
-import subprocess
 import sys
-import platform
+from crawler import read_data
+from schedule import parse_task_times, start_schedule_all
 
-# Функция для чтения данных из файла
-def read_data(file_path):
-    try:
-        with open(file_path, 'r') as file:
-            lines = file.readlines()
-        return [line.strip().split() for line in lines if line.strip()]
-    except FileNotFoundError:
-        print(f'Ошибка: файл {file_path} не найден.')
-        sys.exit(1)
 
-# Путь к файлу с данными
-file_path = 'data.txt'  # Укажите путь к вашему файлу
 
-# Чтение данных
-data = read_data(file_path)
+def schedule_from_file(file_path='data.txt'):
+    # Чтение данных; строки с неверным расписанием пропускаются с сообщением
+    data = read_data(file_path, parse_task_times)
 
-# Запуск main.py для каждой строки данных в новом окне
-for entry in data:
-    if len(entry) == 2:  # Убедимся, что строка содержит два элемента
-        name, url = entry
-        print(f'Запуск main.py с аргументами: {name} {url}')
+    # Все аптеки обходятся одним процессом с общей сессией aiohttp
+    # вместо отдельного окна терминала с main.py на каждую строку
+    for name, url, schedule_spec in data:
+        print(f'Добавлена аптека: {name} {url} {schedule_spec or "расписание по умолчанию"}')
 
-        # Определяем операционную систему
-        import subprocess
-        import platform
+    start_schedule_all(data)
 
-        import subprocess
-        import platform
 
-        if platform.system() == 'Windows':
-            # Для Windows
-            command = f'powershell -NoExit -Command "Start-Process powershell -ArgumentList \'-NoExit -Command \"python main.py \\\'{name}\\\' \\\'{url}\\\'\"\'"'
-            subprocess.Popen(command, shell=True)
-        else:
-            # Для Linux
-            subprocess.Popen(['gnome-terminal', '--', 'python3', 'main.py', name, url])  # Для Linux
-            # Для macOS
-            # subprocess.Popen(['osascript', '-e', f'tell application "Terminal" to do script "python main.py {name} {url}"'])
-    else:
-        print(f'Пропущена строка: {entry} - неверный формат')
\ No newline at end of file
+if __name__ == "__main__":
+    # Путь к файлу с данными
+    schedule_from_file(sys.argv[1] if len(sys.argv) > 1 else 'data.txt')
@@ -0,0 +1,196 @@
+import os
+import numpy as np
+import pandas as pd
+from product_index import KEY_COLUMNS, get_product_index
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# Формат промежуточных таблиц конвейера: parquet, если установлен pyarrow, иначе Excel
+TABLE_FORMAT = 'parquet' if pa is not None else 'xlsx'
+
+# Сохранять ли рядом с каждой таблицей копию в Excel (только для просмотра человеком)
+EXPORT_EXCEL = False
+
+# Расширения, которые понимают шаги конвейера; при совпадении имени берется первый по списку
+TABLE_EXTENSIONS = ('.parquet', '.xlsx', '.xlsm', '.xls')
+
+SNAPSHOT_STRING_COLUMNS = ['name', 'item_type', 'item_form', 'prescription', 'manufacturer', 'country', 'price', 'quantity']
+# product_id - номер товара из общего словаря (product_index), выдается при записи снимка
+SNAPSHOT_COLUMNS = SNAPSHOT_STRING_COLUMNS + ['only_quantity', 'product_id']
+
+if pa is not None:
+    SNAPSHOT_SCHEMA = pa.schema(
+        [(column, pa.string()) for column in SNAPSHOT_STRING_COLUMNS]
+        + [('only_quantity', pa.float64()), ('product_id', pa.int64())]
+    )
+    # Схема недописанного снимка (*.part): номера товаров добавляются при commit
+    SNAPSHOT_RECORD_SCHEMA = SNAPSHOT_SCHEMA.remove(SNAPSHOT_SCHEMA.get_field_index('product_id'))
+else:
+    SNAPSHOT_SCHEMA = None
+    SNAPSHOT_RECORD_SCHEMA = None
+
+
+def snapshot_record(item):
+    # Строка снимка в типах схемы: пустые строки - пропуски, количество - число
+    record = {column: (item.get(column) or None) for column in SNAPSHOT_STRING_COLUMNS}
+    try:
+        record['only_quantity'] = float(item.get('only_quantity'))
+    except (TypeError, ValueError):
+        record['only_quantity'] = None
+    return record
+
+
+def normalize_snapshot(df):
+    # Приводит снимок, прочитанный из CSV или Excel, к типам схемы
+    df = df.copy()
+    for column in SNAPSHOT_STRING_COLUMNS:
+        if column in df.columns:
+            values = df[column]
+            df[column] = values.astype(str).where(values.notna(), None).replace('', None)
+    if 'only_quantity' in df.columns:
+        df['only_quantity'] = pd.to_numeric(df['only_quantity'], errors='coerce')
+    if 'product_id' not in df.columns:
+        df['product_id'] = get_product_index().ids_for(df)
+    return df
+
+
+def table_path(path_without_ext, table_format=None):
+    return path_without_ext + '.' + (table_format or TABLE_FORMAT)
+
+
+def write_table(df, path_without_ext, table_format=None, export_excel=None):
+    # Сохраняет таблицу в формате конвейера и, если нужно, копию в Excel; возвращает путь
+    table_format = table_format or TABLE_FORMAT
+    export_excel = EXPORT_EXCEL if export_excel is None else export_excel
+    path = table_path(path_without_ext, table_format)
+    if table_format == 'parquet':
+        df.to_parquet(path, index=False)
+        if export_excel:
+            df.to_excel(path_without_ext + '.xlsx', index=False)
+    else:
+        df.to_excel(path, index=False)
+    return path
+
+
+def string_frame(df):
+    # Значения - строки, пропуски - NaN, как после pd.read_excel(dtype=str); product_id остается целым
+    df = df.copy()
+    for column in df.columns:
+        if column == 'product_id':
+            continue
+        values = df[column]
+        df[column] = values.astype(str).where(values.notna(), np.nan).astype(object)
+    return df
+
+
+def read_table(path, dtype=None, usecols=None):
+    # Читает таблицу в любом поддерживаемом формате.
+    # dtype=str повторяет поведение pd.read_excel(dtype=str): значения - строки, пропуски - NaN;
+    # номер товара product_id остается целым
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.parquet':
+        columns = None
+        if usecols is not None:
+            columns = pq.read_schema(path).names
+            columns = [columns[c] if isinstance(c, int) else c for c in usecols]
+        df = pd.read_parquet(path, columns=columns)
+        if dtype is str:
+            df = string_frame(df)
+        return df
+    if extension == '.csv':
+        return pd.read_csv(path, dtype=dtype, usecols=usecols)
+    engine = 'xlrd' if extension == '.xls' else 'openpyxl'
+    return pd.read_excel(path, dtype=dtype, usecols=usecols, engine=engine)
+
+
+def parquet_num_rows(path):
+    # Число строк parquet-файла по метаданным, без чтения данных (0 без pyarrow)
+    return pq.read_metadata(path).num_rows if pq is not None else 0
+
+
+def is_table(file_name):
+    return file_name.lower().endswith(TABLE_EXTENSIONS)
+
+
+def list_tables(directory):
+    # Имена таблиц в папке, по одному на каждое имя без расширения
+    # (если есть и parquet, и Excel-копия, берется parquet)
+    chosen = {}
+    for file_name in os.listdir(directory):
+        stem, extension = os.path.splitext(file_name)
+        extension = extension.lower()
+        if extension not in TABLE_EXTENSIONS:
+            continue
+        current = chosen.get(stem)
+        if current is None or TABLE_EXTENSIONS.index(extension) < TABLE_EXTENSIONS.index(os.path.splitext(current)[1].lower()):
+            chosen[stem] = file_name
+    return list(chosen.values())
+
+
+def find_table(directory, stem):
+    # Путь к таблице с данным именем без расширения или None
+    for extension in TABLE_EXTENSIONS:
+        path = os.path.join(directory, stem + extension)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+class ParquetSnapshotWriter:
+    # То же, что CsvSnapshotWriter, но пишет типизированный parquet группами строк.
+    # Номера товаров выдаются один раз в commit: словарь - это SQLite с блокировками,
+    # и обращаться к нему из цикла событий парсера на каждую группу строк нельзя
+    def __init__(self, file_name, flush_rows=500):
+        self.file_name = file_name
+        self.temp_name = file_name + '.part'
+        self.flush_rows = flush_rows
+        self.buffer = []
+        self.rows_written = 0
+        self.writer = pq.ParquetWriter(self.temp_name, SNAPSHOT_RECORD_SCHEMA)
+
+    def write(self, cleaned_data):
+        self.buffer.extend(snapshot_record(item) for item in cleaned_data)
+        if len(self.buffer) >= self.flush_rows:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.writer.write_table(pa.Table.from_pylist(self.buffer, schema=SNAPSHOT_RECORD_SCHEMA))
+            self.rows_written += len(self.buffer)
+            self.buffer.clear()
+
+    def commit(self):
+        # Блокирующий вызов (словарь товаров): парсер выполняет его вне цикла событий
+        self.flush()
+        self.writer.close()
+        if not self.rows_written:
+            # Пустой снимок не сохраняем
+            os.remove(self.temp_name)
+            return False
+        self.add_product_ids()
+        return True
+
+    def add_product_ids(self):
+        # Одна транзакция словаря на весь снимок; группы строк переписываются с колонкой product_id
+        with_ids_name = self.file_name + '.ids.part'
+        with pq.ParquetFile(self.temp_name) as part:
+            product_ids = get_product_index().ids_for(part.read(columns=KEY_COLUMNS).to_pandas())
+            with pq.ParquetWriter(with_ids_name, SNAPSHOT_SCHEMA) as writer:
+                start = 0
+                for group in range(part.num_row_groups):
+                    table = part.read_row_group(group)
+                    stop = start + table.num_rows
+                    writer.write_table(table.append_column('product_id', pa.array(product_ids[start:stop], pa.int64())))
+                    start = stop
+        os.replace(with_ids_name, self.file_name)
+        os.remove(self.temp_name)
+
+    def abort(self):
+        self.writer.close()
+        if os.path.exists(self.temp_name):
+            os.remove(self.temp_name)
@@ -0,0 +1,166 @@
+import os
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+from snapshot_store import normalize_snapshot, write_table
+
+# Синтетические данные для бенчмарков: страницы каталога в разметке сайта и истории снимков аптек.
+# Все генераторы детерминированы: одинаковые параметры и seed дают одинаковые данные
+
+ITEMS_PER_PAGE = 20
+
+ITEM_TYPES = ['Лекарство', 'Лекарство', 'Лекарство', 'БАД', 'Медтехника', 'Косметика']
+FORMS = ['таб. п/о', 'капс.', 'р-р д/ин.', 'сироп', 'мазь', 'порошок']
+COUNTRIES = ['Беларусь', 'Россия', 'Германия', 'Индия', 'Польша']
+
+# Время снимков в течение дня (как расписание парсера по умолчанию)
+SNAPSHOT_TIMES = ['08:20', '10:20', '12:20', '14:20', '16:20', '18:20', '20:20', '22:20', '23:30']
+HISTORY_START = datetime(2026, 1, 1)
+
+# Доля товаров конкурентов, которые есть и в нашей аптеке
+OUR_SHARE = 0.4
+
+# Вероятность, что товара нет в отдельном снимке (временно пропал из продажи)
+MISSING_RATE = 0.05
+
+
+def sku_frame(num_skus):
+    # Справочник товаров: текстовые поля снимка без цены и остатка
+    index = np.arange(num_skus)
+    return pd.DataFrame({
+        'name': [f"Препарат {i}" for i in index],
+        'item_type': [ITEM_TYPES[i % len(ITEM_TYPES)] for i in index],
+        'item_form': [f"{FORMS[i % len(FORMS)]} {5 * (i % 40 + 1)}мг №{10 * (i % 6 + 1)}" for i in index],
+        'prescription': np.where(index % 7 == 0, 'По рецепту', 'Без рецепта'),
+        'manufacturer': [f"Завод {i % 97}" for i in index],
+        'country': [COUNTRIES[i % len(COUNTRIES)] for i in index],
+    })
+
+
+def quantity_history(num_skus, num_snapshots, rng):
+    # Остатки товаров (товары x снимки): в основном убывают, иногда приходят поставки
+    steps = rng.choice([0, 0, 0, 0, -1, -1, -2, -3], size=(num_skus, num_snapshots))
+    steps[:, 0] = rng.integers(0, 60, num_skus)
+    deliveries = rng.random((num_skus, num_snapshots)) < 0.03
+    steps[deliveries] = rng.integers(10, 40, deliveries.sum())
+    quantities = np.cumsum(steps, axis=1)
+    # Ниже нуля остаток не опускается: отрицательный шаг на нуле ничего не меняет
+    return np.maximum.accumulate(np.maximum(quantities, 0) - quantities, axis=1) + quantities
+
+
+def snapshot_time(position):
+    day, slot = divmod(position, len(SNAPSHOT_TIMES))
+    hours, minutes = map(int, SNAPSHOT_TIMES[slot].split(':'))
+    return HISTORY_START + timedelta(days=day, hours=hours, minutes=minutes)
+
+
+def format_price(values):
+    return [f"{value:.2f} р." for value in values]
+
+
+def make_snapshot_history(root, num_skus, num_snapshots, num_pharmacies, seed=0):
+    # Пишет историю снимков в структуру папок шагов 2-5:
+    # <root>/Datasets/data/comp/<аптека>/<i>_parsed_data_<время>.<формат> и снимок нашей аптеки.
+    # Возвращает путь к снимку нашей аптеки
+    rng = np.random.default_rng(seed)
+    skus = sku_frame(num_skus)
+    base_prices = rng.uniform(2, 80, num_skus).round(2)
+    data_dir = os.path.join(root, 'Datasets', 'data')
+
+    our_rows = skus[rng.random(num_skus) < OUR_SHARE]
+    our_snapshot = our_rows.assign(price=format_price(base_prices[our_rows.index]), quantity='1 уп.', only_quantity='1')
+    our_dir = os.path.join(data_dir, 'our_pharmacies', 'our')
+    os.makedirs(our_dir, exist_ok=True)
+    our_file = write_table(normalize_snapshot(our_snapshot.reset_index(drop=True)),
+                           os.path.join(our_dir, f"0_parsed_data_{snapshot_time(0):%Y-%m-%d_%H-%M}"))
+
+    for pharmacy in range(num_pharmacies):
+        pharmacy_dir = os.path.join(data_dir, 'comp', f"pharmacy_{pharmacy}")
+        os.makedirs(pharmacy_dir, exist_ok=True)
+        quantities = quantity_history(num_skus, num_snapshots, rng)
+        prices = base_prices * rng.uniform(0.9, 1.1, num_skus)
+        present = rng.random((num_skus, num_snapshots)) >= MISSING_RATE
+        for position in range(num_snapshots):
+            rows = np.flatnonzero(present[:, position])
+            values = quantities[rows, position]
+            snapshot = skus.iloc[rows].assign(
+                price=format_price(prices[rows]),
+                quantity=[f"{value} уп." for value in values],
+                only_quantity=values.astype(float),
+            )
+            write_table(normalize_snapshot(snapshot.reset_index(drop=True)),
+                        os.path.join(pharmacy_dir, f"{position}_parsed_data_{snapshot_time(position):%Y-%m-%d_%H-%M}"))
+    return our_file
+
+
+def make_pre_ans(num_rows, num_snapshots, seed=0):
+    # Таблица pre_ans для проверки исправления остатков и метрик продаж:
+    # остатки в основном убывают, бывают поставки и временные провалы
+    rng = np.random.default_rng(seed)
+    values = np.empty((num_rows, num_snapshots))
+    values[:, 0] = rng.integers(0, 50, num_rows)
+    for t in range(1, num_snapshots):
+        step = rng.choice([0, 0, 0, -1, -2, 5, -3], size=num_rows)
+        values[:, t] = np.maximum(0, values[:, t - 1] + step)
+    # Временные провалы, которые возвращаются к прежнему уровню через 1-6 шагов
+    for _ in range(num_rows * num_snapshots // 20):
+        row, t = rng.integers(0, num_rows), rng.integers(1, num_snapshots - 1)
+        length = rng.integers(1, 7)
+        values[row, t:t + length] = np.maximum(0, values[row, t - 1] - rng.integers(1, 5))
+    columns = [f"Количество {t}_2026-01-01_08-20" for t in range(num_snapshots)]
+    df = pd.DataFrame(values, columns=columns)
+    df.insert(0, 'name', [f"Товар {i}" for i in range(num_rows)])
+    return df
+
+
+def page_row_html(index, quantity, price, warehouses):
+    # Одна строка таблицы table-border. Если остаток на нескольких складах, сайт пишет "от N уп."
+    # и раскладывает количество по складам во всплывающей подсказке tooltip-info-body
+    item_type = ITEM_TYPES[index % len(ITEM_TYPES)]
+    form = f"{FORMS[index % len(FORMS)]} {5 * (index % 40 + 1)}мг №{10 * (index % 6 + 1)}"
+    prescription = 'По рецепту' if index % 7 == 0 else 'Без рецепта'
+    if warehouses:
+        parts = ''.join(
+            f'<div class="tooltip-info-table-tr"><div class="tooltip-info-table-td">Склад {number + 1}</div>'
+            f'<div class="tooltip-info-table-td">{part} уп.</div></div>'
+            for number, part in enumerate(warehouses)
+        )
+        quantity_html = (f'<span class="capture">от {min(warehouses)} уп.</span>'
+                         f'<div class="tooltip-info"><div class="tooltip-info-body">{parts}</div></div>')
+    else:
+        quantity_html = f'<span class="capture">{quantity} уп.</span>'
+    return (
+        f'<tr><td><a href="/product/{index}">Препарат {index}</a><span class="capture">{item_type}</span></td>'
+        f'<td>{form}\n{prescription}</td>'
+        f'<td>Завод {index % 97}\n{COUNTRIES[index % len(COUNTRIES)]}</td>'
+        f'<td><a href="/pharmacy">Адрес</a></td>'
+        f'<td><span class="price-value">{price:.2f} р.</span>{quantity_html}</td></tr>'
+    )
+
+
+def make_page_html(total_positions, page, seed=0, version=0):
+    # Страница каталога аптеки в разметке, которую разбирает parse_table.
+    # version меняет остатки, как если бы страница была загружена в другой снимок
+    rng = np.random.default_rng([seed, page, version])
+    first = (page - 1) * ITEMS_PER_PAGE
+    count = max(0, min(ITEMS_PER_PAGE, total_positions - first))
+    quantities = rng.integers(1, 60, count)
+    prices = rng.uniform(2, 80, count)
+    split = rng.random(count) < 0.3
+    rows = []
+    for offset in range(count):
+        warehouses = []
+        if split[offset]:
+            warehouses = [int(part) for part in rng.integers(1, 20, rng.integers(2, 5))]
+        rows.append(page_row_html(first + offset, quantities[offset], prices[offset], warehouses))
+    header = '<tr><th>Название</th><th>Форма</th><th>Производитель</th><th>Аптека</th><th>Цена</th></tr>'
+    return (
+        '<!DOCTYPE html><html><head><meta charset="utf-8"><title>Аптека</title></head><body>'
+        f'<div class="bttn-check"><label>Найдено позиций в продаже - {total_positions}</label></div>'
+        f'<table class="table-border">{header}{"".join(rows)}</table>'
+        '</body></html>'
+    )
+
+
+def page_count(total_positions):
+    return total_positions // ITEMS_PER_PAGE + (1 if total_positions % ITEMS_PER_PAGE else 0)
@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+from corrections import check_and_correct_values, check_and_correct_values_loop
+from synthetic_data import make_pre_ans
+
+
+def make_frame(values):
+    values = np.asarray(values, dtype=float)
+    columns = [f"Количество {t}_2026-01-01_08-20" for t in range(values.shape[1])]
+    df = pd.DataFrame(values, columns=columns)
+    df.insert(0, 'name', [f"Товар {i}" for i in range(len(df))])
+    return df
+
+
+def assert_equivalent(df):
+    # Векторная версия должна давать ту же таблицу и ту же маску исправленных ячеек, что построчная
+    expected, expected_cells = check_and_correct_values_loop(df.copy())
+    actual, actual_cells = check_and_correct_values(df.copy())
+    pd.testing.assert_frame_equal(expected, actual)
+    assert set(actual_cells) == set(expected_cells)
+    return actual, set(actual_cells)
+
+
+def test_all_zeros():
+    df, cells = assert_equivalent(make_frame(np.zeros((4, 12))))
+    assert cells == set()
+    assert (df.iloc[:, 1:].to_numpy() == 0).all()
+
+
+def test_return_on_step_five_is_corrected():
+    # Провал на t=2, возврат ровно через 5 шагов (t=7)
+    df, cells = assert_equivalent(make_frame([[10, 10, 3, 3, 3, 3, 3, 10, 9]]))
+    assert df.iloc[0, 1:].tolist() == [10, 10, 10, 10, 10, 10, 10, 10, 9]
+    assert cells == {(0, column) for column in range(3, 8)}
+
+
+def test_return_on_step_six_is_not_corrected():
+    _, cells = assert_equivalent(make_frame([[10, 10, 3, 3, 3, 3, 3, 3, 10]]))
+    assert cells == set()
+
+
+def test_return_in_last_column():
+    df, cells = assert_equivalent(make_frame([[5, 5, 4, 5], [5, 5, 5, 4]]))
+    assert df.iloc[0, 1:].tolist() == [5, 5, 5, 5]
+    # Провал в последнем столбце исправить нечем
+    assert df.iloc[1, 1:].tolist() == [5, 5, 5, 4]
+    assert cells == {(0, 3)}
+
+
+@pytest.mark.parametrize('values', [
+    [[3]],
+    [[3, 1]],
+    [[7, 2, 7], [1, 1, 1]],
+    [[9, 4, 6, 4, 9, 6, 9]],
+    [[8, np.nan, 8, 5, 8]],
+], ids=['one-column', 'two-columns', 'short', 'nested-dips', 'nan'])
+def test_edge_cases(values):
+    assert_equivalent(make_frame(values))
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_random_small_values(seed):
+    # Маленький диапазон значений - много провалов и возвратов, в том числе перекрывающихся
+    rng = np.random.default_rng(seed)
+    assert_equivalent(make_frame(rng.integers(0, 4, size=(60, 25))))
+
+
+def test_synthetic_pre_ans():
+    df = make_pre_ans(200, 40, seed=1)
+    _, cells = assert_equivalent(df)
+    assert cells
@@ -0,0 +1,76 @@
+import asyncio
+import os
+import parser
+from crawl_checkpoint import CHECKPOINT_SUFFIX
+from fake_site import FakeSite, start_fake_site
+from synthetic_data import make_page_html, page_count
+
+POSITIONS = 190
+
+
+class BrokenPagesSite(FakeSite):
+    # Страницы из broken отдаются без строк таблицы, как при сбое сайта
+    def __init__(self, *args, broken=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.broken = set(broken)
+
+    def page(self, number):
+        if number in self.broken:
+            return make_page_html(0, number).encode('utf-8'), '"empty"'
+        return super().page(number)
+
+
+async def crawl(site, *file_names, fix_after_first=False):
+    # Обходит один и тот же запущенный сайт в каждый из файлов по очереди; возвращает итоги и число запросов
+    runner, base_url = await start_fake_site(site)
+    results = []
+    try:
+        limiter = parser.HostLimiter(8, 1000000.0)
+        for file_name in file_names:
+            requests = site.requests
+            status = await parser.get_all_pages(f"{base_url}/pharmacy", file_name, limiter=limiter,
+                                                show_progress=False, use_cache=False)
+            results.append((status, site.requests - requests, os.path.exists(file_name + CHECKPOINT_SUFFIX)))
+            if fix_after_first:
+                site.broken.clear()
+    finally:
+        await runner.cleanup()
+    return results
+
+
+def read_bytes(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_empty_page_leaves_crawl_incomplete(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(parser, 'RETRY_BASE_DELAY', 0.0)
+    snapshot = str(tmp_path / 'snapshot.csv')
+    reference = str(tmp_path / 'reference.csv')
+
+    # Первый обход: страница 4 пустая, хотя по get_total_positions она должна быть.
+    # Затем сайт починился: второй обход догружает только ее
+    site = BrokenPagesSite(POSITIONS, broken={4})
+    first, second, clean = asyncio.run(crawl(site, snapshot, snapshot, reference, fix_after_first=True))
+
+    # Пустая страница повторялась как неудачная попытка, снимок не сохранен
+    assert first == (parser.CRAWL_INCOMPLETE, 1 + page_count(POSITIONS) + parser.PAGE_RETRIES, True)
+    assert second == (parser.CRAWL_SAVED, 1, False)
+    assert clean[0] == parser.CRAWL_SAVED
+    assert read_bytes(snapshot) == read_bytes(reference)
+
+
+def test_flaky_site_is_retried(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(parser, 'RETRY_BASE_DELAY', 0.0)
+    snapshot = str(tmp_path / 'snapshot.csv')
+    reference = str(tmp_path / 'reference.csv')
+
+    site = FakeSite(POSITIONS, error_rate=0.2, seed=1)
+    [(status, _, checkpoint_left)] = asyncio.run(crawl(site, snapshot))
+    assert status == parser.CRAWL_SAVED and not checkpoint_left
+    assert site.errors > 0
+    [(status, _, _)] = asyncio.run(crawl(FakeSite(POSITIONS, seed=1), reference))
+    assert status == parser.CRAWL_SAVED
+    assert read_bytes(snapshot) == read_bytes(reference)
@@ -0,0 +1,49 @@
+import pandas as pd
+import pytest
+from openpyxl import load_workbook
+from excel_export import GREY_FILL, YELLOW_FILL, ExcelSheet, highlight_mask, write_excel
+
+ENGINES = ['xlsxwriter', 'openpyxl']
+
+
+def filled_cells(path, sheet_name, color):
+    # Позиции (строка таблицы, столбец) залитых ячеек; строка 1 листа - заголовок
+    worksheet = load_workbook(path)[sheet_name]
+    cells = set()
+    for row in worksheet.iter_rows(min_row=2):
+        for cell in row:
+            if cell.fill.fill_type == 'solid' and cell.fill.fgColor.rgb.endswith(color):
+                cells.add((cell.row - 2, cell.column - 1))
+    return cells
+
+
+def read_values(path, sheet_name):
+    worksheet = load_workbook(path)[sheet_name]
+    return [list(row) for row in worksheet.iter_rows(min_row=2, values_only=True)]
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_highlight_is_written(tmp_path, engine):
+    df = pd.DataFrame({'name': ['a', 'b', 'c'], 'x': [1.0, 2.0, None], 'y': [4, 5, 6]})
+    # Позиция (5, 0) за пределами таблицы пропускается
+    highlight = highlight_mask(df.shape, [0, 2, 1, 5], [1, 2, 0, 0])
+    path = write_excel(str(tmp_path / 'book.xlsx'), [ExcelSheet('Sheet1', df, highlight, fill_color=GREY_FILL)],
+                       engine=engine)
+
+    assert filled_cells(path, 'Sheet1', GREY_FILL) == {(0, 1), (2, 2), (1, 0)}
+    assert read_values(path, 'Sheet1') == [['a', 1, 4], ['b', 2, 5], ['c', None, 6]]
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_highlight_per_sheet(tmp_path, engine):
+    df = pd.DataFrame({'x': [1, 2], 'y': [3, 4]})
+    sheets = [
+        ExcelSheet('grey', df, highlight_mask(df.shape, [0], [0]), fill_color=GREY_FILL),
+        ExcelSheet('yellow', df, highlight_mask(df.shape, [1], [1]), fill_color=YELLOW_FILL),
+        ExcelSheet('plain', df),
+    ]
+    path = write_excel(str(tmp_path / 'book.xlsx'), sheets, engine=engine)
+
+    assert filled_cells(path, 'grey', GREY_FILL) == {(0, 0)}
+    assert filled_cells(path, 'yellow', YELLOW_FILL) == {(1, 1)}
+    assert filled_cells(path, 'plain', GREY_FILL) == set()
@@ -0,0 +1,54 @@
+import charts
+import numpy as np
+import pandas as pd
+import pytest
+from openpyxl import load_workbook
+from pipeline.steps import load_step
+
+COLUMNS = [f"Количество {t}_2026-01-0{t + 1}_08-20" for t in range(3)]
+
+
+def linked_rows(path):
+    # Номера строк таблицы, у которых в столбце "Ссылка на график" есть ссылка
+    worksheet = load_workbook(path)['Data']
+    header = [cell.value for cell in worksheet[1]]
+    column = header.index("Ссылка на график")
+    return [row_number for row_number, row in enumerate(worksheet.iter_rows(min_row=2, values_only=True))
+            if row[column] and 'HYPERLINK' in str(row[column])]
+
+
+def test_links_use_zero_filled_quantities(tmp_path):
+    # Пустая ячейка считается нулем, как в шаге 5: [пусто, 0, 0] - без динамики, [5, пусто, 5] - с динамикой
+    values = [
+        [np.nan, 0, 0],
+        [np.nan, np.nan, np.nan],
+        [5, np.nan, 5],
+        [3, 3, 3],
+        [3, 4, 3],
+    ]
+    df = pd.DataFrame(values, columns=COLUMNS)
+    df.insert(0, 'name', [f"Товар {i}" for i in range(len(df))])
+    df.to_excel(tmp_path / 'sorted_pre_ans_comp.xlsx', index=False)
+
+    module = load_step(6)
+    output_file, charts, rows = module.process_file('sorted_pre_ans_comp.xlsx', str(tmp_path), str(tmp_path),
+                                                    str(tmp_path / 'graphs'), graph_output='server')
+
+    assert rows == len(values) and charts == {}
+    assert linked_rows(output_file) == [2, 4]
+
+
+@pytest.mark.parametrize('graph_output', ['html', 'server'])
+def test_graph_output_is_read_at_call_time(tmp_path, monkeypatch, graph_output):
+    # Режим, заданный после импорта шага 5, действует: 'html' отдает графики для построения, 'server' - нет
+    module = load_step(5)
+    monkeypatch.setattr(charts, 'GRAPH_OUTPUT', graph_output)
+    df = pd.DataFrame([[9, 5, 5], [4, 4, 4]], columns=COLUMNS)
+    df.insert(0, 'name', ['Товар 0', 'Товар 1'])
+    df['Медианная цена'] = '10,5'
+
+    chart_specs, rows = module.process_file('pre_ans_comp.xlsx', str(tmp_path), str(tmp_path),
+                                            str(tmp_path / 'graphs'), df=df)
+
+    assert rows == 2
+    assert len(chart_specs) == (1 if graph_output == 'html' else 0)
@@ -0,0 +1,90 @@
+import asyncio
+import hashlib
+import parser
+from page_cache import PageCache
+from fake_site import FakeSite, start_fake_site
+from synthetic_data import page_count
+
+POSITIONS = 130
+
+
+class RecordingPageCache(PageCache):
+    # Запоминает созданные кэши и результаты reuse, чтобы проверить их после обхода
+    instances = []
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.reused = {}
+        RecordingPageCache.instances.append(self)
+
+    def reuse(self, page):
+        rows = super().reuse(page)
+        self.reused[page] = rows
+        return rows
+
+
+class ChangingChromeSite(FakeSite):
+    # Шапка страницы (и вместе с ней ETag) меняется на каждом обходе, таблица остается прежней
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.chrome = 0
+
+    def page(self, number):
+        body, _ = super().page(number)
+        body = body.replace(b'<title>', f'<title>{self.chrome} '.encode('utf-8'), 1)
+        return body, '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+
+
+async def crawl_twice(site, first, second, between=None):
+    runner, base_url = await start_fake_site(site)
+    try:
+        limiter = parser.HostLimiter(8, 1000000.0)
+        for file_name in (first, second):
+            await parser.get_all_pages(f"{base_url}/pharmacy", file_name, limiter=limiter,
+                                       show_progress=False, use_cache=True)
+            if between is not None:
+                between()
+    finally:
+        await runner.cleanup()
+
+
+def read_bytes(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_second_crawl_uses_not_modified(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(parser, 'PageCache', RecordingPageCache)
+    RecordingPageCache.instances = []
+    first, second = str(tmp_path / 'first.csv'), str(tmp_path / 'second.csv')
+    site = FakeSite(POSITIONS)
+
+    asyncio.run(crawl_twice(site, first, second))
+
+    pages = page_count(POSITIONS)
+    first_cache, second_cache = RecordingPageCache.instances
+    assert site.not_modified == pages
+    assert second_cache.not_modified == pages and second_cache.parsed == 0
+    # reuse отдает строки, разобранные в первом обходе
+    assert second_cache.reused == {page: first_cache.new_pages[str(page)]['rows'] for page in range(1, pages + 1)}
+    assert read_bytes(second) == read_bytes(first)
+
+
+def test_changed_etag_with_same_table_is_not_parsed(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(parser, 'PageCache', RecordingPageCache)
+    RecordingPageCache.instances = []
+    first, second = str(tmp_path / 'first.csv'), str(tmp_path / 'second.csv')
+    site = ChangingChromeSite(POSITIONS)
+
+    def change_chrome():
+        site.chrome += 1
+
+    asyncio.run(crawl_twice(site, first, second, between=change_chrome))
+
+    pages = page_count(POSITIONS)
+    second_cache = RecordingPageCache.instances[1]
+    assert site.not_modified == 0
+    assert second_cache.same_hash == pages and second_cache.parsed == 0
+    assert read_bytes(second) == read_bytes(first)
@@ -0,0 +1,74 @@
+import asyncio
+import json
+import os
+import parser
+import pytest
+from benchmark_parse import FIXTURES_DIR, golden_path, load_fixtures
+from fake_site import FakeSite, start_fake_site
+from parse_backends import BACKENDS, DEFAULT_BACKEND, extract_items
+from parser import parse_table
+
+# Эталоны .json получены исходным parse_table (BeautifulSoup, html.parser).
+# lxml по-своему закрывает незакрытые <td>, поэтому на этой странице расходится с эталоном
+KNOWN_MISMATCHES = {
+    ('lxml', 'catalog_unclosed_td.html'),
+}
+
+FIXTURES = load_fixtures(FIXTURES_DIR)
+
+
+def read_golden(file_name):
+    with open(golden_path(FIXTURES_DIR, file_name), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_fixtures_present():
+    assert len(FIXTURES) >= 3
+    for file_name, _ in FIXTURES:
+        assert os.path.exists(golden_path(FIXTURES_DIR, file_name))
+
+
+def test_load_fixtures_missing_dir(tmp_path):
+    assert load_fixtures(str(tmp_path / 'missing')) == []
+
+
+@pytest.mark.parametrize('file_name,html_content', FIXTURES, ids=[name for name, _ in FIXTURES])
+def test_default_parse_table_matches_golden(file_name, html_content):
+    assert parse_table(html_content) == read_golden(file_name)
+
+
+@pytest.mark.parametrize('backend', sorted(BACKENDS))
+@pytest.mark.parametrize('file_name,html_content', FIXTURES, ids=[name for name, _ in FIXTURES])
+def test_backend_matches_golden(backend, file_name, html_content):
+    if (backend, file_name) in KNOWN_MISMATCHES:
+        pytest.xfail(f"{backend} закрывает незакрытые <td> иначе, чем html.parser")
+    assert extract_items(html_content, BACKENDS[backend]) == read_golden(file_name)
+
+
+async def crawl_site(file_name, **kwargs):
+    runner, base_url = await start_fake_site(FakeSite(60))
+    try:
+        return await parser.get_all_pages(f"{base_url}/pharmacy", file_name, limiter=parser.HostLimiter(8, 1000000.0),
+                                          show_progress=False, use_cache=False, **kwargs)
+    finally:
+        await runner.cleanup()
+
+
+@pytest.mark.parametrize('backend', [None, 'lxml'], ids=['default', 'lxml'])
+def test_crawl_uses_parse_backend(tmp_path, monkeypatch, backend):
+    # Обход разбирает страницы движком parse_backend, по умолчанию - PARSE_BACKEND
+    monkeypatch.chdir(tmp_path)
+    used = []
+
+    def recording_extract_items(html_content, parse_backend):
+        used.append(parse_backend)
+        return extract_items(html_content, parse_backend)
+
+    monkeypatch.setattr(parser, 'extract_items', recording_extract_items)
+    kwargs = {} if backend is None else {'parse_backend': backend}
+    status = asyncio.run(crawl_site(str(tmp_path / 'snapshot.csv'), **kwargs))
+
+    assert status == parser.CRAWL_SAVED
+    assert parser.PARSE_BACKEND == DEFAULT_BACKEND
+    expected = BACKENDS[backend or parser.PARSE_BACKEND]
+    assert used and all(parse_backend is expected for parse_backend in used)
@@ -0,0 +1,65 @@
+import excel_export
+import numpy as np
+import pandas as pd
+import pytest
+from corrections import get_quantity_columns
+from excel_export import GREY_FILL
+from pipeline.steps import load_step
+from product_index import KEY_COLUMNS
+from snapshot_store import write_table
+from test_excel_export import ENGINES, filled_cells
+
+# Остатки по снимкам: провалы, которые возвращаются к прежнему уровню, исправляются
+QUANTITIES = [
+    [10, 10, 3, 3, 10, 9],
+    [5, 4, 5, 5, 5, 5],
+    [7, 7, 7, 7, 7, 7],
+    [2, 1, 1, 1, 1, 1],
+]
+
+
+def make_products():
+    return pd.DataFrame({column: [f"{column} {row}" for row in range(len(QUANTITIES))] for column in KEY_COLUMNS})
+
+
+def write_diffs(diff_dir):
+    products = make_products()
+    for snapshot, quantities in enumerate(zip(*QUANTITIES)):
+        df = products.copy()
+        df['price'] = '100'
+        df['only_quantity'] = [str(quantity) for quantity in quantities]
+        write_table(df, str(diff_dir / f"diff_{snapshot + 1}_parsed_data_2026-01-0{snapshot + 1}_08-20"), 'parquet')
+
+
+def run_process_competitor(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    diff_dir = tmp_path / 'diff_comp' / 'comp'
+    diff_dir.mkdir(parents=True)
+    write_diffs(diff_dir)
+    module = load_step(4)
+    return module.process_competitor('comp', str(tmp_path / 'list_for_analis'), str(tmp_path / 'diff_comp'),
+                                     str(tmp_path), product_df=make_products())
+
+
+def test_highlight_marks_corrected_cells(tmp_path, monkeypatch):
+    _, pre_ans, highlight = run_process_competitor(tmp_path, monkeypatch)
+
+    # Серые ячейки - ровно те, что изменило исправление, в столбцах количества
+    quantity_columns = get_quantity_columns(pre_ans)
+    changed = pre_ans[quantity_columns].to_numpy() != np.asarray(QUANTITIES, dtype=float)
+    rows, offsets = changed.nonzero()
+    first_quantity_column = pre_ans.columns.get_loc(quantity_columns[0])
+    expected = set(zip(rows.tolist(), (first_quantity_column + offsets).tolist()))
+    assert expected == {(0, 11), (0, 12), (1, 10)}
+    assert set(zip(*(positions.tolist() for positions in highlight.nonzero()))) == expected
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_pre_ans_workbook_highlight(tmp_path, monkeypatch, engine):
+    # В сохраненном pre_ans залиты те же ячейки, что в маске
+    monkeypatch.setattr(excel_export, 'EXCEL_ENGINE', engine)
+    file_name, _, highlight = run_process_competitor(tmp_path, monkeypatch)
+
+    expected = set(zip(*(positions.tolist() for positions in highlight.nonzero())))
+    assert expected
+    assert filled_cells(str(tmp_path / file_name), 'Sheet1', GREY_FILL) == expected
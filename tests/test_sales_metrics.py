@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+from corrections import get_quantity_columns
+from sales_metrics import calculate_metrics, calculate_metrics_row
+from synthetic_data import make_pre_ans
+
+
+def assert_parity(values):
+    # Векторный расчет должен совпадать с построчным эталоном в каждой строке
+    values = np.asarray(values, dtype=float)
+    metrics, segment_changes = calculate_metrics(values)
+    assert len(metrics) == len(values)
+    assert len(segment_changes) == len(values)
+    for position, row in enumerate(values):
+        expected = calculate_metrics_row(row)
+        assert metrics["Индекс изменений"].iloc[position] == pytest.approx(float(expected["Индекс изменений"]))
+        assert metrics["Сегменты"].iloc[position] == expected["Сегменты"]
+        assert metrics["Частота изменений в минус"].iloc[position] == expected["Частота изменений в минус"]
+        assert segment_changes.row(position).tolist() == expected["Индексы смены сегментов"]
+    return metrics, segment_changes
+
+
+def test_no_rows():
+    metrics, segment_changes = assert_parity(np.empty((0, 9)))
+    assert metrics.empty
+    assert segment_changes.counts().tolist() == []
+
+
+def test_empty_rows():
+    # Строка без остатков (все пропуски) считается нулями: один сегмент, продаж нет
+    metrics, _ = assert_parity([[np.nan] * 6, [0.0] * 6])
+    assert metrics["Сегменты"].tolist() == [1, 1]
+    assert metrics["Индекс изменений"].tolist() == [0, 0]
+
+
+def test_constant_rows():
+    metrics, segment_changes = assert_parity([[5.0] * 8, [0.0] * 8, [12.5] * 8])
+    assert metrics["Частота изменений в минус"].tolist() == [0, 0, 0]
+    assert segment_changes.counts().tolist() == [0, 0, 0]
+
+
+def test_single_snapshot():
+    metrics, _ = assert_parity([[3.0], [np.nan], [0.0]])
+    assert metrics["Сегменты"].tolist() == [1, 1, 1]
+
+
+def test_no_snapshots():
+    metrics, _ = assert_parity(np.empty((2, 0)))
+    assert metrics["Сегменты"].tolist() == [0, 0]
+
+
+def test_gaps_and_deliveries():
+    assert_parity([
+        [10, np.nan, 8, 20, 15, 15, 30, 0],
+        [np.nan, 4, 3, 3, 9, np.nan, 2, 2],
+    ])
+
+
+def test_synthetic_pre_ans():
+    df = make_pre_ans(300, 60)
+    values = df[get_quantity_columns(df)].to_numpy(copy=True)
+    values[::7, 3] = np.nan
+    _, segment_changes = assert_parity(values)
+    assert segment_changes.counts().sum() > 0
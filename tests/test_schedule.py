@@ -0,0 +1,31 @@
+import pytest
+from crawler import read_data
+from schedule import DEFAULT_TASK_TIMES, parse_task_times
+
+
+def test_parse_task_times():
+    assert parse_task_times(None) == DEFAULT_TASK_TIMES
+    assert parse_task_times('08:20,*/6:05') == ['00:05', '06:05', '08:20', '12:05', '18:05']
+    assert len(parse_task_times('*:*/15')) == 24 * 4
+
+
+@pytest.mark.parametrize('spec', ['8-20', '0820', '08:20:00', '*/0:10', '10:*/0', '*/x:10', '24:00', '10:60', '-1:10'])
+def test_parse_task_times_rejects_invalid(spec):
+    with pytest.raises(ValueError):
+        parse_task_times(spec)
+
+
+def test_read_data_skips_invalid_schedule(tmp_path, capsys):
+    data_file = tmp_path / 'data.txt'
+    data_file.write_text(
+        "good https://example.com/1 08:20\n"
+        "typo https://example.com/2 8-20\n"
+        "\n"
+        "zero https://example.com/3 */0:10\n"
+        "default https://example.com/4\n",
+        encoding='utf-8',
+    )
+    entries = read_data(str(data_file), parse_task_times)
+    assert [name for name, _, _ in entries] == ['good', 'default']
+    output = capsys.readouterr().out
+    assert 'строка 2' in output and 'строка 4' in output
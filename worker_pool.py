@@ -0,0 +1,22 @@
+import multiprocessing
+from contextlib import contextmanager
+from metrics import track_pool
+
+
+@contextmanager
+def worker_pool(pool=None, processes=None, initializer=None, initargs=()):
+    # Общий пул процессов, если он передан (например, из run_pipeline.py), иначе свой на время шага
+    # Загрузка процессов за время блока учитывается в метриках выполняемого этапа
+    if pool is not None:
+        with track_pool(pool):
+            yield pool
+        return
+    with multiprocessing.Pool(processes=processes or multiprocessing.cpu_count(),
+                              initializer=initializer, initargs=initargs) as own_pool, track_pool(own_pool):
+        yield own_pool
+
+
+def chunk_size(num_tasks, pool=None, processes=None):
+    # Примерно по четыре порции задач на процесс
+    processes = getattr(pool, '_processes', None) or processes or multiprocessing.cpu_count()
+    return max(1, num_tasks // (processes * 4))